@@ -0,0 +1,94 @@
+from datetime import date
+from typing import Literal, Optional
+
+from anyio import to_thread
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from consultas_lentas import registro_consultas_lentas
+from dependencies import UsuarioAutenticado, get_db, verificar_admin
+from perfis import caminho_perfil, listar_perfis
+from relatorios import SITUACOES, reconciliar, relatorio_por_dia, relatorio_por_sabor, relatorio_por_status
+
+admin_router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+)
+
+
+@admin_router.get("/consultas-lentas")
+async def listar_consultas_lentas(usuario: UsuarioAutenticado = Depends(verificar_admin)):
+    consultas = registro_consultas_lentas.resumo()
+    return {
+        "limiar_ms": registro_consultas_lentas.limiar_segundos * 1000,
+        "consultas": consultas,
+    }
+
+
+@admin_router.delete("/consultas-lentas")
+async def limpar_consultas_lentas(usuario: UsuarioAutenticado = Depends(verificar_admin)):
+    registro_consultas_lentas.limpar()
+    return {"mensagem": "Registro de consultas lentas apagado"}
+
+
+@admin_router.get("/perfis")
+def listar_perfis_gravados(usuario: UsuarioAutenticado = Depends(verificar_admin)):
+    return {"perfis": listar_perfis()}
+
+
+@admin_router.get("/perfis/{nome}")
+def baixar_perfil(nome: str, usuario: UsuarioAutenticado = Depends(verificar_admin)):
+    return FileResponse(caminho_perfil(nome), media_type="text/plain", filename=nome)
+
+
+# fonte=resumo lê as tabelas mantidas pelas rotas de pedidos; fonte=pedidos
+# agrega direto dos pedidos (atuais e arquivados), mais lento mas exato
+FonteRelatorio = Literal["resumo", "pedidos"]
+
+
+def _validar_situacao(situacao: Optional[str]) -> None:
+    if situacao is not None and situacao not in SITUACOES:
+        raise HTTPException(status_code=400, detail=f"Situação inválida, use uma de {', '.join(SITUACOES)}")
+
+
+@admin_router.get("/relatorios/status")
+def relatorio_status(
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    fonte: FonteRelatorio = "resumo",
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(verificar_admin),
+):
+    return {"fonte": fonte, "status": relatorio_por_status(db, inicio, fim, exato=fonte == "pedidos")}
+
+
+@admin_router.get("/relatorios/sabores")
+def relatorio_sabores(
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    situacao: Optional[str] = None,
+    fonte: FonteRelatorio = "resumo",
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(verificar_admin),
+):
+    _validar_situacao(situacao)
+    return {"fonte": fonte, "sabores": relatorio_por_sabor(db, inicio, fim, situacao, exato=fonte == "pedidos")}
+
+
+@admin_router.get("/relatorios/dias")
+def relatorio_dias(
+    inicio: Optional[date] = None,
+    fim: Optional[date] = None,
+    situacao: Optional[str] = None,
+    fonte: FonteRelatorio = "resumo",
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(verificar_admin),
+):
+    _validar_situacao(situacao)
+    return {"fonte": fonte, "dias": relatorio_por_dia(db, inicio, fim, situacao, exato=fonte == "pedidos")}
+
+
+@admin_router.post("/relatorios/reconciliar")
+async def reconciliar_relatorios(usuario: UsuarioAutenticado = Depends(verificar_admin)):
+    return await to_thread.run_sync(reconciliar)
@@ -33,7 +33,8 @@ def upgrade() -> None:
     op.create_table('pedidos',
     sa.Column('id', sa.Integer(), nullable=False),
     sa.Column('usuario_id', sa.Integer(), nullable=True),
-    sa.Column('status', sqlalchemy_utils.types.choice.ChoiceType(length=255), nullable=True),
+    # ChoiceType é armazenado como VARCHAR(255)
+    sa.Column('status', sa.String(length=255), nullable=True),
     sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
     sa.PrimaryKeyConstraint('id')
     )
@@ -21,7 +21,9 @@ depends_on: Union[str, Sequence[str], None] = None
 def upgrade() -> None:
     """Upgrade schema."""
     op.add_column('pedidos', sa.Column('preco', sa.Float(), nullable=False, server_default='0'))
-    op.alter_column('pedidos', 'preco', server_default=None)
+    # sqlite não suporta ALTER COLUMN: batch recria a tabela nesse caso
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.alter_column('preco', existing_type=sa.Float(), server_default=None)
 
 
 def downgrade() -> None:
@@ -0,0 +1,40 @@
+"""add indices consultas pedidos
+
+Revision ID: 7c2b8e4f1a90
+Revises: b41d6c0e9f27
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2b8e4f1a90'
+down_revision: Union[str, Sequence[str], None] = 'b41d6c0e9f27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # usuarios.email já é indexado pela UNIQUE constraint da migração inicial
+    # if_not_exists: bancos criados por create_all depois dos modelos já têm os índices
+    op.create_index(op.f('ix_pedidos_usuario_id'), 'pedidos', ['usuario_id'], unique=False, if_not_exists=True)
+    op.create_index(op.f('ix_pedidos_status'), 'pedidos', ['status'], unique=False, if_not_exists=True)
+    op.create_index(
+        'ix_itens_pedidos_pedido_sabor_tamanho',
+        'itens_pedidos',
+        ['pedido_id', 'sabor', 'tamanho'],
+        unique=False,
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_itens_pedidos_pedido_sabor_tamanho', table_name='itens_pedidos')
+    op.drop_index(op.f('ix_pedidos_status'), table_name='pedidos')
+    op.drop_index(op.f('ix_pedidos_usuario_id'), table_name='pedidos')
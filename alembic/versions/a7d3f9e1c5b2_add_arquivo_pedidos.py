@@ -0,0 +1,65 @@
+"""add arquivo pedidos
+
+Revision ID: a7d3f9e1c5b2
+Revises: f2c4e6a8b0d1
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3f9e1c5b2'
+down_revision: Union[str, Sequence[str], None] = 'f2c4e6a8b0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # recria as tabelas com AUTOINCREMENT: sem isso o sqlite reutiliza o
+        # maior id quando a última linha é movida para o arquivo
+        with op.batch_alter_table('pedidos', recreate='always', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+            batch_op.add_column(sa.Column('finalizado_em', sa.DateTime(), nullable=True))
+        with op.batch_alter_table('itens_pedidos', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+    else:
+        op.add_column('pedidos', sa.Column('finalizado_em', sa.DateTime(), nullable=True))
+
+    op.create_table('pedidos_arquivo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('usuario_id', sa.Integer(), nullable=True),
+    sa.Column('preco', sa.Float(), nullable=False),
+    sa.Column('status', sa.String(length=255), nullable=True),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.Column('finalizado_em', sa.DateTime(), nullable=True),
+    sa.Column('arquivado_em', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['usuario_id'], ['usuarios.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pedidos_arquivo_usuario_id'), 'pedidos_arquivo', ['usuario_id'], unique=False)
+    op.create_table('itens_pedidos_arquivo',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('pedido_id', sa.Integer(), nullable=False),
+    sa.Column('sabor', sa.String(), nullable=False),
+    sa.Column('tamanho', sa.String(), nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=False),
+    sa.Column('preco_unitario', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['pedido_id'], ['pedidos_arquivo.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_itens_pedidos_arquivo_pedido_id'), 'itens_pedidos_arquivo', ['pedido_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_itens_pedidos_arquivo_pedido_id'), table_name='itens_pedidos_arquivo')
+    op.drop_table('itens_pedidos_arquivo')
+    op.drop_index(op.f('ix_pedidos_arquivo_usuario_id'), table_name='pedidos_arquivo')
+    op.drop_table('pedidos_arquivo')
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.drop_column('finalizado_em')
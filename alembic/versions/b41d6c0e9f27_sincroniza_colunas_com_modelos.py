@@ -0,0 +1,64 @@
+"""sincroniza colunas com modelos
+
+Revision ID: b41d6c0e9f27
+Revises: 5e1f2d9d3a4b
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41d6c0e9f27'
+down_revision: Union[str, Sequence[str], None] = '5e1f2d9d3a4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _colunas(tabela: str) -> set:
+    return {col["name"] for col in sa.inspect(op.get_bind()).get_columns(tabela)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # bancos criados por create_all já têm essas colunas: só adiciona o que falta
+    colunas_usuarios = _colunas('usuarios')
+    with op.batch_alter_table('usuarios') as batch_op:
+        if 'ativo' not in colunas_usuarios:
+            batch_op.add_column(sa.Column('ativo', sa.Boolean(), nullable=False, server_default=sa.true()))
+        if 'admin' not in colunas_usuarios:
+            batch_op.add_column(sa.Column('admin', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+    colunas_itens = _colunas('itens_pedidos')
+    with op.batch_alter_table('itens_pedidos') as batch_op:
+        if 'sabor' not in colunas_itens:
+            batch_op.add_column(sa.Column('sabor', sa.String(), nullable=False, server_default=''))
+        if 'tamanho' not in colunas_itens:
+            batch_op.add_column(sa.Column('tamanho', sa.String(), nullable=False, server_default=''))
+        if 'preco_unitario' not in colunas_itens:
+            batch_op.add_column(sa.Column('preco_unitario', sa.Float(), nullable=False, server_default='0'))
+
+    if 'nome_item' in colunas_itens:
+        op.execute("UPDATE itens_pedidos SET sabor = nome_item WHERE sabor = ''")
+        with op.batch_alter_table('itens_pedidos') as batch_op:
+            batch_op.drop_column('nome_item')
+            batch_op.alter_column('pedido_id', existing_type=sa.Integer(), nullable=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('itens_pedidos') as batch_op:
+        batch_op.add_column(sa.Column('nome_item', sa.String(), nullable=False, server_default=''))
+    op.execute("UPDATE itens_pedidos SET nome_item = sabor")
+    with op.batch_alter_table('itens_pedidos') as batch_op:
+        batch_op.drop_column('preco_unitario')
+        batch_op.drop_column('tamanho')
+        batch_op.drop_column('sabor')
+        batch_op.alter_column('pedido_id', existing_type=sa.Integer(), nullable=True)
+
+    with op.batch_alter_table('usuarios') as batch_op:
+        batch_op.drop_column('admin')
+        batch_op.drop_column('ativo')
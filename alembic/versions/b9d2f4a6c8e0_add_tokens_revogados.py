@@ -0,0 +1,37 @@
+"""add tokens revogados
+
+Revision ID: b9d2f4a6c8e0
+Revises: c3e8b1d5f7a9
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b9d2f4a6c8e0'
+down_revision: Union[str, Sequence[str], None] = 'c3e8b1d5f7a9'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('tokens_revogados',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('jti', sa.String(), nullable=False),
+    sa.Column('expira_em', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('jti'),
+    sqlite_autoincrement=True
+    )
+    op.create_index(op.f('ix_tokens_revogados_expira_em'), 'tokens_revogados', ['expira_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_tokens_revogados_expira_em'), table_name='tokens_revogados')
+    op.drop_table('tokens_revogados')
@@ -0,0 +1,94 @@
+"""add resumo vendas
+
+Revision ID: c3e8b1d5f7a9
+Revises: a7d3f9e1c5b2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8b1d5f7a9'
+down_revision: Union[str, Sequence[str], None] = 'a7d3f9e1c5b2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# pedidos sem criado_em (anteriores a esta migração) entram em 1970-01-01;
+# pedidos com status fora de fechado/cancelado contam como "aberto"
+_PEDIDOS = """
+    SELECT COALESCE(date(p.criado_em), '1970-01-01') AS dia,
+           CASE WHEN p.status IN ('fechado', 'cancelado') THEN p.status ELSE 'aberto' END AS situacao,
+           (SELECT COALESCE(SUM(i.quantidade * i.preco_unitario), 0)
+              FROM {itens} i WHERE i.pedido_id = p.id) AS receita
+      FROM {pedidos} p
+"""
+
+_ITENS = """
+    SELECT COALESCE(date(p.criado_em), '1970-01-01') AS dia,
+           CASE WHEN p.status IN ('fechado', 'cancelado') THEN p.status ELSE 'aberto' END AS situacao,
+           lower(trim(i.sabor)) AS sabor,
+           lower(trim(i.tamanho)) AS tamanho,
+           i.quantidade AS quantidade,
+           i.quantidade * i.preco_unitario AS receita
+      FROM {itens} i JOIN {pedidos} p ON p.id = i.pedido_id
+"""
+
+
+def _atuais_e_arquivados(consulta: str) -> str:
+    return (
+        consulta.format(pedidos='pedidos', itens='itens_pedidos')
+        + ' UNION ALL '
+        + consulta.format(pedidos='pedidos_arquivo', itens='itens_pedidos_arquivo')
+    )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pedidos', sa.Column('criado_em', sa.DateTime(), nullable=True))
+    op.add_column('pedidos_arquivo', sa.Column('criado_em', sa.DateTime(), nullable=True))
+
+    op.create_table('resumo_vendas',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('situacao', sa.String(), nullable=False),
+    sa.Column('pedidos', sa.Integer(), nullable=False),
+    sa.Column('receita', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'situacao')
+    )
+    op.create_table('resumo_vendas_itens',
+    sa.Column('dia', sa.Date(), nullable=False),
+    sa.Column('situacao', sa.String(), nullable=False),
+    sa.Column('sabor', sa.String(), nullable=False),
+    sa.Column('tamanho', sa.String(), nullable=False),
+    sa.Column('quantidade', sa.Integer(), nullable=False),
+    sa.Column('receita', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('dia', 'situacao', 'sabor', 'tamanho')
+    )
+
+    # carga inicial a partir dos pedidos existentes; depois as rotas mantêm os totais
+    op.execute(
+        'INSERT INTO resumo_vendas (dia, situacao, pedidos, receita) '
+        'SELECT dia, situacao, COUNT(*), SUM(receita) FROM ('
+        + _atuais_e_arquivados(_PEDIDOS)
+        + ') base GROUP BY dia, situacao'
+    )
+    op.execute(
+        'INSERT INTO resumo_vendas_itens (dia, situacao, sabor, tamanho, quantidade, receita) '
+        'SELECT dia, situacao, sabor, tamanho, SUM(quantidade), SUM(receita) FROM ('
+        + _atuais_e_arquivados(_ITENS)
+        + ') base GROUP BY dia, situacao, sabor, tamanho'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('resumo_vendas_itens')
+    op.drop_table('resumo_vendas')
+    with op.batch_alter_table('pedidos_arquivo') as batch_op:
+        batch_op.drop_column('criado_em')
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.drop_column('criado_em')
@@ -0,0 +1,34 @@
+"""eventos pedidos autoincrement
+
+Revision ID: d5f7b9c1e3a2
+Revises: b9d2f4a6c8e0
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5f7b9c1e3a2'
+down_revision: Union[str, Sequence[str], None] = 'b9d2f4a6c8e0'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        # recria a tabela com AUTOINCREMENT: os workers leem os eventos por id,
+        # e sem isso o sqlite pode reutilizar o maior id depois de uma limpeza
+        with op.batch_alter_table('eventos_pedidos', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+            pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'sqlite':
+        with op.batch_alter_table('eventos_pedidos', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+            pass
@@ -0,0 +1,66 @@
+"""add catalogo produtos
+
+Revision ID: d83f5a2c6b14
+Revises: 7c2b8e4f1a90
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd83f5a2c6b14'
+down_revision: Union[str, Sequence[str], None] = '7c2b8e4f1a90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# preços que antes ficavam fixos em order_routes.TABELA_PRECOS_PIZZA
+PRECOS_INICIAIS = [
+    ("calabresa", "pequeno", 30.0),
+    ("calabresa", "medio", 40.0),
+    ("calabresa", "grande", 50.0),
+    ("marguerita", "pequeno", 32.0),
+    ("marguerita", "medio", 42.0),
+    ("marguerita", "grande", 52.0),
+    ("frango catupiry", "pequeno", 35.0),
+    ("frango catupiry", "medio", 45.0),
+    ("frango catupiry", "grande", 55.0),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    produtos = op.create_table('produtos',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sabor', sa.String(), nullable=False),
+    sa.Column('tamanho', sa.String(), nullable=False),
+    sa.Column('preco', sa.Float(), nullable=False),
+    sa.Column('ativo', sa.Boolean(), nullable=False, server_default=sa.true()),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sabor', 'tamanho')
+    )
+    op.create_index(op.f('ix_produtos_id'), 'produtos', ['id'], unique=False)
+    catalogo_versao = op.create_table('catalogo_versao',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('versao', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    op.bulk_insert(
+        produtos,
+        [
+            {"sabor": sabor, "tamanho": tamanho, "preco": preco, "ativo": True}
+            for sabor, tamanho, preco in PRECOS_INICIAIS
+        ],
+    )
+    op.bulk_insert(catalogo_versao, [{"id": 1, "versao": 1}])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('catalogo_versao')
+    op.drop_index(op.f('ix_produtos_id'), table_name='produtos')
+    op.drop_table('produtos')
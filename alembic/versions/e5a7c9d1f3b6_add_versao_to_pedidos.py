@@ -0,0 +1,29 @@
+"""add versao to pedidos
+
+Revision ID: e5a7c9d1f3b6
+Revises: d83f5a2c6b14
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9d1f3b6'
+down_revision: Union[str, Sequence[str], None] = 'd83f5a2c6b14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('pedidos', sa.Column('versao', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('pedidos') as batch_op:
+        batch_op.drop_column('versao')
@@ -0,0 +1,33 @@
+"""add indices criado_em
+
+Revision ID: e7a9c1d3f5b8
+Revises: d5f7b9c1e3a2
+Create Date: 2026-10-18 00:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a9c1d3f5b8'
+down_revision: Union[str, Sequence[str], None] = 'd5f7b9c1e3a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # reconstruir_resumo refaz o resumo dia a dia e busca os pedidos de cada dia por criado_em
+    op.create_index(op.f('ix_pedidos_criado_em'), 'pedidos', ['criado_em'], unique=False, if_not_exists=True)
+    op.create_index(
+        op.f('ix_pedidos_arquivo_criado_em'), 'pedidos_arquivo', ['criado_em'], unique=False, if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_pedidos_arquivo_criado_em'), table_name='pedidos_arquivo')
+    op.drop_index(op.f('ix_pedidos_criado_em'), table_name='pedidos')
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+from datetime import timedelta
+
+from anyio import to_thread
+from sqlalchemy import delete, insert, literal, or_, select
+
+from cache_pedidos import invalidar_pedidos
+from config import (
+    ARQUIVAMENTO_INTERVALO_SEGUNDOS,
+    ARQUIVAMENTO_LOTE,
+    ARQUIVAMENTO_PAUSA_MS,
+    ARQUIVAR_APOS_HORAS,
+)
+from database import SessionLocal
+from metricas import Contador
+from models import (
+    STATUS_FINAIS,
+    ItemPedido,
+    ItemPedidoArquivado,
+    Pedido,
+    PedidoArquivado,
+    agora_utc,
+)
+
+logger = logging.getLogger(__name__)
+
+pedidos_arquivados = Contador("orders_archived_total", "Pedidos movidos para pedidos_arquivo")
+
+
+def arquivar_lote(db, corte, limite: int) -> int:
+    """Move até `limite` pedidos finalizados antes de `corte` para as tabelas de arquivo.
+
+    Pedidos em status final não mudam mais, então copiar e apagar na mesma
+    transação não disputa com as rotas.
+    """
+    ids = db.scalars(
+        select(Pedido.id)
+        .where(
+            Pedido.status.in_(STATUS_FINAIS),
+            # pedidos de antes da coluna finalizado_em não têm a data
+            or_(Pedido.finalizado_em.is_(None), Pedido.finalizado_em < corte),
+        )
+        .order_by(Pedido.id)
+        .limit(limite)
+    ).all()
+    if not ids:
+        return 0
+
+    pedidos = Pedido.__table__
+    itens = ItemPedido.__table__
+    colunas_pedido = [coluna.name for coluna in pedidos.columns]
+    colunas_item = [coluna.name for coluna in itens.columns]
+
+    db.execute(
+        insert(PedidoArquivado).from_select(
+            colunas_pedido + ["arquivado_em"],
+            select(*pedidos.columns, literal(agora_utc())).where(pedidos.c.id.in_(ids)),
+        )
+    )
+    db.execute(
+        insert(ItemPedidoArquivado).from_select(
+            colunas_item,
+            select(*itens.columns).where(itens.c.pedido_id.in_(ids)),
+        )
+    )
+    db.execute(delete(itens).where(itens.c.pedido_id.in_(ids)))
+    db.execute(delete(pedidos).where(pedidos.c.id.in_(ids)))
+    # sem historico=true, GET /orders/pedido/{id} passa a responder 404
+    invalidar_pedidos(db, ids)
+    db.commit()
+
+    pedidos_arquivados.inc(valor=len(ids))
+    return len(ids)
+
+
+def _arquivar_proximo_lote() -> int:
+    corte = agora_utc() - timedelta(hours=ARQUIVAR_APOS_HORAS)
+    with SessionLocal() as db:
+        return arquivar_lote(db, corte, ARQUIVAMENTO_LOTE)
+
+
+async def arquivar_pendentes() -> int:
+    # um lote por transação, com uma pausa entre eles para as rotas escreverem
+    total = 0
+    while True:
+        movidos = await to_thread.run_sync(_arquivar_proximo_lote)
+        total += movidos
+        if movidos < ARQUIVAMENTO_LOTE:
+            return total
+        await asyncio.sleep(ARQUIVAMENTO_PAUSA_MS / 1000)
+
+
+async def monitorar_arquivamento(intervalo: float = ARQUIVAMENTO_INTERVALO_SEGUNDOS) -> None:
+    if intervalo <= 0:
+        return
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            movidos = await arquivar_pendentes()
+            if movidos:
+                logger.info("%d pedidos arquivados", movidos)
+        except Exception:
+            logger.exception("Falha ao arquivar pedidos")
+
+
+if __name__ == "__main__":
+    print(f"{asyncio.run(arquivar_pendentes())} pedidos arquivados")
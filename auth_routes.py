@@ -1,17 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from models import Usuario
-from dependencies import get_db, bcrypt_context, verificar_token
-from schemas import UsuarioSchema, LoginSchema
+from dependencies import (
+    UsuarioAutenticado,
+    decodificar_token,
+    get_db,
+    oauth2_scheme,
+    obter_usuario_autenticado,
+    verificar_token,
+)
+from senhas import gerar_hash_senha, verificar_senha, verificar_senha_ficticia
+from limite_login import verificar_limite_login
+from revogacao import revogar_token
+from schemas import UsuarioSchema, LoginSchema, LogoutSchema
 from jose import jwt
 from datetime import datetime, timedelta, timezone
 from fastapi.security import OAuth2PasswordRequestForm
-from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES, REFRESH_TOKEN_EXPIRE_DAYS
 
 auth_router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-def criar_token(id_usuario: int, duracao_token: timedelta | None = None) -> str:
+def criar_token(id_usuario: int, duracao_token: timedelta | None = None, tipo: str = "access") -> str:
     if duracao_token is None:
         duracao_token = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
@@ -20,18 +34,55 @@ def criar_token(id_usuario: int, duracao_token: timedelta | None = None) -> str:
     dic_info = {
         "sub": str(id_usuario),
         "exp": data_expiracao,
+        # "typ" impede que um token seja usado no lugar do outro; "jti" permite revogá-lo
+        "typ": tipo,
+        "jti": uuid.uuid4().hex,
     }
     token_jwt = jwt.encode(dic_info, SECRET_KEY, algorithm=ALGORITHM)
     return token_jwt
 
 
-def autenticar_usuario(email: str, senha: str, db: Session):
-    usuario = db.query(Usuario).filter(Usuario.email == email).first()
+# o Session é síncrono: as rotas async chamam as funções abaixo via
+# run_in_threadpool para não bloquear o event loop durante as queries
+def _buscar_usuario_por_email(email: str, db: Session):
+    return db.query(Usuario).filter(Usuario.email == email).first()
+
+
+def _salvar_usuario(usuario: Usuario, db: Session) -> Usuario:
+    db.add(usuario)
+    db.commit()
+    return usuario
+
+
+def criar_refresh_token(id_usuario: int) -> str:
+    return criar_token(id_usuario, timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS), tipo="refresh")
+
+
+def _revogar(payload: dict, db: Session) -> bool:
+    # False se o token já estava revogado (o jti é único na tabela)
+    revogar_token(db, payload["jti"], payload["exp"])
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    return True
+
+
+def _ip_cliente(request: Request):
+    return request.client.host if request.client else None
+
+
+async def autenticar_usuario(email: str, senha: str, db: Session, ip: str | None = None):
+    await verificar_limite_login(ip, email)
+
+    usuario = await run_in_threadpool(_buscar_usuario_por_email, email, db)
 
     if not usuario:
+        await verificar_senha_ficticia(senha)
         return None
 
-    if not bcrypt_context.verify(senha, usuario.senha):
+    if not await verificar_senha(senha, usuario.senha):
         return None
 
     return usuario
@@ -50,11 +101,11 @@ async def criar_conta(usuario_schema: UsuarioSchema, db: Session = Depends(get_d
     admin = usuario_schema.admin
     ativo = usuario_schema.ativo
 
-    usuario_existente = db.query(Usuario).filter(Usuario.email == email).first()
+    usuario_existente = await run_in_threadpool(_buscar_usuario_por_email, email, db)
     if usuario_existente:
         raise HTTPException(status_code=400, detail="Já existe um usuário com esse email")
 
-    senha_criptografada = bcrypt_context.hash(senha)
+    senha_criptografada = await gerar_hash_senha(senha)
 
     novo_usuario = Usuario(
         nome=nome,
@@ -63,9 +114,7 @@ async def criar_conta(usuario_schema: UsuarioSchema, db: Session = Depends(get_d
         admin=admin,
         ativo=ativo,
     )
-    db.add(novo_usuario)
-    db.commit()
-    db.refresh(novo_usuario)
+    novo_usuario = await run_in_threadpool(_salvar_usuario, novo_usuario, db)
 
     return {
         "mensagem": "Usuário cadastrado com sucesso",
@@ -75,14 +124,14 @@ async def criar_conta(usuario_schema: UsuarioSchema, db: Session = Depends(get_d
     }
 
 @auth_router.post("/login")
-async def login(login_schema: LoginSchema, db: Session = Depends(get_db)):
-    usuario = autenticar_usuario(login_schema.email, login_schema.senha, db)
+async def login(login_schema: LoginSchema, request: Request, db: Session = Depends(get_db)):
+    usuario = await autenticar_usuario(login_schema.email, login_schema.senha, db, _ip_cliente(request))
 
     if not usuario:
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
 
-    access_token = criar_token(usuario.id, duracao_token=timedelta(days=7))
-    refresh_token = criar_token(usuario.id)
+    access_token = criar_token(usuario.id)
+    refresh_token = criar_refresh_token(usuario.id)
 
     return {
         "mensagem": "Login realizado com sucesso",
@@ -94,28 +143,64 @@ async def login(login_schema: LoginSchema, db: Session = Depends(get_db)):
 
 @auth_router.post("/login-form")
 async def login_form(
+    request: Request,
     dados_formulario: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db),
 ):
     # OAuth2PasswordRequestForm usa "username", mas você está autenticando por email
-    usuario = autenticar_usuario(dados_formulario.username, dados_formulario.password, db)
+    usuario = await autenticar_usuario(
+        dados_formulario.username, dados_formulario.password, db, _ip_cliente(request)
+    )
 
     if not usuario:
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
 
-    access_token = criar_token(usuario.id, duracao_token=timedelta(days=7))
+    access_token = criar_token(usuario.id)
 
     # 🔴 IMPORTANTE: resposta no formato que o OAuth2PasswordBearer espera
     return {
         "access_token": access_token,
         "token_type": "bearer",
+        "refresh_token": criar_refresh_token(usuario.id),
     }   
 
 
 @auth_router.get("/refresh")
-async def use_refresh_token(usuario: Usuario = Depends(verificar_token)):
-    access_token = criar_token(usuario.id)
+async def use_refresh_token(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    # recebe o refresh token no header Authorization e o troca por um par novo;
+    # o usado é revogado, então cada refresh token vale uma vez só
+    usuario = await run_in_threadpool(obter_usuario_autenticado, token, db, "refresh")
+    if not await run_in_threadpool(_revogar, jwt.get_unverified_claims(token), db):
+        # outra requisição usou o mesmo refresh token primeiro
+        raise HTTPException(
+            status_code=401,
+            detail="Acesso negado, verifique a validade do token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
     return {
-        "access_token": access_token,
+        "access_token": criar_token(usuario.id),
         "token_type": "bearer",
+        "refresh_token": criar_refresh_token(usuario.id),
     }
+
+
+@auth_router.post("/logout")
+async def logout(
+    dados: LogoutSchema | None = None,
+    token: str = Depends(oauth2_scheme),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
+    db: Session = Depends(get_db),
+):
+    payloads = [jwt.get_unverified_claims(token)]
+    if dados is not None and dados.refresh_token:
+        payload_refresh = decodificar_token(dados.refresh_token, "refresh")
+        if payload_refresh["sub"] != str(usuario.id):
+            raise HTTPException(status_code=400, detail="O refresh token é de outro usuário")
+        payloads.append(payload_refresh)
+
+    for payload in payloads:
+        # tokens anteriores ao jti não podem ser revogados; expiram sozinhos
+        if "jti" in payload:
+            await run_in_threadpool(_revogar, payload, db)
+    return {"mensagem": "Logout realizado com sucesso"}
@@ -0,0 +1,316 @@
+"""Gerador de carga assíncrono para a API de pedidos.
+
+Uso:
+    python -m benchmarks.carga --concorrencia 50 --requisicoes 20000
+    python -m benchmarks.carga --url http://localhost:8000 --duracao 60
+    python -m benchmarks.carga --gravar trafego.jsonl
+    python -m benchmarks.carga --reproduzir trafego.jsonl
+
+Sem --url a aplicação roda no mesmo processo (httpx + ASGITransport), o que
+mede o custo do código da API sem ruído de rede. Cada usuário virtual faz login
+com a conta gerada por benchmarks.dados (criando-a se não existir) e executa
+cenários sorteados conforme PESOS_CENARIOS. Com --url, todos os usuários saem
+do mesmo IP: suba o servidor com LOGIN_LIMITE_IP_CAPACIDADE alto.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from contextlib import AsyncExitStack
+
+import httpx
+from jose import jwt
+
+from benchmarks.dados import SENHA_PADRAO, email_usuario
+from benchmarks.relatorio import imprimir, montar_relatorio, salvar
+
+# mistura de tráfego: leitura domina, como num cardápio/acompanhamento de pedido
+PESOS_CENARIOS = {
+    "login": 5,
+    "criar_pedido": 20,
+    "adicionar_item": 20,
+    "remover_item": 10,
+    "listar": 25,
+    "obter": 15,
+    "finalizar": 5,
+}
+
+# o usuário 1 é o admin criado por benchmarks.dados
+INDICE_ADMIN = 1
+
+
+class UsuarioVirtual:
+    def __init__(self, indice: int, rng: random.Random):
+        self.indice = indice
+        self.email = email_usuario(indice)
+        self.rng = rng
+        self.token = None
+        self.usuario_id = None
+        # pedidos em aberto criados nesta execução: id -> {(sabor, tamanho): quantidade}
+        self.pedidos = {}
+
+    @property
+    def cabecalhos(self) -> dict:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+class Carga:
+    def __init__(self, cliente: httpx.AsyncClient, produtos: list, gravacao=None):
+        self.cliente = cliente
+        self.produtos = produtos
+        self.gravacao = gravacao
+        self.resultados = []
+        self.token_admin = None
+
+    async def _chamar(self, cenario: str, metodo: str, url: str, **kwargs) -> httpx.Response | None:
+        inicio = time.perf_counter()
+        try:
+            resposta = await self.cliente.request(metodo, url, **kwargs)
+            status = resposta.status_code
+        except httpx.HTTPError:
+            resposta = None
+            status = 0
+        self.resultados.append((cenario, status, time.perf_counter() - inicio))
+        return resposta
+
+    async def _insistir(self, cenario: str, metodo: str, url: str, **kwargs) -> httpx.Response | None:
+        # sem conta e token o usuário virtual não anda: sob sobrecarga ou limite
+        # de login, respeita o Retry-After do 503/429 e tenta de novo
+        while True:
+            resposta = await self._chamar(cenario, metodo, url, **kwargs)
+            if resposta is None or resposta.status_code not in (429, 503):
+                return resposta
+            await asyncio.sleep(float(resposta.headers.get("retry-after", 1)))
+
+    async def autenticar(self, usuario: UsuarioVirtual) -> None:
+        corpo = {"email": usuario.email, "senha": SENHA_PADRAO}
+        resposta = await self._insistir("login", "POST", "/auth/login", json=corpo)
+        if resposta is not None and resposta.status_code == 401:
+            await self._insistir(
+                "criar_conta",
+                "POST",
+                "/auth/criar_conta",
+                json={
+                    "nome": f"Usuário {usuario.indice}",
+                    "admin": usuario.indice == INDICE_ADMIN,
+                    **corpo,
+                },
+            )
+            resposta = await self._insistir("login", "POST", "/auth/login", json=corpo)
+        if resposta is None or resposta.status_code != 200:
+            status = resposta.status_code if resposta is not None else "sem resposta"
+            raise RuntimeError(f"não foi possível autenticar {usuario.email} ({status})")
+
+        usuario.token = resposta.json()["token"]
+        usuario.usuario_id = int(jwt.get_unverified_claims(usuario.token)["sub"])
+
+    def sortear_passo(self, usuario: UsuarioVirtual) -> dict:
+        """Escolhe o próximo cenário e seus parâmetros (é isso que --gravar registra)."""
+        rng = usuario.rng
+        cenario = rng.choices(list(PESOS_CENARIOS), list(PESOS_CENARIOS.values()))[0]
+        sabor, tamanho = rng.choice(self.produtos)
+        return {
+            "cenario": cenario,
+            "sabor": sabor,
+            "tamanho": tamanho,
+            "quantidade": rng.randint(1, 3),
+            # posição relativa na lista de pedidos do usuário, resolvida na execução
+            "escolha": rng.random(),
+        }
+
+    def _escolher_pedido(self, usuario: UsuarioVirtual, escolha: float, com_itens: bool = False):
+        candidatos = [id_pedido for id_pedido, itens in usuario.pedidos.items() if itens or not com_itens]
+        if not candidatos:
+            return None
+        return candidatos[int(escolha * len(candidatos))]
+
+    async def executar_passo(self, usuario: UsuarioVirtual, passo: dict) -> None:
+        cenario = passo["cenario"]
+        item = {"sabor": passo["sabor"], "tamanho": passo["tamanho"], "quantidade": passo["quantidade"]}
+
+        if cenario == "login":
+            # novo login no meio da carga: um 429 do limite por email fica no
+            # relatório e o usuário segue com o token que já tinha
+            resposta = await self._chamar(
+                cenario, "POST", "/auth/login", json={"email": usuario.email, "senha": SENHA_PADRAO}
+            )
+            if resposta is not None and resposta.status_code == 200:
+                usuario.token = resposta.json()["token"]
+            return
+
+        if cenario == "listar":
+            await self._chamar(cenario, "GET", "/orders/lista", params={"limite": 50}, headers=usuario.cabecalhos)
+            return
+
+        # cenários que dependem de um pedido existente caem para criar_pedido
+        # enquanto o usuário ainda não tem nenhum
+        id_pedido = self._escolher_pedido(usuario, passo["escolha"], com_itens=cenario == "remover_item")
+        if id_pedido is None:
+            cenario = "criar_pedido"
+
+        if cenario == "criar_pedido":
+            resposta = await self._chamar(
+                cenario,
+                "POST",
+                "/orders/pedido",
+                json={"usuario_id": usuario.usuario_id, **item},
+                headers=usuario.cabecalhos,
+            )
+            if resposta is not None and resposta.status_code == 201:
+                usuario.pedidos[resposta.json()["id"]] = {(item["sabor"], item["tamanho"]): item["quantidade"]}
+
+        elif cenario == "adicionar_item":
+            resposta = await self._chamar(
+                cenario,
+                "POST",
+                f"/orders/pedido/adicionar-item/{id_pedido}",
+                json=item,
+                headers=usuario.cabecalhos,
+            )
+            if resposta is not None and resposta.status_code == 200:
+                itens = usuario.pedidos[id_pedido]
+                chave = (item["sabor"], item["tamanho"])
+                itens[chave] = itens.get(chave, 0) + item["quantidade"]
+
+        elif cenario == "remover_item":
+            itens = usuario.pedidos[id_pedido]
+            (sabor, tamanho), quantidade_atual = next(iter(itens.items()))
+            quantidade = min(item["quantidade"], quantidade_atual)
+            resposta = await self._chamar(
+                cenario,
+                "POST",
+                f"/orders/pedido/remover-item/{id_pedido}",
+                json={"sabor": sabor, "tamanho": tamanho, "quantidade": quantidade},
+                headers=usuario.cabecalhos,
+            )
+            if resposta is not None and resposta.status_code == 200:
+                if quantidade == quantidade_atual:
+                    del itens[(sabor, tamanho)]
+                else:
+                    itens[(sabor, tamanho)] = quantidade_atual - quantidade
+
+        elif cenario == "obter":
+            await self._chamar(cenario, "GET", f"/orders/pedido/{id_pedido}", headers=usuario.cabecalhos)
+
+        elif cenario == "finalizar":
+            resposta = await self._chamar(
+                cenario,
+                "POST",
+                f"/orders/pedido/finalizar/{id_pedido}",
+                headers={"Authorization": f"Bearer {self.token_admin}"},
+            )
+            if resposta is not None and resposta.status_code == 200:
+                del usuario.pedidos[id_pedido]
+
+    async def rodar_usuario(self, usuario: UsuarioVirtual, passos, parar) -> None:
+        await self.autenticar(usuario)
+        for passo in passos:
+            if parar():
+                return
+            if self.gravacao is not None:
+                self.gravacao.write(json.dumps({"usuario": usuario.indice, **passo}) + "\n")
+            await self.executar_passo(usuario, passo)
+
+
+def _passos_sorteados(carga: Carga, usuario: UsuarioVirtual):
+    while True:
+        yield carga.sortear_passo(usuario)
+
+
+def _carregar_gravacao(caminho: str) -> dict:
+    passos_por_usuario = {}
+    with open(caminho) as arquivo:
+        for linha in arquivo:
+            passo = json.loads(linha)
+            passos_por_usuario.setdefault(passo.pop("usuario"), []).append(passo)
+    return passos_por_usuario
+
+
+async def executar(args) -> dict:
+    async with AsyncExitStack() as pilha:
+        if args.url:
+            transporte = httpx.AsyncHTTPTransport()
+            base_url = args.url
+        else:
+            import limite_login
+            import main
+
+            # todos os usuários virtuais saem do mesmo "IP"; o limite por IP
+            # barraria a carga logo nos primeiros logins
+            limite_login.balde_ip.capacidade = 10**9
+            await pilha.enter_async_context(main.app.router.lifespan_context(main.app))
+            # exceções da app viram 500 no relatório em vez de derrubar a carga
+            transporte = httpx.ASGITransport(app=main.app, raise_app_exceptions=False)
+            base_url = "http://benchmark"
+
+        limites = httpx.Limits(max_connections=args.concorrencia)
+        cliente = await pilha.enter_async_context(
+            httpx.AsyncClient(transport=transporte, base_url=base_url, limits=limites, timeout=60)
+        )
+        gravacao = pilha.enter_context(open(args.gravar, "w")) if args.gravar else None
+        carga = Carga(cliente, [], gravacao)
+
+        admin = UsuarioVirtual(INDICE_ADMIN, random.Random(args.semente))
+        await carga.autenticar(admin)
+        carga.token_admin = admin.token
+        resposta = await cliente.get("/produtos/", headers=admin.cabecalhos)
+        carga.produtos = [(p["sabor"], p["tamanho"]) for p in resposta.json()["produtos"]]
+        carga.resultados.clear()
+
+        if args.reproduzir:
+            passos_por_usuario = _carregar_gravacao(args.reproduzir)
+            usuarios = [UsuarioVirtual(indice, random.Random()) for indice in sorted(passos_por_usuario)]
+            fontes = [passos_por_usuario[usuario.indice] for usuario in usuarios]
+        else:
+            # usuários a partir do 2 para não misturar carga com o admin
+            usuarios = [
+                UsuarioVirtual(indice, random.Random(args.semente + indice))
+                for indice in range(INDICE_ADMIN + 1, INDICE_ADMIN + 1 + args.concorrencia)
+            ]
+            fontes = [_passos_sorteados(carga, usuario) for usuario in usuarios]
+
+        limite_tempo = time.perf_counter() + args.duracao if args.duracao else None
+
+        def parar() -> bool:
+            if limite_tempo is not None:
+                return time.perf_counter() >= limite_tempo
+            return not args.reproduzir and len(carga.resultados) >= args.requisicoes
+
+        inicio = time.perf_counter()
+        await asyncio.gather(
+            *(carga.rodar_usuario(usuario, fonte, parar) for usuario, fonte in zip(usuarios, fontes))
+        )
+        duracao = time.perf_counter() - inicio
+
+    parametros = {
+        "url": args.url or "in-process",
+        "concorrencia": len(usuarios),
+        "requisicoes": args.requisicoes,
+        "duracao": args.duracao,
+        "semente": args.semente,
+        "reproduzir": args.reproduzir,
+    }
+    return montar_relatorio(args.nome, carga.resultados, duracao, parametros)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="servidor alvo; sem isso roda a app no mesmo processo")
+    parser.add_argument("--concorrencia", type=int, default=20, help="usuários virtuais simultâneos")
+    parser.add_argument("--requisicoes", type=int, default=5000)
+    parser.add_argument("--duracao", type=float, help="segundos; tem prioridade sobre --requisicoes")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--gravar", help="registra os passos sorteados em JSONL")
+    parser.add_argument("--reproduzir", help="repete um tráfego gravado com --gravar")
+    parser.add_argument("--nome", default="carga")
+    parser.add_argument("--saida", default="benchmarks/resultados/carga.json")
+    args = parser.parse_args()
+
+    relatorio = asyncio.run(executar(args))
+    salvar(relatorio, args.saida)
+    imprimir(relatorio)
+
+
+if __name__ == "__main__":
+    main()
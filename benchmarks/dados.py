@@ -0,0 +1,136 @@
+"""Gera uma massa de dados sintética para testes de carga.
+
+Uso:
+    python -m benchmarks.dados --usuarios 10000 --pedidos 1000000
+
+Todos os usuários gerados têm a senha SENHA_PADRAO; o primeiro é admin.
+Os inserts são feitos em lotes com executemany, sem passar pelo ORM.
+"""
+import argparse
+import random
+import time
+
+from sqlalchemy import func, insert, select
+
+from catalogo import catalogo
+from database import SessionLocal, engine
+from migracoes import aplicar_migracoes
+from models import ItemPedido, Pedido, Usuario
+from relatorios import reconstruir_resumo
+from senhas import bcrypt_context
+
+SENHA_PADRAO = "senha-benchmark"
+DOMINIO_EMAIL = "bench.example.com"
+
+# distribuição aproximada de um banco em produção
+PESOS_STATUS = {"aberto": 0.6, "fechado": 0.3, "cancelado": 0.1}
+
+
+def email_usuario(indice: int) -> str:
+    return f"usuario{indice}@{DOMINIO_EMAIL}"
+
+
+def _proximo_id(conn, tabela) -> int:
+    return (conn.scalar(select(func.max(tabela.c.id))) or 0) + 1
+
+
+def gerar_usuarios(conn, quantidade: int, lote: int) -> tuple:
+    tabela = Usuario.__table__
+    # um hash só para todos: gerar milhões de hashes argon2 levaria horas
+    senha_hash = bcrypt_context.hash(SENHA_PADRAO)
+    primeiro_id = _proximo_id(conn, tabela)
+
+    for inicio in range(0, quantidade, lote):
+        linhas = [
+            {
+                "id": primeiro_id + indice,
+                "nome": f"Usuário {primeiro_id + indice}",
+                "email": email_usuario(primeiro_id + indice),
+                "senha": senha_hash,
+                "ativo": True,
+                "admin": primeiro_id + indice == 1,
+            }
+            for indice in range(inicio, min(inicio + lote, quantidade))
+        ]
+        conn.execute(insert(tabela), linhas)
+        conn.commit()
+
+    return primeiro_id, primeiro_id + quantidade - 1
+
+
+def gerar_pedidos(conn, quantidade: int, ids_usuarios: tuple, itens_por_pedido: int, lote: int, rng) -> None:
+    produtos = [(p["sabor"], p["tamanho"], p["preco"]) for p in catalogo.produtos()]
+    status = list(PESOS_STATUS)
+    pesos = list(PESOS_STATUS.values())
+
+    tabela_pedidos = Pedido.__table__
+    tabela_itens = ItemPedido.__table__
+    proximo_pedido = _proximo_id(conn, tabela_pedidos)
+    proximo_item = _proximo_id(conn, tabela_itens)
+
+    inicio_geral = time.perf_counter()
+    for inicio in range(0, quantidade, lote):
+        pedidos = []
+        itens = []
+        for _ in range(min(lote, quantidade - inicio)):
+            preco_total = 0.0
+            for _ in range(rng.randint(1, itens_por_pedido)):
+                sabor, tamanho, preco = rng.choice(produtos)
+                quantidade_item = rng.randint(1, 4)
+                preco_total += quantidade_item * preco
+                itens.append(
+                    {
+                        "id": proximo_item,
+                        "pedido_id": proximo_pedido,
+                        "sabor": sabor,
+                        "tamanho": tamanho,
+                        "quantidade": quantidade_item,
+                        "preco_unitario": preco,
+                    }
+                )
+                proximo_item += 1
+
+            pedidos.append(
+                {
+                    "id": proximo_pedido,
+                    "usuario_id": rng.randint(*ids_usuarios),
+                    "preco": preco_total,
+                    "status": rng.choices(status, pesos)[0],
+                    "versao": 1,
+                }
+            )
+            proximo_pedido += 1
+
+        conn.execute(insert(tabela_pedidos), pedidos)
+        conn.execute(insert(tabela_itens), itens)
+        conn.commit()
+
+        feitos = inicio + len(pedidos)
+        decorrido = time.perf_counter() - inicio_geral
+        print(f"{feitos}/{quantidade} pedidos ({feitos / decorrido:.0f} pedidos/s)", flush=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--usuarios", type=int, default=1000)
+    parser.add_argument("--pedidos", type=int, default=100_000)
+    parser.add_argument("--itens-por-pedido", type=int, default=3, help="máximo de itens por pedido")
+    parser.add_argument("--lote", type=int, default=10_000, help="linhas por INSERT executemany")
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    aplicar_migracoes(engine)
+    rng = random.Random(args.semente)
+
+    with engine.connect() as conn:
+        ids_usuarios = gerar_usuarios(conn, args.usuarios, args.lote)
+        print(f"{args.usuarios} usuários criados (ids {ids_usuarios[0]}-{ids_usuarios[1]})")
+        gerar_pedidos(conn, args.pedidos, ids_usuarios, args.itens_por_pedido, args.lote, rng)
+
+    # os INSERTs em massa não passam pelos hooks das rotas que mantêm o resumo de vendas
+    with SessionLocal() as db:
+        print(f"{reconstruir_resumo(db)} linhas de resumo de vendas refeitas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""Micro-benchmarks de partes isoladas da API.
+
+Uso:
+    python -m benchmarks.micro serializacao --pedidos 10000
+    python -m benchmarks.micro inicializacao --repeticoes 5
+    python -m benchmarks.micro escrita --pedidos 4000 --threads 40
+    python -m benchmarks.micro cache --leituras 20000 --threads 16
+    python -m benchmarks.micro lote --pedidos 5000 --tamanho-lote 500
+
+serializacao: compara montar dicts + jsonable_encoder + json.dumps (o caminho
+antigo das rotas) com validar via TypeAdapter e serializar com dump_json (o que
+o response_model faz hoje), sobre pedidos com itens carregados do banco.
+
+inicializacao: mede o import de main num processo novo e o tempo/consultas do
+lifespan (migrações + carga do catálogo).
+
+escrita: cria pedidos por criar_pedido a partir de várias threads, primeiro
+com um commit por pedido e depois com o group commit (escrita_agrupada). Para
+ver o efeito do fsync, rode também com SQLITE_SYNCHRONOUS=FULL.
+
+cache: lê GET /orders/pedido/{id} de várias threads sobre poucos pedidos
+"quentes", sem cache e com o cache de pedidos (cache_pedidos), e mostra a taxa
+de acerto. Depois solta todas as threads ao mesmo tempo sobre um pedido recém
+invalidado (stampede) e conta quantas leituras foram ao banco.
+
+lote: cria a mesma quantidade de pedidos (um item cada) primeiro com uma
+chamada de criar_pedido por pedido e depois com criar_pedidos_em_lote
+(POST /orders/pedidos/bulk) em lotes de --tamanho-lote, e compara a taxa.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import event, select
+
+from config import SQLITE_SYNCHRONOUS
+from database import SessionLocal, engine
+from dependencies import UsuarioAutenticado
+from models import Pedido
+from schemas import LotePedidosSchema, PedidoCreateSchema, PedidoSchema
+
+
+def _cronometrar(funcao, repeticoes: int) -> dict:
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {"min_ms": min(tempos) * 1000, "mediana_ms": statistics.median(tempos) * 1000}
+
+
+def _dict_pedido(pedido: Pedido) -> dict:
+    return {
+        "id": pedido.id,
+        "usuario_id": pedido.usuario_id,
+        "preco_total": pedido.preco,
+        "status": pedido.status.value if hasattr(pedido.status, "value") else pedido.status,
+        "itens": [
+            {
+                "id": item.id,
+                "pedido_id": item.pedido_id,
+                "sabor": item.sabor,
+                "tamanho": item.tamanho,
+                "quantidade": item.quantidade,
+                "preco_unitario": item.preco_unitario,
+                "subtotal": item.subtotal,
+            }
+            for item in pedido.itens
+        ],
+    }
+
+
+def serializacao(quantidade: int, repeticoes: int) -> None:
+    from order_routes import _query_pedidos
+
+    with SessionLocal() as db:
+        pedidos = _query_pedidos(db, com_itens=True).limit(quantidade).all()
+    if len(pedidos) < quantidade:
+        print(f"aviso: só há {len(pedidos)} pedidos no banco (rode benchmarks.dados)")
+
+    adaptador = TypeAdapter(List[PedidoSchema])
+
+    def caminho_antigo():
+        return json.dumps(jsonable_encoder([_dict_pedido(pedido) for pedido in pedidos])).encode()
+
+    def caminho_atual():
+        return adaptador.dump_json(adaptador.validate_python(pedidos, from_attributes=True))
+
+    print(f"{len(pedidos)} pedidos, {repeticoes} repetições")
+    for nome, funcao in (("dict + jsonable_encoder", caminho_antigo), ("TypeAdapter.dump_json", caminho_atual)):
+        resultado = _cronometrar(funcao, repeticoes)
+        print(f"  {nome:<26} min {resultado['min_ms']:8.1f} ms   mediana {resultado['mediana_ms']:8.1f} ms")
+
+
+def inicializacao(repeticoes: int) -> None:
+    tempos_import = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import main"], check=True)
+        tempos_import.append(time.perf_counter() - inicio)
+    print(f"  import main (processo novo)  mediana {statistics.median(tempos_import) * 1000:8.1f} ms")
+
+    import main
+
+    consultas = []
+
+    def contar(conn, cursor, statement, *args):
+        consultas.append(statement)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        tempos_lifespan = []
+        for _ in range(repeticoes):
+            consultas.clear()
+
+            async def ciclo():
+                async with main.app.router.lifespan_context(main.app):
+                    pass
+
+            inicio = time.perf_counter()
+            asyncio.run(ciclo())
+            tempos_lifespan.append(time.perf_counter() - inicio)
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+    print(
+        f"  lifespan (schema já em dia)  mediana {statistics.median(tempos_lifespan) * 1000:8.1f} ms"
+        f"   {len(consultas)} consultas"
+    )
+
+
+def escrita(quantidade: int, threads: int) -> None:
+    from catalogo import catalogo
+    from escrita_agrupada import agrupador_pedidos
+    from order_routes import criar_pedido
+
+    produto = catalogo.produtos()[0]
+    pedido_schema = PedidoCreateSchema(
+        usuario_id=1,
+        sabor=produto["sabor"],
+        tamanho=produto["tamanho"],
+        quantidade=1,
+    )
+    usuario = UsuarioAutenticado(id=1, admin=True, ativo=True)
+    por_thread = quantidade // threads
+
+    def trabalhador():
+        for _ in range(por_thread):
+            with SessionLocal() as db:
+                criar_pedido(pedido_schema, db, usuario)
+
+    def rodada() -> float:
+        trabalhadores = [threading.Thread(target=trabalhador) for _ in range(threads)]
+        inicio = time.perf_counter()
+        for trabalhador_thread in trabalhadores:
+            trabalhador_thread.start()
+        for trabalhador_thread in trabalhadores:
+            trabalhador_thread.join()
+        return time.perf_counter() - inicio
+
+    print(f"{por_thread * threads} pedidos, {threads} threads, synchronous={SQLITE_SYNCHRONOUS}")
+    duracao = rodada()
+    print(f"  commit por pedido  {por_thread * threads / duracao:8.0f} pedidos/s")
+
+    agrupador_pedidos.iniciar()
+    try:
+        duracao = rodada()
+    finally:
+        agrupador_pedidos.parar()
+    print(
+        f"  group commit       {por_thread * threads / duracao:8.0f} pedidos/s"
+        f"   (lote máximo {agrupador_pedidos.maximo}, espera {agrupador_pedidos.espera * 1000:.1f} ms)"
+    )
+
+
+def lote(quantidade: int, tamanho_lote: int) -> None:
+    from catalogo import catalogo
+    from order_routes import criar_pedido, criar_pedidos_em_lote
+
+    produto = catalogo.produtos()[0]
+    item = {"sabor": produto["sabor"], "tamanho": produto["tamanho"], "quantidade": 1}
+    pedido_schema = PedidoCreateSchema(usuario_id=1, **item)
+    lote_schema = LotePedidosSchema(pedidos=[{"usuario_id": 1, "itens": [item]}] * tamanho_lote)
+    usuario = UsuarioAutenticado(id=1, admin=True, ativo=True)
+    lotes = quantidade // tamanho_lote
+
+    def um_por_um():
+        with SessionLocal() as db:
+            for _ in range(lotes * tamanho_lote):
+                criar_pedido(pedido_schema, db, usuario)
+
+    def em_lote():
+        with SessionLocal() as db:
+            for _ in range(lotes):
+                criar_pedidos_em_lote(lote_schema, db, usuario)
+
+    print(f"{lotes * tamanho_lote} pedidos, lotes de {tamanho_lote}, synchronous={SQLITE_SYNCHRONOUS}")
+    taxas = {}
+    for nome, funcao in (("um por requisição", um_por_um), ("bulk", em_lote)):
+        inicio = time.perf_counter()
+        funcao()
+        taxas[nome] = lotes * tamanho_lote / (time.perf_counter() - inicio)
+        print(f"  {nome:<18} {taxas[nome]:8.0f} pedidos/s")
+    print(f"  ganho do bulk      {taxas['bulk'] / taxas['um por requisição']:8.1f}x")
+
+
+def _contagens_cache() -> dict:
+    from cache_pedidos import acessos_cache_pedidos
+
+    return {origem: valor for (origem,), valor in acessos_cache_pedidos._valores.items()}
+
+
+def cache(leituras: int, threads: int, quentes: int) -> None:
+    from cache import CacheTTL
+    from cache_pedidos import cache_pedidos
+    from order_routes import obter_pedido
+
+    with SessionLocal() as db:
+        ids = db.scalars(select(Pedido.id).order_by(Pedido.id.desc()).limit(quentes)).all()
+    if not ids:
+        print("sem pedidos no banco (rode benchmarks.dados)")
+        return
+    usuario = UsuarioAutenticado(id=1, admin=True, ativo=True)
+    por_thread = leituras // threads
+
+    def trabalhador(deslocamento: int):
+        with SessionLocal() as db:
+            for indice in range(por_thread):
+                obter_pedido(
+                    ids[(indice + deslocamento) % len(ids)],
+                    historico=False,
+                    if_none_match=None,
+                    db=db,
+                    usuario=usuario,
+                )
+                # devolve a conexão ao pool entre leituras, como uma requisição faria
+                db.close()
+
+    def rodada() -> float:
+        trabalhadores = [threading.Thread(target=trabalhador, args=(indice,)) for indice in range(threads)]
+        inicio = time.perf_counter()
+        for trabalhador_thread in trabalhadores:
+            trabalhador_thread.start()
+        for trabalhador_thread in trabalhadores:
+            trabalhador_thread.join()
+        return time.perf_counter() - inicio
+
+    print(f"{por_thread * threads} leituras, {threads} threads, {len(ids)} pedidos quentes")
+    local_original = cache_pedidos.local
+    # tamanho 0: cada leitura vai ao banco, só com a coalescência de misses simultâneos
+    cache_pedidos.local = CacheTTL(0, 0)
+    try:
+        duracao = rodada()
+    finally:
+        cache_pedidos.local = local_original
+    print(f"  sem cache   {por_thread * threads / duracao:8.0f} leituras/s")
+
+    cache_pedidos.limpar()
+    antes = _contagens_cache()
+    duracao = rodada()
+    depois = _contagens_cache()
+    diferenca = {origem: depois.get(origem, 0) - antes.get(origem, 0) for origem in depois}
+    acertos = diferenca.get("local", 0) + diferenca.get("compartilhado", 0)
+    print(
+        f"  com cache   {por_thread * threads / duracao:8.0f} leituras/s"
+        f"   acerto {acertos / max(sum(diferenca.values()), 1):.1%}   {diferenca}"
+    )
+
+    # stampede: todas as threads pedem o mesmo id logo depois da invalidação
+    barreira = threading.Barrier(threads)
+
+    def simultaneo():
+        with SessionLocal() as db:
+            barreira.wait()
+            obter_pedido(ids[0], historico=False, if_none_match=None, db=db, usuario=usuario)
+
+    cache_pedidos.invalidar([ids[0]])
+    antes = _contagens_cache()
+    trabalhadores = [threading.Thread(target=simultaneo) for _ in range(threads)]
+    for trabalhador_thread in trabalhadores:
+        trabalhador_thread.start()
+    for trabalhador_thread in trabalhadores:
+        trabalhador_thread.join()
+    depois = _contagens_cache()
+    print(
+        f"  stampede    {threads} leituras simultâneas:"
+        f" {depois.get('banco', 0) - antes.get('banco', 0)} no banco,"
+        f" {depois.get('coalescido', 0) - antes.get('coalescido', 0)} coalescidas"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    parser_serializacao = subparsers.add_parser("serializacao")
+    parser_serializacao.add_argument("--pedidos", type=int, default=10_000)
+    parser_serializacao.add_argument("--repeticoes", type=int, default=5)
+
+    parser_inicializacao = subparsers.add_parser("inicializacao")
+    parser_inicializacao.add_argument("--repeticoes", type=int, default=5)
+
+    parser_escrita = subparsers.add_parser("escrita")
+    parser_escrita.add_argument("--pedidos", type=int, default=4000)
+    parser_escrita.add_argument("--threads", type=int, default=40)
+
+    parser_cache = subparsers.add_parser("cache")
+    parser_cache.add_argument("--leituras", type=int, default=20_000)
+    parser_cache.add_argument("--threads", type=int, default=16)
+    parser_cache.add_argument("--quentes", type=int, default=20)
+
+    parser_lote = subparsers.add_parser("lote")
+    parser_lote.add_argument("--pedidos", type=int, default=5000)
+    parser_lote.add_argument("--tamanho-lote", type=int, default=500, help="pedidos por chamada de bulk")
+
+    args = parser.parse_args()
+    if args.comando == "serializacao":
+        serializacao(args.pedidos, args.repeticoes)
+    elif args.comando == "escrita":
+        escrita(args.pedidos, args.threads)
+    elif args.comando == "cache":
+        cache(args.leituras, args.threads, args.quentes)
+    elif args.comando == "lote":
+        lote(args.pedidos, args.tamanho_lote)
+    else:
+        inicializacao(args.repeticoes)
+
+
+if __name__ == "__main__":
+    main()
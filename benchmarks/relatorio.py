@@ -0,0 +1,145 @@
+"""Relatórios de latência/throughput dos benchmarks e comparação entre execuções.
+
+Uso:
+    python -m benchmarks.relatorio mostrar resultados/atual.json
+    python -m benchmarks.relatorio comparar resultados/base.json resultados/atual.json --tolerancia 0.1
+
+`comparar` sai com código 1 se o p95 de algum cenário piorou além da tolerância.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+
+def percentil(valores_ordenados: list, fracao: float) -> float:
+    # nearest-rank: sem interpolação, igual ao que ferramentas de carga reportam
+    if not valores_ordenados:
+        return 0.0
+    indice = max(0, min(len(valores_ordenados) - 1, round(fracao * len(valores_ordenados)) - 1))
+    return valores_ordenados[indice]
+
+
+def resumir(latencias: list, erros: int, duracao: float, rejeitadas: int = 0) -> dict:
+    ordenadas = sorted(latencias)
+    total = len(ordenadas)
+    return {
+        "requisicoes": total,
+        "erros": erros,
+        # 503 do limitador de concorrência (também contadas em erros)
+        "rejeitadas": rejeitadas,
+        "throughput_rps": total / duracao if duracao else 0.0,
+        "media_ms": sum(ordenadas) / total * 1000 if total else 0.0,
+        "p50_ms": percentil(ordenadas, 0.50) * 1000,
+        "p95_ms": percentil(ordenadas, 0.95) * 1000,
+        "p99_ms": percentil(ordenadas, 0.99) * 1000,
+        "max_ms": ordenadas[-1] * 1000 if total else 0.0,
+    }
+
+
+def _commit_atual() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def montar_relatorio(nome: str, resultados: list, duracao: float, parametros: dict) -> dict:
+    """`resultados` é uma lista de (cenario, status_http, latencia_segundos)."""
+    por_cenario: dict = {}
+    for cenario, status, latencia in resultados:
+        latencias, erros = por_cenario.setdefault(cenario, ([], [0, 0]))
+        latencias.append(latencia)
+        if status >= 500 or status == 0:
+            erros[0] += 1
+        if status == 503:
+            erros[1] += 1
+
+    todas = [latencia for _, _, latencia in resultados]
+    total_erros = sum(erros[0] for _, erros in por_cenario.values())
+    total_rejeitadas = sum(erros[1] for _, erros in por_cenario.values())
+    return {
+        "nome": nome,
+        "commit": _commit_atual(),
+        "data": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "duracao_s": duracao,
+        "parametros": parametros,
+        "geral": resumir(todas, total_erros, duracao, total_rejeitadas),
+        "cenarios": {
+            cenario: resumir(latencias, erros[0], duracao, erros[1])
+            for cenario, (latencias, erros) in sorted(por_cenario.items())
+        },
+    }
+
+
+def salvar(relatorio: dict, caminho: str) -> None:
+    destino = Path(caminho)
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    destino.write_text(json.dumps(relatorio, indent=2, ensure_ascii=False))
+
+
+def carregar(caminho: str) -> dict:
+    return json.loads(Path(caminho).read_text())
+
+
+def imprimir(relatorio: dict) -> None:
+    print(f"{relatorio['nome']} (commit {relatorio.get('commit')}, {relatorio['duracao_s']:.1f}s)")
+    print(f"{'cenário':<24}{'req':>8}{'erros':>7}{'503':>7}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    linhas = list(relatorio["cenarios"].items()) + [("TOTAL", relatorio["geral"])]
+    for cenario, dados in linhas:
+        print(
+            f"{cenario:<24}{dados['requisicoes']:>8}{dados['erros']:>7}{dados.get('rejeitadas', 0):>7}"
+            f"{dados['throughput_rps']:>9.1f}{dados['p50_ms']:>9.1f}"
+            f"{dados['p95_ms']:>9.1f}{dados['p99_ms']:>9.1f}"
+        )
+
+
+def comparar(base: dict, atual: dict, tolerancia: float) -> bool:
+    regressoes = False
+    print(f"base {base.get('commit')} -> atual {atual.get('commit')}")
+    print(f"{'cenário':<24}{'p95 base':>10}{'p95 atual':>11}{'delta':>9}{'rps base':>10}{'rps atual':>11}")
+    for cenario, dados in atual["cenarios"].items():
+        anterior = base["cenarios"].get(cenario)
+        if anterior is None:
+            continue
+        delta = (dados["p95_ms"] - anterior["p95_ms"]) / anterior["p95_ms"] if anterior["p95_ms"] else 0.0
+        marcador = ""
+        if delta > tolerancia:
+            regressoes = True
+            marcador = "  <- regressão"
+        print(
+            f"{cenario:<24}{anterior['p95_ms']:>10.1f}{dados['p95_ms']:>11.1f}{delta:>+9.0%}"
+            f"{anterior['throughput_rps']:>10.1f}{dados['throughput_rps']:>11.1f}{marcador}"
+        )
+    return regressoes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    mostrar = subparsers.add_parser("mostrar")
+    mostrar.add_argument("arquivo")
+
+    comparar_parser = subparsers.add_parser("comparar")
+    comparar_parser.add_argument("base")
+    comparar_parser.add_argument("atual")
+    comparar_parser.add_argument("--tolerancia", type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.comando == "mostrar":
+        imprimir(carregar(args.arquivo))
+    else:
+        if comparar(carregar(args.base), carregar(args.atual), args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
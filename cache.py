@@ -0,0 +1,57 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_AUSENTE = object()
+
+
+class CacheTTL:
+    """Cache LRU limitado em tamanho, com expiração por tempo e seguro entre threads."""
+
+    def __init__(self, tamanho_maximo: int, ttl_segundos: float):
+        self.tamanho_maximo = tamanho_maximo
+        self.ttl_segundos = ttl_segundos
+        self._dados: OrderedDict = OrderedDict()
+        # incrementada a cada invalidação; ver set(geracao=...)
+        self.geracao = 0
+        self._lock = threading.Lock()
+
+    def get(self, chave, padrao=None):
+        agora = time.monotonic()
+        with self._lock:
+            entrada = self._dados.get(chave, _AUSENTE)
+            if entrada is _AUSENTE:
+                return padrao
+
+            expira_em, valor = entrada
+            if expira_em <= agora:
+                del self._dados[chave]
+                return padrao
+
+            self._dados.move_to_end(chave)
+            return valor
+
+    def set(self, chave, valor, geracao: Optional[int] = None) -> None:
+        # com `geracao` (lida antes de carregar o valor) não grava se houve
+        # alguma invalidação no meio: o valor carregado pode ser o antigo
+        expira_em = time.monotonic() + self.ttl_segundos
+        with self._lock:
+            if geracao is not None and geracao != self.geracao:
+                return
+            self._dados[chave] = (expira_em, valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+
+    def invalidar(self, chave) -> None:
+        with self._lock:
+            self.geracao += 1
+            self._dados.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self) -> int:
+        return len(self._dados)
@@ -0,0 +1,252 @@
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+
+from cache import CacheTTL
+from config import (
+    CACHE_PEDIDOS_BACKEND,
+    CACHE_PEDIDOS_REDIS_URL,
+    CACHE_PEDIDOS_TAMANHO,
+    CACHE_PEDIDOS_TTL_INVALIDACAO_SEGUNDOS,
+    CACHE_PEDIDOS_TTL_LOCAL_SEGUNDOS,
+    CACHE_PEDIDOS_TTL_SEGUNDOS,
+)
+from database import SessionLocal
+from metricas import Contador
+
+logger = logging.getLogger(__name__)
+
+# (usuario_id, versao, JSON do pedido já serializado)
+EntradaPedido = tuple
+
+
+class BackendCompartilhado:
+    # ponto de extensão para um cache visto por todos os workers; o LRU local
+    # fica na frente dele. Falhas do backend viram miss, nunca erro na rota.
+    def obter(self, chave: str) -> Optional[bytes]:
+        return None
+
+    def gravar(self, chave: str, valor: bytes, versao: int) -> None:
+        # não deve sobrescrever uma versão igual ou mais nova, nem uma invalidação recente
+        pass
+
+    def apagar(self, chaves: list) -> None:
+        pass
+
+    def limpar(self) -> None:
+        pass
+
+
+# marca deixada por apagar no lugar da entrada
+_INVALIDADO = b"-"
+
+# SET condicional: uma leitura do banco que começou antes de uma invalidação em
+# outro worker não grava a versão antiga por cima da marca, nem por cima de
+# uma versão mais nova
+_SCRIPT_GRAVAR = """
+local atual = redis.call('GET', KEYS[1])
+if atual then
+  if atual == ARGV[4] then
+    return 0
+  end
+  local versao = tonumber(string.match(atual, '^[^:]*:([^:]*):'))
+  if versao and versao >= tonumber(ARGV[2]) then
+    return 0
+  end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[3])
+return 1
+"""
+
+
+class BackendRedis(BackendCompartilhado):
+    def __init__(self, url: str, ttl_segundos: float, ttl_invalidacao_segundos: float):
+        # dependência opcional, só importada com CACHE_PEDIDOS_BACKEND=redis
+        import redis
+
+        self._cliente = redis.Redis.from_url(url)
+        self._gravar = self._cliente.register_script(_SCRIPT_GRAVAR)
+        self.ttl_milissegundos = int(ttl_segundos * 1000)
+        self.ttl_invalidacao_milissegundos = int(ttl_invalidacao_segundos * 1000)
+
+    def obter(self, chave: str) -> Optional[bytes]:
+        valor = self._cliente.get(chave)
+        return None if valor == _INVALIDADO else valor
+
+    def gravar(self, chave: str, valor: bytes, versao: int) -> None:
+        self._gravar(keys=[chave], args=[valor, versao, self.ttl_milissegundos, _INVALIDADO])
+
+    def apagar(self, chaves: list) -> None:
+        # a marca vale o bastante para as leituras já em andamento terminarem
+        with self._cliente.pipeline(transaction=False) as pipeline:
+            for chave in chaves:
+                pipeline.set(chave, _INVALIDADO, px=self.ttl_invalidacao_milissegundos)
+            pipeline.execute()
+
+    def limpar(self) -> None:
+        chaves = list(self._cliente.scan_iter(match="pedido:*", count=1000))
+        for inicio in range(0, len(chaves), 1000):
+            self.apagar(chaves[inicio:inicio + 1000])
+
+
+def _codificar(entrada: EntradaPedido) -> bytes:
+    usuario_id, versao, corpo = entrada
+    return f"{usuario_id}:{versao}:".encode() + corpo
+
+
+def _decodificar(valor: bytes) -> EntradaPedido:
+    usuario_id, versao, corpo = valor.split(b":", 2)
+    return int(usuario_id), int(versao), corpo
+
+
+class CachePedidos:
+    """Cache read-through de GET /orders/pedido/{id}.
+
+    Guarda o pedido já serializado. Misses simultâneos do mesmo id esperam uma
+    única leitura do banco (single-flight). As rotas que alteram pedidos chamam
+    invalidar_pedidos, e a invalidação acontece depois do commit; uma leitura
+    que estava em andamento durante a invalidação devolve o resultado a quem
+    esperava, mas não o grava no cache.
+    """
+
+    def __init__(self, local: CacheTTL, compartilhado: Optional[BackendCompartilhado] = None):
+        self.local = local
+        self.compartilhado = compartilhado
+        self._carregando: dict = {}
+        self._sujos: set = set()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _chave(id_pedido: int) -> str:
+        return f"pedido:{id_pedido}"
+
+    def _ler_compartilhado(self, id_pedido: int) -> Optional[EntradaPedido]:
+        if self.compartilhado is None:
+            return None
+        try:
+            valor = self.compartilhado.obter(self._chave(id_pedido))
+        except Exception:
+            logger.exception("Falha ao ler o cache compartilhado de pedidos")
+            return None
+        return _decodificar(valor) if valor is not None else None
+
+    def _gravar_compartilhado(self, id_pedido: int, entrada: EntradaPedido) -> None:
+        if self.compartilhado is not None:
+            try:
+                self.compartilhado.gravar(self._chave(id_pedido), _codificar(entrada), entrada[1])
+            except Exception:
+                logger.exception("Falha ao gravar no cache compartilhado de pedidos")
+
+    def obter_local(self, id_pedido: int) -> Optional[EntradaPedido]:
+        # só o LRU, sem ir ao compartilhado nem ao banco
+        return self.local.get(id_pedido)
+
+    def obter(self, id_pedido: int, carregar: Callable[[], Optional[EntradaPedido]]) -> Optional[EntradaPedido]:
+        entrada = self.local.get(id_pedido)
+        if entrada is not None:
+            acessos_cache_pedidos.inc("local")
+            return entrada
+
+        with self._lock:
+            futuro = self._carregando.get(id_pedido)
+            lider = futuro is None
+            if lider:
+                futuro = self._carregando[id_pedido] = Future()
+        if not lider:
+            acessos_cache_pedidos.inc("coalescido")
+            return futuro.result()
+
+        try:
+            entrada = self._ler_compartilhado(id_pedido)
+            veio_do_banco = entrada is None
+            if veio_do_banco:
+                acessos_cache_pedidos.inc("banco")
+                entrada = carregar()
+            else:
+                acessos_cache_pedidos.inc("compartilhado")
+        except BaseException as erro:
+            with self._lock:
+                del self._carregando[id_pedido]
+                self._sujos.discard(id_pedido)
+            futuro.set_exception(erro)
+            raise
+
+        # grava no LRU sob o mesmo lock de invalidar: ou a invalidação vê a
+        # leitura em andamento e a marca como suja, ou chega depois e apaga a entrada.
+        # Pedidos inexistentes não são guardados: o id pode ser criado logo depois.
+        with self._lock:
+            del self._carregando[id_pedido]
+            gravar = entrada is not None and id_pedido not in self._sujos
+            self._sujos.discard(id_pedido)
+            if gravar:
+                self.local.set(id_pedido, entrada)
+        if gravar and veio_do_banco:
+            self._gravar_compartilhado(id_pedido, entrada)
+        futuro.set_result(entrada)
+        return entrada
+
+    def invalidar(self, ids: Iterable[int]) -> None:
+        ids = list(ids)
+        with self._lock:
+            for id_pedido in ids:
+                self.local.invalidar(id_pedido)
+                if id_pedido in self._carregando:
+                    self._sujos.add(id_pedido)
+        if self.compartilhado is not None and ids:
+            try:
+                self.compartilhado.apagar([self._chave(id_pedido) for id_pedido in ids])
+            except Exception:
+                logger.exception("Falha ao invalidar o cache compartilhado de pedidos")
+
+    def limpar(self) -> None:
+        # usado depois de correções em massa; limpa também o compartilhado
+        self.local.limpar()
+        if self.compartilhado is not None:
+            try:
+                self.compartilhado.limpar()
+            except Exception:
+                logger.exception("Falha ao limpar o cache compartilhado de pedidos")
+
+
+def criar_cache_pedidos(nome: str) -> CachePedidos:
+    if nome == "memoria":
+        return CachePedidos(CacheTTL(CACHE_PEDIDOS_TAMANHO, CACHE_PEDIDOS_TTL_SEGUNDOS))
+    if nome == "redis":
+        # entre workers a invalidação só chega ao compartilhado; o LRU local
+        # fica com um TTL curto para limitar o tempo de dado velho
+        return CachePedidos(
+            CacheTTL(CACHE_PEDIDOS_TAMANHO, CACHE_PEDIDOS_TTL_LOCAL_SEGUNDOS),
+            BackendRedis(
+                CACHE_PEDIDOS_REDIS_URL, CACHE_PEDIDOS_TTL_SEGUNDOS, CACHE_PEDIDOS_TTL_INVALIDACAO_SEGUNDOS
+            ),
+        )
+    raise ValueError(f"CACHE_PEDIDOS_BACKEND desconhecido: {nome}")
+
+
+acessos_cache_pedidos = Contador(
+    "order_cache_lookups_total",
+    "Leituras de GET /orders/pedido/{id} por origem (local, compartilhado, banco, coalescido)",
+    ("origem",),
+)
+
+cache_pedidos = criar_cache_pedidos(CACHE_PEDIDOS_BACKEND)
+
+
+def invalidar_pedidos(db, ids: Iterable[int]) -> None:
+    # a invalidação espera o commit; antes dele outra leitura ainda veria o dado antigo
+    db.info.setdefault("pedidos_alterados", set()).update(ids)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidar_alterados(session) -> None:
+    ids = session.info.pop("pedidos_alterados", None)
+    if ids:
+        cache_pedidos.invalidar(ids)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_alterados(session) -> None:
+    session.info.pop("pedidos_alterados", None)
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import sys
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, Mapping, Optional
+
+from anyio import to_thread
+from sqlalchemy import select, update
+
+from database import SessionLocal
+from models import CatalogoVersao, Produto
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=4096)
+def normalizar(texto: str) -> str:
+    # os poucos valores distintos de sabor/tamanho viram strings internadas,
+    # e entradas repetidas não são normalizadas de novo
+    return sys.intern(texto.strip().lower())
+
+
+@dataclass(frozen=True)
+class IndicePrecos:
+    versao: int
+    precos: Mapping[tuple, float]
+
+
+class CatalogoPrecos:
+    """Índice imutável de preços em memória, recarregado quando a versão no banco muda.
+
+    As consultas de preço nunca acessam o banco: leem a referência atual do
+    índice, que é trocada de uma vez só quando o catálogo é recarregado.
+    """
+
+    def __init__(self):
+        self._indice = IndicePrecos(versao=-1, precos=MappingProxyType({}))
+        self._lock = threading.Lock()
+
+    @property
+    def versao(self) -> int:
+        return self._indice.versao
+
+    def _versao_no_banco(self, db) -> int:
+        return db.scalar(select(CatalogoVersao.versao).where(CatalogoVersao.id == 1)) or 0
+
+    def carregar(self) -> None:
+        with self._lock, SessionLocal() as db:
+            versao = self._versao_no_banco(db)
+            produtos = db.execute(
+                select(Produto.sabor, Produto.tamanho, Produto.preco).where(Produto.ativo.is_(True))
+            ).all()
+
+        precos = {
+            (normalizar(sabor), normalizar(tamanho)): preco
+            for sabor, tamanho, preco in produtos
+        }
+        self._indice = IndicePrecos(versao=versao, precos=MappingProxyType(precos))
+        logger.info("Catálogo de preços carregado: versão %s, %s produtos", versao, len(precos))
+
+    def recarregar_se_mudou(self) -> bool:
+        with SessionLocal() as db:
+            versao = self._versao_no_banco(db)
+        if versao == self._indice.versao:
+            return False
+        self.carregar()
+        return True
+
+    def _indice_atual(self) -> IndicePrecos:
+        if self._indice.versao < 0:
+            # fora da API (scripts, shell) o catálogo é carregado no primeiro uso
+            self.carregar()
+        return self._indice
+
+    def preco(self, sabor: str, tamanho: str) -> Optional[float]:
+        return self._indice_atual().precos.get((normalizar(sabor), normalizar(tamanho)))
+
+    def precos(self, pares: Iterable[tuple]) -> list:
+        # resolve vários itens contra o mesmo snapshot do índice
+        precos = self._indice_atual().precos
+        return [precos.get((normalizar(sabor), normalizar(tamanho))) for sabor, tamanho in pares]
+
+    def produtos(self) -> list:
+        indice = self._indice_atual()
+        return [
+            {"sabor": sabor, "tamanho": tamanho, "preco": preco}
+            for (sabor, tamanho), preco in indice.precos.items()
+        ]
+
+
+catalogo = CatalogoPrecos()
+
+
+def incrementar_versao_catalogo(db) -> None:
+    # deve ser chamada na mesma transação que alterou produtos
+    db.execute(
+        update(CatalogoVersao)
+        .where(CatalogoVersao.id == 1)
+        .values(versao=CatalogoVersao.versao + 1)
+    )
+
+
+async def monitorar_catalogo(intervalo: float) -> None:
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await to_thread.run_sync(catalogo.recarregar_se_mudou)
+        except Exception:
+            logger.exception("Falha ao verificar a versão do catálogo de preços")
@@ -10,5 +10,185 @@ SECRET_KEY = os.getenv("SECRET_KEY", "chave-super-secreta")
 # algoritmo usado pelo jose.jwt
 ALGORITHM = "HS256"
 
-# tempo de expiração do token em minutos
+# tempo de expiração do token de acesso em minutos
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+
+# validade do refresh token; cada uso em /auth/refresh o troca por um novo
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "7"))
+
+# paginação das listagens de pedidos
+LIMITE_PADRAO_LISTAGEM = int(os.getenv("LIMITE_PADRAO_LISTAGEM", "100"))
+LIMITE_MAXIMO_LISTAGEM = int(os.getenv("LIMITE_MAXIMO_LISTAGEM", "1000"))
+
+# máximo de pedidos aceitos em uma chamada de POST /orders/pedidos/bulk
+LIMITE_PEDIDOS_LOTE = int(os.getenv("LIMITE_PEDIDOS_LOTE", "1000"))
+
+# quantidade de pedidos lidos do banco por vez no modo streaming (NDJSON)
+TAMANHO_LOTE_STREAM = int(os.getenv("TAMANHO_LOTE_STREAM", "1000"))
+
+# cache dos usuários autenticados usado por verificar_token. É por processo e
+# só as alterações feitas pelo próprio worker o invalidam: com vários workers,
+# mudar admin/ativo ou apagar um usuário leva até CACHE_USUARIOS_TTL_SEGUNDOS
+# para valer nos outros
+CACHE_USUARIOS_TAMANHO = int(os.getenv("CACHE_USUARIOS_TAMANHO", "10000"))
+CACHE_USUARIOS_TTL_SEGUNDOS = float(os.getenv("CACHE_USUARIOS_TTL_SEGUNDOS", "60"))
+
+# custo do argon2 (valores padrão do passlib)
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_MEMORY_COST = int(os.getenv("ARGON2_MEMORY_COST", "65536"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+# pool de threads dedicado ao hash de senhas
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+# quantas operações podem esperar na fila além das que estão executando
+HASH_FILA_MAXIMA = int(os.getenv("HASH_FILA_MAXIMA", "32"))
+
+# threads disponíveis para rotas e dependências síncronas (sessões SQLAlchemy)
+THREADPOOL_TAMANHO = int(os.getenv("THREADPOOL_TAMANHO", "40"))
+
+# banco de dados (sqlite por padrão; aceita qualquer URL do SQLAlchemy, ex. postgresql://)
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./meubanco.db")
+
+# pool de conexões. Cada thread do threadpool (rotas síncronas e tarefas de
+# fundo via to_thread) pode segurar uma conexão, e há quem a segure fora dele:
+# a thread do agrupamento de pedidos e os streams NDJSON em andamento. O
+# overflow padrão cobre THREADPOOL_TAMANHO + DB_CONEXOES_EXTRAS, para que
+# nenhuma rota fique esperando DB_POOL_TIMEOUT por uma conexão com thread livre
+DB_CONEXOES_EXTRAS = int(os.getenv("DB_CONEXOES_EXTRAS", "8"))
+DB_POOL_TAMANHO = int(os.getenv("DB_POOL_TAMANHO", "10"))
+DB_POOL_OVERFLOW = int(
+    os.getenv("DB_POOL_OVERFLOW", str(max(0, THREADPOOL_TAMANHO + DB_CONEXOES_EXTRAS - DB_POOL_TAMANHO)))
+)
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+# PRAGMAs aplicados em cada conexão sqlite
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", str(64 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+# aplica as migrações pendentes na inicialização da API; com vários workers,
+# prefira rodar "python migracoes.py" antes de subir e desligar esta opção
+MIGRAR_NA_INICIALIZACAO = os.getenv("MIGRAR_NA_INICIALIZACAO", "1") == "1"
+
+# intervalo, em segundos, da verificação de versão do catálogo de preços
+CATALOGO_INTERVALO_RECARGA = float(os.getenv("CATALOGO_INTERVALO_RECARGA", "5"))
+
+# comandos SQL acima deste tempo (ms) são registrados com o plano de execução; 0 desliga
+LIMIAR_CONSULTA_LENTA_MS = float(os.getenv("LIMIAR_CONSULTA_LENTA_MS", "100"))
+# quantidade máxima de consultas distintas (SQL normalizado) guardadas no agregado
+CONSULTAS_LENTAS_MAXIMO = int(os.getenv("CONSULTAS_LENTAS_MAXIMO", "200"))
+
+# profiler por requisição: requisições de admin com o cabeçalho "X-Perfil" são
+# sempre perfiladas; além delas, esta fração do tráfego (0 desliga a amostragem)
+PERFIL_AMOSTRAGEM = float(os.getenv("PERFIL_AMOSTRAGEM", "0"))
+# intervalo entre amostras de pilha, em ms
+PERFIL_INTERVALO_MS = float(os.getenv("PERFIL_INTERVALO_MS", "1"))
+# onde os perfis (.folded) são gravados e quantos dos mais recentes são mantidos
+PERFIL_DIRETORIO = os.getenv("PERFIL_DIRETORIO", "perfis")
+PERFIL_MAXIMO_ARQUIVOS = int(os.getenv("PERFIL_MAXIMO_ARQUIVOS", "100"))
+
+# eventos de pedidos (/orders/stream): "memoria" entrega só aos clientes do
+# próprio processo; "banco" grava os eventos na tabela eventos_pedidos e
+# cada worker a consulta, para rodar com vários workers (sqlite ou PostgreSQL)
+EVENTOS_BACKEND = os.getenv("EVENTOS_BACKEND", "memoria")
+# eventos recentes mantidos em memória para retomar uma conexão pelo Last-Event-ID
+EVENTOS_HISTORICO = int(os.getenv("EVENTOS_HISTORICO", "1000"))
+# eventos pendentes por cliente; um cliente que fica para trás é desconectado
+EVENTOS_FILA_CLIENTE = int(os.getenv("EVENTOS_FILA_CLIENTE", "1000"))
+# intervalo entre comentários de keep-alive no stream, em segundos
+EVENTOS_HEARTBEAT_SEGUNDOS = float(os.getenv("EVENTOS_HEARTBEAT_SEGUNDOS", "15"))
+# validade do ticket de /orders/stream?ticket=... (para o EventSource, que não
+# envia Authorization). Ele vai na URL e pode parar em logs, por isso dura pouco;
+# quando a reconexão automática falha com 401, o cliente pede outro ticket
+STREAM_TICKET_SEGUNDOS = int(os.getenv("STREAM_TICKET_SEGUNDOS", "60"))
+# backend "banco": intervalo de leitura da tabela e quantas linhas manter nela
+EVENTOS_INTERVALO_BANCO = float(os.getenv("EVENTOS_INTERVALO_BANCO", "0.5"))
+EVENTOS_RETENCAO_BANCO = int(os.getenv("EVENTOS_RETENCAO_BANCO", "100000"))
+
+# group commit em POST /orders/pedido: pedidos simultâneos são gravados juntos
+# em uma transação. O lote fecha com AGRUPAMENTO_MAXIMO_PEDIDOS pedidos ou
+# AGRUPAMENTO_ESPERA_MS após o primeiro (a latência máxima adicionada); como
+# cada requisição espera numa thread, lotes passam de THREADPOOL_TAMANHO raramente
+AGRUPAR_PEDIDOS = os.getenv("AGRUPAR_PEDIDOS", "0") == "1"
+AGRUPAMENTO_MAXIMO_PEDIDOS = int(os.getenv("AGRUPAMENTO_MAXIMO_PEDIDOS", "100"))
+AGRUPAMENTO_ESPERA_MS = float(os.getenv("AGRUPAMENTO_ESPERA_MS", "2"))
+# quanto uma requisição espera pela gravadora antes de responder 503, para que
+# uma gravadora travada não prenda as threads do threadpool indefinidamente
+AGRUPAMENTO_TIMEOUT_SEGUNDOS = float(os.getenv("AGRUPAMENTO_TIMEOUT_SEGUNDOS", "10"))
+
+# arquivamento: pedidos fechados/cancelados há mais de ARQUIVAR_APOS_HORAS saem
+# de "pedidos" para "pedidos_arquivo", em lotes de ARQUIVAMENTO_LOTE, a cada
+# ARQUIVAMENTO_INTERVALO_SEGUNDOS (0 desliga; com vários workers, deixe ligado
+# em um só ou rode "python arquivamento.py" por cron)
+ARQUIVAR_APOS_HORAS = float(os.getenv("ARQUIVAR_APOS_HORAS", "24"))
+ARQUIVAMENTO_LOTE = int(os.getenv("ARQUIVAMENTO_LOTE", "1000"))
+ARQUIVAMENTO_INTERVALO_SEGUNDOS = float(os.getenv("ARQUIVAMENTO_INTERVALO_SEGUNDOS", "600"))
+# pausa entre lotes, para não segurar o lock de escrita do sqlite por muito tempo
+ARQUIVAMENTO_PAUSA_MS = float(os.getenv("ARQUIVAMENTO_PAUSA_MS", "50"))
+
+# reconciliação dos relatórios (python relatorios.py ou POST
+# /admin/relatorios/reconciliar): recalcula o preço dos pedidos em faixas de
+# RECONCILIACAO_LOTE ids e refaz as tabelas de resumo de vendas
+RECONCILIACAO_LOTE = int(os.getenv("RECONCILIACAO_LOTE", "1000"))
+
+# cache de GET /orders/pedido/{id} (cache_pedidos.py). "memoria": LRU por
+# processo, invalidado pelas rotas do próprio processo; com vários workers um
+# worker pode servir o pedido antigo até CACHE_PEDIDOS_TTL_SEGUNDOS. "redis":
+# cache compartilhado em CACHE_PEDIDOS_REDIS_URL (requer o pacote redis), com o
+# LRU local na frente por CACHE_PEDIDOS_TTL_LOCAL_SEGUNDOS
+CACHE_PEDIDOS_BACKEND = os.getenv("CACHE_PEDIDOS_BACKEND", "memoria")
+CACHE_PEDIDOS_TAMANHO = int(os.getenv("CACHE_PEDIDOS_TAMANHO", "10000"))
+CACHE_PEDIDOS_TTL_SEGUNDOS = float(os.getenv("CACHE_PEDIDOS_TTL_SEGUNDOS", "30"))
+CACHE_PEDIDOS_TTL_LOCAL_SEGUNDOS = float(os.getenv("CACHE_PEDIDOS_TTL_LOCAL_SEGUNDOS", "1"))
+# no redis a invalidação deixa uma marca por este tempo em vez de apagar a
+# chave: leituras do banco que começaram antes dela não gravam o pedido antigo.
+# Precisa ser maior que a leitura mais lenta de um pedido
+CACHE_PEDIDOS_TTL_INVALIDACAO_SEGUNDOS = float(os.getenv("CACHE_PEDIDOS_TTL_INVALIDACAO_SEGUNDOS", "5"))
+CACHE_PEDIDOS_REDIS_URL = os.getenv("CACHE_PEDIDOS_REDIS_URL", "redis://localhost:6379/0")
+
+# limitador de concorrência (sobrecarga.py): as requisições esperam uma vaga
+# antes de chegar à rota. O limite começa em LIMITE_CONCORRENCIA_INICIAL e, com
+# LIMITE_CONCORRENCIA_ADAPTATIVO, acompanha a latência entre o mínimo e o
+# máximo. Quem passa do prazo de fila da sua classe (mutações de pedidos são
+# "critica"; listagens, bulk e criação de conta são "baixa") recebe 503 com
+# Retry-After; com SOBRECARGA_FILA_MAXIMA requisições esperando, o 503 é imediato
+LIMITE_CONCORRENCIA = os.getenv("LIMITE_CONCORRENCIA", "1") == "1"
+LIMITE_CONCORRENCIA_ADAPTATIVO = os.getenv("LIMITE_CONCORRENCIA_ADAPTATIVO", "1") == "1"
+LIMITE_CONCORRENCIA_INICIAL = int(os.getenv("LIMITE_CONCORRENCIA_INICIAL", str(THREADPOOL_TAMANHO)))
+LIMITE_CONCORRENCIA_MINIMO = int(os.getenv("LIMITE_CONCORRENCIA_MINIMO", "4"))
+LIMITE_CONCORRENCIA_MAXIMO = int(os.getenv("LIMITE_CONCORRENCIA_MAXIMO", str(THREADPOOL_TAMANHO * 4)))
+SOBRECARGA_FILA_MAXIMA = int(os.getenv("SOBRECARGA_FILA_MAXIMA", "1000"))
+SOBRECARGA_PRAZO_CRITICA_MS = float(os.getenv("SOBRECARGA_PRAZO_CRITICA_MS", "2000"))
+SOBRECARGA_PRAZO_NORMAL_MS = float(os.getenv("SOBRECARGA_PRAZO_NORMAL_MS", "1000"))
+SOBRECARGA_PRAZO_BAIXA_MS = float(os.getenv("SOBRECARGA_PRAZO_BAIXA_MS", "250"))
+SOBRECARGA_RETRY_AFTER_SEGUNDOS = int(os.getenv("SOBRECARGA_RETRY_AFTER_SEGUNDOS", "1"))
+
+# limite de tentativas de login (limite_login.py): baldes de fichas por IP e
+# por email, conferidos antes da consulta ao banco e do argon2. Cada balde
+# guarda até *_CAPACIDADE tentativas e repõe *_POR_MINUTO; passando disso a
+# resposta é 429 com Retry-After. "memoria" vale por processo (no máximo
+# LOGIN_LIMITE_TAMANHO chaves); "redis" divide os baldes entre os workers
+# (requer o pacote redis). Atrás de proxy, rode o uvicorn com --proxy-headers
+# para o IP ser o do cliente
+LOGIN_LIMITE_BACKEND = os.getenv("LOGIN_LIMITE_BACKEND", "memoria")
+LOGIN_LIMITE_TAMANHO = int(os.getenv("LOGIN_LIMITE_TAMANHO", "100000"))
+LOGIN_LIMITE_IP_CAPACIDADE = int(os.getenv("LOGIN_LIMITE_IP_CAPACIDADE", "20"))
+LOGIN_LIMITE_IP_POR_MINUTO = float(os.getenv("LOGIN_LIMITE_IP_POR_MINUTO", "30"))
+LOGIN_LIMITE_EMAIL_CAPACIDADE = int(os.getenv("LOGIN_LIMITE_EMAIL_CAPACIDADE", "5"))
+LOGIN_LIMITE_EMAIL_POR_MINUTO = float(os.getenv("LOGIN_LIMITE_EMAIL_POR_MINUTO", "5"))
+LOGIN_LIMITE_REDIS_URL = os.getenv("LOGIN_LIMITE_REDIS_URL", "redis://localhost:6379/0")
+
+# revogação de tokens (revogacao.py): cada worker guarda em memória os jti
+# revogados e ainda não expirados, e lê da tabela tokens_revogados os que outros
+# workers revogaram a cada REVOGACAO_INTERVALO_SEGUNDOS (o atraso máximo para
+# uma revogação valer em todos). Linhas expiradas são apagadas a cada
+# REVOGACAO_LIMPEZA_SEGUNDOS
+REVOGACAO_INTERVALO_SEGUNDOS = float(os.getenv("REVOGACAO_INTERVALO_SEGUNDOS", "1"))
+REVOGACAO_LIMPEZA_SEGUNDOS = float(os.getenv("REVOGACAO_LIMPEZA_SEGUNDOS", "3600"))
+# quantos ids abaixo do último lido são relidos a cada consulta: com vários
+# escritores (PostgreSQL) uma revogação pode ser confirmada depois de outra com
+# id maior. Precisa cobrir as transações em andamento ao mesmo tempo
+REVOGACAO_JANELA_IDS = int(os.getenv("REVOGACAO_JANELA_IDS", "500"))
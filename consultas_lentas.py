@@ -0,0 +1,222 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import event
+
+from config import CONSULTAS_LENTAS_MAXIMO, LIMIAR_CONSULTA_LENTA_MS
+from metricas import rota_atual
+
+logger = logging.getLogger(__name__)
+
+# só SELECT: o EXPLAIN roda na conexão e na transação de quem fez a consulta
+_COMANDOS_COM_PLANO = ("select",)
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_LISTA_IN = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACOS = re.compile(r"\s+")
+
+# parâmetros de colunas com segredos (hash de senha, jti) nunca vão para o log
+COLUNAS_SENSIVEIS = {"senha", "jti", "token", "refresh_token", "access_token"}
+# tamanho máximo do resumo de parâmetros no log e em /admin/consultas-lentas
+PARAMETROS_MAXIMO_CARACTERES = 500
+# INSERTs de várias linhas geram um VALUES (?, ?), (?, ?)... enorme
+SQL_MAXIMO_CARACTERES = 2000
+
+_RE_COLUNAS_INSERT = re.compile(r"^\s*INSERT\s+INTO\s+\S+\s*\(([^)]*)\)", re.IGNORECASE)
+_RE_MARCADOR = re.compile(r"\?|%\((\w+)\)s")
+# coluna comparada logo antes do marcador: "usuarios.email = ?", "jti IN (?"
+_RE_COLUNA_ANTES = re.compile(
+    r"([\w\"]+)\s*(?:=|!=|<>|<=|>=|<|>|\bLIKE\b|\bIN\s*\()\s*$", re.IGNORECASE
+)
+_RE_CONTINUACAO_LISTA = re.compile(r"(?:\?|%\(\w+\)s)\s*,\s*$")
+_RE_SUFIXO_NUMERICO = re.compile(r"_\d+$")
+
+
+def normalizar_sql(sql: str) -> str:
+    # agrupa comandos que só diferem em literais ou no tamanho de listas IN
+    sql = _RE_STRING.sub("?", sql)
+    sql = _RE_NUMERO.sub("?", sql)
+    sql = _RE_LISTA_IN.sub("(?, ...)", sql)
+    return _RE_ESPACOS.sub(" ", sql).strip()
+
+
+def _nome_coluna(nome: str) -> str:
+    return nome.strip().strip('"').rsplit(".", 1)[-1].lower()
+
+
+def _colunas_dos_marcadores(statement: str) -> list:
+    # coluna associada a cada marcador posicional, ou None quando não dá para saber
+    insert = _RE_COLUNAS_INSERT.match(statement)
+    colunas_insert = [_nome_coluna(coluna) for coluna in insert.group(1).split(",")] if insert else []
+    colunas = []
+    for indice, marcador in enumerate(_RE_MARCADOR.finditer(statement)):
+        if colunas_insert:
+            # VALUES com várias linhas repete a lista de colunas
+            colunas.append(colunas_insert[indice % len(colunas_insert)])
+            continue
+        anterior = statement[max(0, marcador.start() - 80):marcador.start()]
+        if colunas and _RE_CONTINUACAO_LISTA.search(anterior):
+            colunas.append(colunas[-1])
+            continue
+        coluna = _RE_COLUNA_ANTES.search(anterior)
+        colunas.append(_nome_coluna(coluna.group(1)) if coluna else None)
+    return colunas
+
+
+def _redigir(statement: str, parametros):
+    if isinstance(parametros, dict):
+        # estilo pyformat (postgres): as chaves já são os nomes das colunas
+        return {
+            chave: "***" if _RE_SUFIXO_NUMERICO.sub("", chave).lower() in COLUNAS_SENSIVEIS else valor
+            for chave, valor in parametros.items()
+        }
+    colunas = _colunas_dos_marcadores(statement)
+    return tuple(
+        "***" if indice < len(colunas) and colunas[indice] in COLUNAS_SENSIVEIS else valor
+        for indice, valor in enumerate(parametros)
+    )
+
+
+def _truncar(texto: str, maximo: int) -> str:
+    return texto if len(texto) <= maximo else texto[:maximo] + "..."
+
+
+def resumir_parametros(statement: str, parametros, executemany: bool) -> str:
+    """Primeiro conjunto de parâmetros, sem colunas sensíveis e com tamanho limitado.
+
+    Num executemany só o primeiro conjunto é mostrado, com a contagem dos demais.
+    """
+    if executemany:
+        conjuntos = len(parametros) if parametros else 0
+        parametros = parametros[0] if parametros else ()
+    texto = _truncar(repr(_redigir(statement, parametros)), PARAMETROS_MAXIMO_CARACTERES)
+    if executemany:
+        texto += f" (executemany, {conjuntos} conjuntos)"
+    return texto
+
+
+class RegistroConsultasLentas:
+    def __init__(self, limiar_ms: float, maximo: int):
+        self.limiar_segundos = limiar_ms / 1000
+        self.maximo = maximo
+        self._agregado: dict = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, sql, parametros: str, duracao, rota, plano) -> None:
+        chave = normalizar_sql(sql)
+        # SCAN sem índice no plano do sqlite indica varredura da tabela inteira
+        scan_completo = any(
+            linha.startswith("SCAN") and "USING" not in linha for linha in plano
+        )
+
+        with self._lock:
+            entrada = self._agregado.get(chave)
+            if entrada is None:
+                if len(self._agregado) >= self.maximo:
+                    # descarta a consulta com menor tempo acumulado
+                    menor = min(self._agregado, key=lambda k: self._agregado[k]["tempo_total"])
+                    del self._agregado[menor]
+                entrada = self._agregado[chave] = {
+                    "sql": _truncar(chave, SQL_MAXIMO_CARACTERES),
+                    "ocorrencias": 0,
+                    "tempo_total": 0.0,
+                    "tempo_maximo": 0.0,
+                    "rotas": Counter(),
+                }
+
+            entrada["ocorrencias"] += 1
+            entrada["tempo_total"] += duracao
+            entrada["tempo_maximo"] = max(entrada["tempo_maximo"], duracao)
+            entrada["rotas"][rota or "fora de requisição"] += 1
+            entrada["ultimos_parametros"] = parametros
+            entrada["plano"] = plano
+            entrada["scan_completo"] = scan_completo
+
+    def resumo(self) -> list:
+        with self._lock:
+            entradas = [dict(entrada, rotas=dict(entrada["rotas"])) for entrada in self._agregado.values()]
+        return sorted(entradas, key=lambda entrada: entrada["tempo_total"], reverse=True)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._agregado.clear()
+
+
+registro_consultas_lentas = RegistroConsultasLentas(LIMIAR_CONSULTA_LENTA_MS, CONSULTAS_LENTAS_MAXIMO)
+
+
+def _explicar_em_savepoint(cursor, statement, parameters) -> list:
+    # no PostgreSQL um EXPLAIN que falha (ex.: tipo de parâmetro que não dá
+    # para inferir) abortaria a transação da requisição; o savepoint isola o erro
+    cursor.execute("SAVEPOINT plano_consulta_lenta")
+    try:
+        cursor.execute(statement, parameters)
+        linhas = cursor.fetchall()
+    except Exception:
+        cursor.execute("ROLLBACK TO SAVEPOINT plano_consulta_lenta")
+        raise
+    finally:
+        cursor.execute("RELEASE SAVEPOINT plano_consulta_lenta")
+    return linhas
+
+
+def _capturar_plano(conn, statement, parameters, executemany) -> list:
+    if not statement.lstrip().lower().startswith(_COMANDOS_COM_PLANO):
+        return []
+
+    if executemany:
+        parameters = parameters[0] if parameters else ()
+
+    sqlite = conn.dialect.name == "sqlite"
+    prefixo = "EXPLAIN QUERY PLAN " if sqlite else "EXPLAIN "
+    try:
+        # cursor DBAPI direto: não passa pelos eventos do engine de novo
+        cursor = conn.connection.cursor()
+        try:
+            if sqlite:
+                # no sqlite um erro não invalida a transação em andamento
+                cursor.execute(prefixo + statement, parameters)
+                linhas = cursor.fetchall()
+            else:
+                linhas = _explicar_em_savepoint(cursor, prefixo + statement, parameters)
+        finally:
+            cursor.close()
+    except Exception as erro:
+        return [f"plano indisponível: {erro}"]
+
+    # sqlite: (id, parent, notused, detail); postgres: (linha do plano,)
+    return [str(linha[-1]) for linha in linhas]
+
+
+def _antes_da_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._consulta_lenta_inicio = time.perf_counter()
+
+
+def _depois_da_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    duracao = time.perf_counter() - context._consulta_lenta_inicio
+    if duracao < registro_consultas_lentas.limiar_segundos:
+        return
+
+    rota = rota_atual()
+    plano = _capturar_plano(conn, statement, parameters, executemany)
+    parametros = resumir_parametros(statement, parameters, executemany)
+    logger.warning(
+        "Consulta lenta (%.1f ms) em %s: %s | parâmetros=%s | plano=%s",
+        duracao * 1000,
+        rota or "fora de requisição",
+        _truncar(statement, SQL_MAXIMO_CARACTERES),
+        parametros,
+        plano,
+    )
+    registro_consultas_lentas.registrar(statement, parametros, duracao, rota, plano)
+
+
+def registrar_consultas_lentas(engine) -> None:
+    if LIMIAR_CONSULTA_LENTA_MS <= 0:
+        return
+    event.listen(engine, "before_cursor_execute", _antes_da_query)
+    event.listen(engine, "after_cursor_execute", _depois_da_query)
@@ -1,31 +1,69 @@
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from models import Base
+from sqlalchemy.pool import StaticPool
+from consultas_lentas import registrar_consultas_lentas
+from config import (
+    DATABASE_URL,
+    DB_POOL_OVERFLOW,
+    DB_POOL_TAMANHO,
+    DB_POOL_TIMEOUT,
+    SQLITE_BUSY_TIMEOUT_MS,
+    SQLITE_CACHE_SIZE_KB,
+    SQLITE_JOURNAL_MODE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_TEMP_STORE,
+)
 
-DATABASE_URL = "sqlite:///./meubanco.db"
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def _aplicar_pragmas_sqlite(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    # WAL permite leituras concorrentes enquanto um pedido está sendo gravado
+    cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    # valor negativo: tamanho em KiB em vez de número de páginas
+    cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+    cursor.close()
+
 
-def ensure_preco_column(engine) -> None:
-    with engine.connect() as conn:
-        columns = conn.execute(text("PRAGMA table_info(pedidos);"))
-        if not any(col[1] == "preco" for col in columns):
-            conn.execute(text("ALTER TABLE pedidos ADD COLUMN preco FLOAT NOT NULL DEFAULT 0"))
-            conn.execute(text("UPDATE pedidos SET preco = 0 WHERE preco IS NULL"))
-            conn.commit()
+def criar_engine(url: str = DATABASE_URL):
+    url_banco = make_url(url)
 
+    if url_banco.get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=DB_POOL_TAMANHO,
+            max_overflow=DB_POOL_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True,
+        )
 
-def ensure_senha_column(engine) -> None:
-    with engine.connect() as conn:
-        columns = conn.execute(text("PRAGMA table_info(usuarios);"))
-        if not any(col[1] == "senha" for col in columns):
-            conn.execute(text("ALTER TABLE usuarios ADD COLUMN senha VARCHAR NOT NULL DEFAULT ''"))
-            conn.commit()
+    connect_args = {"check_same_thread": False}
+    if url_banco.database in (None, "", ":memory:"):
+        # banco em memória só existe dentro de uma conexão: todas as sessões a compartilham
+        engine = create_engine(url, connect_args=connect_args, poolclass=StaticPool)
+    else:
+        engine = create_engine(
+            url,
+            connect_args=connect_args,
+            pool_size=DB_POOL_TAMANHO,
+            max_overflow=DB_POOL_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    event.listen(engine, "connect", _aplicar_pragmas_sqlite)
+    return engine
 
-Base.metadata.create_all(bind=engine)
-ensure_preco_column(engine)
-ensure_senha_column(engine)
\ No newline at end of file
+
+engine = criar_engine()
+registrar_consultas_lentas(engine)
+
+# expire_on_commit=False: os objetos continuam válidos após o commit, sem
+# um SELECT de refresh para cada acesso na montagem da resposta
+SessionLocal = sessionmaker(
+    autocommit=False, autoflush=False, expire_on_commit=False, bind=engine
+)
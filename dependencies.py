@@ -1,17 +1,63 @@
-from passlib.context import CryptContext
+from dataclasses import dataclass
+from typing import Optional
+
 from database import SessionLocal
-from sqlalchemy.orm import Session
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
 from models import Usuario
+from cache import CacheTTL
+from revogacao import lista_revogacao
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 
 from jose import jwt, JWTError
-from config import SECRET_KEY, ALGORITHM
-
-bcrypt_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from config import (
+    SECRET_KEY,
+    ALGORITHM,
+    CACHE_USUARIOS_TAMANHO,
+    CACHE_USUARIOS_TTL_SEGUNDOS,
+)
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login-form")
+# sem o header não responde 401 na hora: a rota aceita outra credencial
+oauth2_scheme_opcional = OAuth2PasswordBearer(tokenUrl="/auth/login-form", auto_error=False)
+
+
+@dataclass(frozen=True)
+class UsuarioAutenticado:
+    # snapshot dos campos de Usuario que as rotas usam para autorização
+    id: int
+    admin: bool
+    ativo: bool
+
+
+cache_usuarios = CacheTTL(CACHE_USUARIOS_TAMANHO, CACHE_USUARIOS_TTL_SEGUNDOS)
+
+
+def invalidar_cache_usuario(id_usuario: int) -> None:
+    cache_usuarios.invalidar(id_usuario)
+
+
+@event.listens_for(Usuario, "after_update")
+@event.listens_for(Usuario, "after_delete")
+def _marcar_usuario_alterado(mapper, connection, usuario) -> None:
+    # roda no flush: invalidar já deixaria outra requisição reler a linha
+    # ainda não confirmada e devolvê-la ao cache
+    sessao = object_session(usuario)
+    if sessao is not None:
+        sessao.info.setdefault("usuarios_alterados", set()).add(usuario.id)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _invalidar_usuarios_alterados(session) -> None:
+    for id_usuario in session.info.pop("usuarios_alterados", ()):
+        invalidar_cache_usuario(id_usuario)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_usuarios_alterados(session) -> None:
+    session.info.pop("usuarios_alterados", None)
 
 
 def get_db():
@@ -22,31 +68,90 @@ def get_db():
         db.close()
 
 
-def verificar_token(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> Usuario:
-    cred_exception = HTTPException(
+def _erro_credenciais() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Acesso negado, verifique a validade do token",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+def decodificar_token(token: str, tipo: str = "access") -> dict:
+    # tokens emitidos antes do campo "typ" valem como access e, sem jti, não
+    # podem ser revogados; expiram sozinhos em até 7 dias
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        id_usuario = payload.get("sub")
-        if id_usuario is None:
-            raise cred_exception
     except JWTError:
-        raise cred_exception
+        raise _erro_credenciais()
+    if payload.get("sub") is None or payload.get("typ", "access") != tipo:
+        raise _erro_credenciais()
+    jti = payload.get("jti")
+    if jti is not None and lista_revogacao.revogado(jti):
+        raise _erro_credenciais()
+    return payload
+
+
+def obter_usuario_autenticado(token: str, db: Session, tipo: str = "access") -> UsuarioAutenticado:
+    cred_exception = _erro_credenciais()
+    id_usuario = decodificar_token(token, tipo)["sub"]
 
     try:
         id_usuario = int(id_usuario)
     except ValueError:
         raise cred_exception
 
+    usuario_autenticado = cache_usuarios.get(id_usuario)
+    if usuario_autenticado is not None:
+        return usuario_autenticado
+
+    # lida antes da consulta: se o usuário for alterado no meio, o snapshot não é guardado
+    geracao = cache_usuarios.geracao
     usuario = db.query(Usuario).filter(Usuario.id == id_usuario).first()
     if not usuario:
         raise cred_exception
 
+    usuario_autenticado = UsuarioAutenticado(
+        id=usuario.id,
+        admin=usuario.admin,
+        ativo=usuario.ativo,
+    )
+    cache_usuarios.set(id_usuario, usuario_autenticado, geracao)
+    return usuario_autenticado
+
+
+def verificar_token(
+    token: str = Depends(oauth2_scheme),
+    db: Session = Depends(get_db),
+) -> UsuarioAutenticado:
+    return obter_usuario_autenticado(token, db)
+
+
+def verificar_token_sem_sessao(token: str = Depends(oauth2_scheme)) -> UsuarioAutenticado:
+    # para respostas longas (streams): get_db seguraria a sessão até o fim da resposta
+    with SessionLocal() as db:
+        return obter_usuario_autenticado(token, db)
+
+
+def verificar_token_stream(
+    token: Optional[str] = Depends(oauth2_scheme_opcional),
+    ticket: Optional[str] = Query(None, description="ticket de POST /orders/stream/ticket, para o EventSource"),
+) -> UsuarioAutenticado:
+    # o EventSource do navegador não envia headers: o cliente troca o access
+    # token por um ticket de vida curta e o passa na URL
+    if token is not None:
+        return verificar_token_sem_sessao(token)
+    if ticket is None:
+        raise _erro_credenciais()
+    with SessionLocal() as db:
+        return obter_usuario_autenticado(ticket, db, "stream")
+
+
+def verificar_admin(
+    usuario: UsuarioAutenticado = Depends(verificar_token),
+) -> UsuarioAutenticado:
+    if not usuario.admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Acesso restrito a administradores",
+        )
     return usuario
@@ -0,0 +1,181 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as TempoEsgotado
+
+from fastapi import HTTPException, status
+from sqlalchemy import insert
+
+from config import AGRUPAMENTO_ESPERA_MS, AGRUPAMENTO_MAXIMO_PEDIDOS, AGRUPAMENTO_TIMEOUT_SEGUNDOS, AGRUPAR_PEDIDOS
+from database import SessionLocal
+from eventos import registrar_evento
+from metricas import BUCKETS_LATENCIA, BUCKETS_QUANTIDADE, Histograma
+from models import ItemPedido, Pedido, agora_utc
+from relatorios import resumo_pedido_criado
+
+logger = logging.getLogger(__name__)
+
+_PARAR = object()
+
+
+def _erro_indisponivel() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Não foi possível gravar o pedido agora, tente novamente em instantes",
+    )
+
+
+class AgrupadorPedidos:
+    """Group commit para POST /orders/pedido.
+
+    As requisições entregam o pedido já validado a uma thread gravadora e
+    esperam o resultado. A gravadora junta o que chegar em até `espera_ms`
+    (ou `maximo` pedidos) e grava tudo em uma transação só, com um commit
+    (e um fsync) por lote em vez de um por pedido.
+    """
+
+    def __init__(self, maximo: int, espera_ms: float, timeout_segundos: float):
+        self.maximo = maximo
+        self.espera = espera_ms / 1000
+        self.timeout = timeout_segundos
+        self._fila = queue.SimpleQueue()
+        self._thread = None
+
+    @property
+    def ativo(self) -> bool:
+        # se a gravadora morreu, a rota volta a gravar cada pedido direto
+        return self._thread is not None and self._thread.is_alive()
+
+    def iniciar(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._executar, name="agrupador-pedidos", daemon=True)
+            self._thread.start()
+
+    def parar(self) -> None:
+        # grava o que estiver na fila antes de encerrar
+        if self._thread is not None:
+            self._fila.put(_PARAR)
+            self._thread.join()
+            self._thread = None
+
+    def criar(self, linha_pedido: dict, itens: list) -> dict:
+        if not self.ativo:
+            logger.error("Thread gravadora de pedidos parada")
+            raise _erro_indisponivel()
+        futuro = Future()
+        self._fila.put((linha_pedido, itens, futuro))
+        try:
+            return futuro.result(timeout=self.timeout)
+        except TempoEsgotado:
+            # cancelado a tempo, a gravadora descarta o pedido; se o lote já
+            # estava sendo gravado, o pedido ainda pode ser criado
+            futuro.cancel()
+            logger.error("Pedido sem resposta da thread gravadora em %.1fs", self.timeout)
+            raise _erro_indisponivel()
+
+    def _executar(self) -> None:
+        while True:
+            primeiro = self._fila.get()
+            if primeiro is _PARAR:
+                return
+
+            lote = [primeiro]
+            parar = False
+            inicio = time.monotonic()
+            prazo = inicio + self.espera
+            while len(lote) < self.maximo:
+                restante = prazo - time.monotonic()
+                try:
+                    # depois do prazo ainda pega o que já está na fila, sem esperar
+                    pedido = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if pedido is _PARAR:
+                    parar = True
+                    break
+                lote.append(pedido)
+
+            # quem desistiu de esperar (timeout) já recebeu 503
+            lote = [pedido for pedido in lote if pedido[2].set_running_or_notify_cancel()]
+            if lote:
+                tamanho_lote_pedidos.observar(len(lote))
+                espera_lote_pedidos.observar(time.monotonic() - inicio)
+                self._gravar(lote)
+            if parar:
+                return
+
+    def _gravar(self, lote: list) -> None:
+        try:
+            resultados = self._gravar_transacao([(linha, itens) for linha, itens, _ in lote])
+        except Exception as erro:
+            if len(lote) == 1:
+                lote[0][2].set_exception(erro)
+                return
+            # um pedido problemático não derruba os outros: refaz um a um
+            logger.exception("Falha ao gravar lote de %d pedidos, gravando individualmente", len(lote))
+            for pedido in lote:
+                self._gravar([pedido])
+            return
+
+        for (_, _, futuro), resultado in zip(lote, resultados):
+            futuro.set_result(resultado)
+
+    def _gravar_transacao(self, pedidos: list) -> list:
+        criado_em = agora_utc()
+        with SessionLocal() as db:
+            ids_pedidos = db.scalars(
+                insert(Pedido).returning(Pedido.id, sort_by_parameter_order=True),
+                [{**linha, "criado_em": criado_em} for linha, _ in pedidos],
+            ).all()
+
+            linhas_itens = [
+                {**item, "pedido_id": id_pedido}
+                for id_pedido, (_, itens) in zip(ids_pedidos, pedidos)
+                for item in itens
+            ]
+            ids_itens = iter(
+                db.scalars(
+                    insert(ItemPedido).returning(ItemPedido.id, sort_by_parameter_order=True),
+                    linhas_itens,
+                ).all()
+            )
+
+            resultados = []
+            for id_pedido, (linha, itens) in zip(ids_pedidos, pedidos):
+                resultado = {
+                    **linha,
+                    "id": id_pedido,
+                    "criado_em": criado_em,
+                    "itens": [
+                        {
+                            **item,
+                            "id": next(ids_itens),
+                            "pedido_id": id_pedido,
+                            "subtotal": item["quantidade"] * item["preco_unitario"],
+                        }
+                        for item in itens
+                    ],
+                }
+                registrar_evento(db, "pedido_criado", resultado)
+                resumo_pedido_criado(db, resultado, itens)
+                resultados.append(resultado)
+            db.commit()
+        return resultados
+
+
+tamanho_lote_pedidos = Histograma(
+    "order_group_commit_batch_size", "Pedidos gravados por transação do group commit", BUCKETS_QUANTIDADE
+)
+espera_lote_pedidos = Histograma(
+    "order_group_commit_wait_seconds", "Tempo que o lote ficou aberto esperando mais pedidos", BUCKETS_LATENCIA
+)
+
+agrupador_pedidos = AgrupadorPedidos(
+    AGRUPAMENTO_MAXIMO_PEDIDOS, AGRUPAMENTO_ESPERA_MS, AGRUPAMENTO_TIMEOUT_SEGUNDOS
+)
+
+
+def iniciar_agrupamento() -> None:
+    if AGRUPAR_PEDIDOS:
+        agrupador_pedidos.iniciar()
@@ -0,0 +1,316 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from typing import Optional
+
+from anyio import to_thread
+from sqlalchemy import delete, event, func, insert, select, text
+
+from config import (
+    EVENTOS_BACKEND,
+    EVENTOS_FILA_CLIENTE,
+    EVENTOS_HISTORICO,
+    EVENTOS_INTERVALO_BANCO,
+    EVENTOS_RETENCAO_BANCO,
+)
+from database import SessionLocal, engine
+from models import EventoPedido, rotulo_status
+
+logger = logging.getLogger(__name__)
+
+TIPOS_EVENTO = (
+    "pedido_criado",
+    "item_adicionado",
+    "item_removido",
+    "pedido_cancelado",
+    "pedido_finalizado",
+)
+
+
+class Assinatura:
+    def __init__(self, usuario, tamanho_fila: int):
+        self.usuario = usuario
+        self.fila = asyncio.Queue(maxsize=tamanho_fila)
+        # a fila encheu e eventos foram perdidos; o cliente deve reconectar
+        self.transbordou = False
+
+    def aceita(self, evento: dict) -> bool:
+        return self.usuario.admin or evento["usuario_id"] == self.usuario.id
+
+
+class BrokerEventos:
+    # distribui os eventos aos clientes conectados neste processo e guarda os
+    # mais recentes para quem reconecta com Last-Event-ID
+    def __init__(self, historico: int, tamanho_fila: int):
+        self.tamanho_fila = tamanho_fila
+        self._historico = deque(maxlen=historico)
+        # id do último evento que não está mais (ou nunca esteve) no histórico
+        self._descartado_ate = 0
+        self.ultimo_id = 0
+        self._assinantes = set()
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def iniciar(self, loop, ultimo_id: int = 0) -> None:
+        self._loop = loop
+        with self._lock:
+            self._historico.clear()
+            self._descartado_ate = self.ultimo_id = ultimo_id
+
+    def entregar(self, evento: dict) -> None:
+        # pode ser chamado de qualquer thread (rotas síncronas rodam no threadpool)
+        with self._lock:
+            if evento["id"] <= self.ultimo_id:
+                return
+            if len(self._historico) == self._historico.maxlen:
+                self._descartado_ate = self._historico[0]["id"]
+            self._historico.append(evento)
+            self.ultimo_id = evento["id"]
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._distribuir, evento)
+
+    def _distribuir(self, evento: dict) -> None:
+        for assinatura in list(self._assinantes):
+            if not assinatura.aceita(evento):
+                continue
+            try:
+                assinatura.fila.put_nowait(evento)
+            except asyncio.QueueFull:
+                assinatura.transbordou = True
+                self._assinantes.discard(assinatura)
+
+    def assinar(self, usuario) -> Assinatura:
+        assinatura = Assinatura(usuario, self.tamanho_fila)
+        self._assinantes.add(assinatura)
+        return assinatura
+
+    def cancelar(self, assinatura: Assinatura) -> None:
+        self._assinantes.discard(assinatura)
+
+    def eventos_desde(self, ultimo_id: int) -> Optional[list]:
+        # None quando o histórico em memória não cobre o intervalo pedido
+        with self._lock:
+            if ultimo_id < self._descartado_ate or ultimo_id > self.ultimo_id:
+                return None
+            return [evento for evento in self._historico if evento["id"] > ultimo_id]
+
+
+class BackendEventos:
+    # ponto de extensão para levar os eventos a todos os workers; as rotas só
+    # chamam registrar_evento, e a sessão aciona o backend no commit
+    def preparar_commit(self, session, eventos: list) -> None:
+        pass
+
+    def confirmar(self, eventos: list) -> None:
+        pass
+
+    def ultimo_id(self) -> int:
+        return 0
+
+    def eventos_desde(self, ultimo_id: int) -> Optional[list]:
+        return None
+
+    async def monitorar(self) -> None:
+        pass
+
+
+class BackendMemoria(BackendEventos):
+    # sem custo extra no banco, mas cada worker só vê os próprios eventos
+    def __init__(self, broker: BrokerEventos):
+        self.broker = broker
+        self._ids = itertools.count(broker.ultimo_id + 1)
+        self._lock = threading.Lock()
+
+    def ultimo_id(self) -> int:
+        return self.broker.ultimo_id
+
+    def confirmar(self, eventos: list) -> None:
+        with self._lock:
+            for evento in eventos:
+                evento["id"] = next(self._ids)
+                self.broker.entregar(evento)
+
+
+def _evento_da_linha(linha) -> dict:
+    return {"id": linha.id, "tipo": linha.tipo, "usuario_id": linha.usuario_id, **json.loads(linha.dados)}
+
+
+# chave do pg_advisory_xact_lock que ordena os commits com eventos
+_CHAVE_LOCK_EVENTOS = 0x65766E74
+
+
+class BackendBanco(BackendEventos):
+    """Outbox: os eventos entram na mesma transação da alteração do pedido e
+    cada worker lê as linhas novas periodicamente, pelo id.
+
+    A leitura por `id > ultimo_id` só é segura se os ids ficarem visíveis em
+    ordem. No sqlite as escritas já são serializadas; no PostgreSQL cada
+    transação pega um lock de transação antes de gerar os ids, então um id
+    menor nunca é confirmado depois de um maior. Outros bancos com vários
+    escritores não são suportados por este backend.
+    """
+
+    def __init__(self, broker: BrokerEventos, intervalo: float, retencao: int):
+        self.broker = broker
+        self.intervalo = intervalo
+        self.retencao = retencao
+        self._lidos_desde_limpeza = 0
+
+    def preparar_commit(self, session, eventos: list) -> None:
+        if session.get_bind().dialect.name == "postgresql":
+            # solto no commit: o próximo escritor só gera ids depois que estes
+            # já estão visíveis
+            session.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": _CHAVE_LOCK_EVENTOS})
+        session.execute(
+            insert(EventoPedido),
+            [
+                {
+                    "tipo": evento["tipo"],
+                    "usuario_id": evento["usuario_id"],
+                    "dados": json.dumps(
+                        {chave: evento[chave] for chave in ("pedido", "item") if chave in evento}
+                    ),
+                }
+                for evento in eventos
+            ],
+        )
+
+    def ultimo_id(self) -> int:
+        with engine.connect() as conn:
+            return conn.scalar(select(func.max(EventoPedido.id))) or 0
+
+    def eventos_desde(self, ultimo_id: int, limite: Optional[int] = None) -> Optional[list]:
+        with engine.connect() as conn:
+            menor_id, maior_id = conn.execute(
+                select(func.min(EventoPedido.id), func.max(EventoPedido.id))
+            ).one()
+            # linhas já apagadas pela retenção, ou um id que o banco não conhece
+            if menor_id is not None and ultimo_id < menor_id - 1:
+                return None
+            if ultimo_id > (maior_id or 0):
+                return None
+            consulta = select(EventoPedido).where(EventoPedido.id > ultimo_id).order_by(EventoPedido.id)
+            if limite is not None:
+                consulta = consulta.limit(limite)
+            return [_evento_da_linha(linha) for linha in conn.execute(consulta)]
+
+    def _ler_novos(self, ultimo_id: int) -> list:
+        eventos = self.eventos_desde(ultimo_id, limite=1000) or []
+        self._lidos_desde_limpeza += len(eventos)
+        # apaga as linhas antigas de tempos em tempos, não a cada leitura
+        if self._lidos_desde_limpeza >= 1000:
+            self._lidos_desde_limpeza = 0
+            with engine.begin() as conn:
+                conn.execute(delete(EventoPedido).where(EventoPedido.id <= eventos[-1]["id"] - self.retencao))
+        return eventos
+
+    async def monitorar(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo)
+            try:
+                for evento in await to_thread.run_sync(self._ler_novos, self.broker.ultimo_id):
+                    self.broker.entregar(evento)
+            except Exception:
+                logger.exception("Falha ao ler eventos de pedidos do banco")
+
+
+def criar_backend(nome: str, broker: BrokerEventos) -> BackendEventos:
+    if nome == "memoria":
+        return BackendMemoria(broker)
+    if nome == "banco":
+        return BackendBanco(broker, EVENTOS_INTERVALO_BANCO, EVENTOS_RETENCAO_BANCO)
+    raise ValueError(f"EVENTOS_BACKEND desconhecido: {nome}")
+
+
+broker_eventos = BrokerEventos(EVENTOS_HISTORICO, EVENTOS_FILA_CLIENTE)
+backend_eventos = criar_backend(EVENTOS_BACKEND, broker_eventos)
+
+
+def _dados_pedido(pedido) -> dict:
+    # só as colunas, sem passar por schema: montar o evento roda dentro da
+    # transação do pedido e não pode derrubar a escrita
+    if not isinstance(pedido, dict):
+        pedido = {coluna: getattr(pedido, coluna) for coluna in ("id", "usuario_id", "preco", "status")}
+    return {
+        "id": pedido["id"],
+        "usuario_id": pedido["usuario_id"],
+        "preco": pedido["preco"],
+        "status": rotulo_status(pedido.get("status")),
+    }
+
+
+def registrar_evento(db, tipo: str, pedido, item: Optional[dict] = None) -> None:
+    # o evento só é publicado se a transação for confirmada
+    dados_pedido = _dados_pedido(pedido)
+    evento = {"tipo": tipo, "usuario_id": dados_pedido["usuario_id"], "pedido": dados_pedido}
+    if item is not None:
+        evento["item"] = item
+    db.info.setdefault("eventos_pendentes", []).append(evento)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _preparar_eventos(session) -> None:
+    eventos = session.info.get("eventos_pendentes")
+    if eventos:
+        backend_eventos.preparar_commit(session, eventos)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _publicar_eventos(session) -> None:
+    eventos = session.info.pop("eventos_pendentes", None)
+    if eventos:
+        backend_eventos.confirmar(eventos)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_eventos(session) -> None:
+    session.info.pop("eventos_pendentes", None)
+
+
+async def iniciar_eventos() -> asyncio.Task:
+    ultimo_id = await to_thread.run_sync(backend_eventos.ultimo_id)
+    broker_eventos.iniciar(asyncio.get_running_loop(), ultimo_id)
+    return asyncio.create_task(backend_eventos.monitorar())
+
+
+def formatar_sse(evento: dict) -> str:
+    dados = {chave: valor for chave, valor in evento.items() if chave != "tipo"}
+    return f"id: {evento['id']}\nevent: {evento['tipo']}\ndata: {json.dumps(dados)}\n\n"
+
+
+async def stream_eventos(usuario, ultimo_id: Optional[int], heartbeat: float):
+    # assina antes de ler o histórico para não perder eventos entre os dois;
+    # duplicatas são descartadas pelo id
+    assinatura = broker_eventos.assinar(usuario)
+    try:
+        yield "retry: 3000\n\n"
+        enviado_ate = broker_eventos.ultimo_id
+
+        if ultimo_id is not None:
+            perdidos = broker_eventos.eventos_desde(ultimo_id)
+            if perdidos is None:
+                perdidos = await to_thread.run_sync(backend_eventos.eventos_desde, ultimo_id)
+            if perdidos is None:
+                # não dá para retomar: o cliente deve recarregar a lista de pedidos
+                yield "event: ressincronizar\ndata: {}\n\n"
+            else:
+                enviado_ate = ultimo_id
+                for evento in perdidos:
+                    if assinatura.aceita(evento):
+                        yield formatar_sse(evento)
+                    enviado_ate = evento["id"]
+
+        while not assinatura.transbordou:
+            try:
+                evento = await asyncio.wait_for(assinatura.fila.get(), heartbeat)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if evento["id"] > enviado_ate:
+                yield formatar_sse(evento)
+                enviado_ate = evento["id"]
+    finally:
+        broker_eventos.cancelar(assinatura)
@@ -0,0 +1,168 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import HTTPException, status
+
+from config import (
+    LOGIN_LIMITE_BACKEND,
+    LOGIN_LIMITE_EMAIL_CAPACIDADE,
+    LOGIN_LIMITE_EMAIL_POR_MINUTO,
+    LOGIN_LIMITE_IP_CAPACIDADE,
+    LOGIN_LIMITE_IP_POR_MINUTO,
+    LOGIN_LIMITE_REDIS_URL,
+    LOGIN_LIMITE_TAMANHO,
+)
+from metricas import Contador
+
+logger = logging.getLogger(__name__)
+
+
+class Balde:
+    def __init__(self, prefixo: str, capacidade: int, por_minuto: float):
+        self.prefixo = prefixo
+        self.capacidade = capacidade
+        self.por_segundo = por_minuto / 60
+
+    def chave(self, valor: str) -> str:
+        return f"login:{self.prefixo}:{valor}"
+
+
+class BackendLimiteLogin:
+    # ponto de extensão para dividir os baldes entre workers
+    async def consumir(self, baldes: list) -> float:
+        """Tira uma ficha de cada (balde, chave) se todos tiverem; senão não
+        tira de nenhum e devolve quantos segundos faltam para a próxima."""
+        return 0.0
+
+
+class BackendMemoria(BackendLimiteLogin):
+    """Baldes por processo num OrderedDict em ordem de último acesso.
+
+    Cada entrada guarda só (fichas, instante) e vale até o balde encher de
+    novo; depois disso equivale a um balde cheio, então é apagada. Só roda no
+    event loop (as rotas de login são async), então não precisa de lock.
+    """
+
+    def __init__(self, tamanho_maximo: int):
+        self.tamanho_maximo = tamanho_maximo
+        # chave -> (fichas, instante, instante em que o balde estará cheio)
+        self._estados: OrderedDict = OrderedDict()
+
+    def _fichas(self, chave: str, balde: Balde, agora: float) -> float:
+        estado = self._estados.get(chave)
+        if estado is None:
+            return float(balde.capacidade)
+        fichas, instante, _ = estado
+        return min(balde.capacidade, fichas + (agora - instante) * balde.por_segundo)
+
+    def _expirar(self, agora: float) -> None:
+        while self._estados:
+            _, (_, _, cheio_em) = next(iter(self._estados.items()))
+            if cheio_em > agora and len(self._estados) <= self.tamanho_maximo:
+                return
+            self._estados.popitem(last=False)
+
+    async def consumir(self, baldes: list) -> float:
+        agora = time.monotonic()
+        self._expirar(agora)
+        fichas = [self._fichas(balde.chave(valor), balde, agora) for balde, valor in baldes]
+        espera = max(
+            ((1 - disponiveis) / balde.por_segundo for (balde, _), disponiveis in zip(baldes, fichas) if disponiveis < 1),
+            default=0.0,
+        )
+        if espera > 0:
+            return espera
+
+        for (balde, valor), disponiveis in zip(baldes, fichas):
+            chave = balde.chave(valor)
+            restantes = disponiveis - 1
+            self._estados[chave] = (restantes, agora, agora + (balde.capacidade - restantes) / balde.por_segundo)
+            self._estados.move_to_end(chave)
+        return 0.0
+
+
+# os dois baldes são conferidos e debitados atomicamente no redis
+_SCRIPT_REDIS = """
+local agora = tonumber(ARGV[1])
+local espera = 0
+local fichas = {}
+for i, chave in ipairs(KEYS) do
+  local capacidade = tonumber(ARGV[2 * i])
+  local por_segundo = tonumber(ARGV[2 * i + 1])
+  local estado = redis.call('HMGET', chave, 'fichas', 'instante')
+  local disponiveis = tonumber(estado[1]) or capacidade
+  local instante = tonumber(estado[2]) or agora
+  disponiveis = math.min(capacidade, disponiveis + (agora - instante) * por_segundo)
+  fichas[i] = disponiveis
+  if disponiveis < 1 then
+    espera = math.max(espera, (1 - disponiveis) / por_segundo)
+  end
+end
+if espera > 0 then
+  return tostring(espera)
+end
+for i, chave in ipairs(KEYS) do
+  local capacidade = tonumber(ARGV[2 * i])
+  local por_segundo = tonumber(ARGV[2 * i + 1])
+  local restantes = fichas[i] - 1
+  redis.call('HSET', chave, 'fichas', tostring(restantes), 'instante', tostring(agora))
+  redis.call('PEXPIRE', chave, math.ceil((capacidade - restantes) / por_segundo * 1000))
+end
+return '0'
+"""
+
+
+class BackendRedis(BackendLimiteLogin):
+    def __init__(self, url: str):
+        # dependência opcional, só importada com LOGIN_LIMITE_BACKEND=redis
+        import redis.asyncio as redis
+
+        self._script = redis.Redis.from_url(url).register_script(_SCRIPT_REDIS)
+
+    async def consumir(self, baldes: list) -> float:
+        argumentos = [time.time()]
+        for balde, _ in baldes:
+            argumentos += [balde.capacidade, balde.por_segundo]
+        try:
+            espera = await self._script(keys=[balde.chave(valor) for balde, valor in baldes], args=argumentos)
+        except Exception:
+            # sem o redis o login continua protegido pelo pool do argon2
+            logger.exception("Falha ao consultar o limite de login no redis")
+            return 0.0
+        return float(espera)
+
+
+def criar_backend(nome: str) -> BackendLimiteLogin:
+    if nome == "memoria":
+        return BackendMemoria(LOGIN_LIMITE_TAMANHO)
+    if nome == "redis":
+        return BackendRedis(LOGIN_LIMITE_REDIS_URL)
+    raise ValueError(f"LOGIN_LIMITE_BACKEND desconhecido: {nome}")
+
+
+balde_ip = Balde("ip", LOGIN_LIMITE_IP_CAPACIDADE, LOGIN_LIMITE_IP_POR_MINUTO)
+balde_email = Balde("email", LOGIN_LIMITE_EMAIL_CAPACIDADE, LOGIN_LIMITE_EMAIL_POR_MINUTO)
+backend_limite_login = criar_backend(LOGIN_LIMITE_BACKEND)
+
+logins_limitados = Contador(
+    "login_throttled_total", "Tentativas de login recusadas com 429 antes do argon2"
+)
+
+
+async def verificar_limite_login(ip: Optional[str], email: str) -> None:
+    # roda antes de qualquer consulta ou hash: quem passou do limite custa só isto
+    baldes = [(balde_email, email.strip().lower())]
+    if ip is not None:
+        baldes.append((balde_ip, ip))
+    espera = await backend_limite_login.consumir(baldes)
+    if espera > 0:
+        logins_limitados.inc()
+        segundos = math.ceil(espera)
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Muitas tentativas de login, tente novamente em {segundos} segundos",
+            headers={"Retry-After": str(segundos)},
+        )
@@ -1,19 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from auth_routes import auth_router
 from order_routes import order_router
-from passlib.context import CryptContext
+from product_routes import product_router
+from admin_routes import admin_router
+from arquivamento import monitorar_arquivamento
+from catalogo import catalogo, monitorar_catalogo
+from config import CATALOGO_INTERVALO_RECARGA, LIMITE_CONCORRENCIA, THREADPOOL_TAMANHO
+from database import engine
+from escrita_agrupada import agrupador_pedidos, iniciar_agrupamento
+from eventos import iniciar_eventos
+from migracoes import garantir_schema
+import metricas
+from perfis import PerfilMiddleware
+from revogacao import iniciar_revogacao
+from sobrecarga import LimiteConcorrenciaMiddleware
 from dotenv import load_dotenv
-import os
 
 load_dotenv()
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # rotas com Session síncrona rodam no threadpool do anyio
+    to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_TAMANHO
+    # o schema é verificado aqui, e não no import, para que importar a app não faça I/O
+    await to_thread.run_sync(garantir_schema, engine)
+
+    await to_thread.run_sync(catalogo.carregar)
+    tarefa_catalogo = asyncio.create_task(monitorar_catalogo(CATALOGO_INTERVALO_RECARGA))
+    tarefa_eventos = await iniciar_eventos()
+    iniciar_agrupamento()
+    tarefa_arquivamento = asyncio.create_task(monitorar_arquivamento())
+    tarefa_revogacao = await iniciar_revogacao()
+    yield
+    tarefa_catalogo.cancel()
+    tarefa_eventos.cancel()
+    tarefa_arquivamento.cancel()
+    tarefa_revogacao.cancel()
+    await to_thread.run_sync(agrupador_pedidos.parar)
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(PerfilMiddleware)
+# dentro das métricas, para que os 503 do limitador apareçam nelas
+if LIMITE_CONCORRENCIA:
+    app.add_middleware(LimiteConcorrenciaMiddleware)
+app.add_middleware(metricas.MetricasMiddleware)
+metricas.instrumentar_engine(engine)
 
 app.include_router(auth_router)
 app.include_router(order_router)
+app.include_router(product_router)
+app.include_router(admin_router)
 
 @app.get("/")
 async def root():
     return {"message": "API funcionando!"}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    # formato texto do Prometheus
+    return PlainTextResponse(metricas.exportar(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,216 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+from sqlalchemy import event
+
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BUCKETS_QUANTIDADE = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+_registro: list = []
+
+
+def _formatar_labels(nomes: tuple, valores: tuple, extra: str = "") -> str:
+    pares = [f'{nome}="{valor}"' for nome, valor in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+class Contador:
+    def __init__(self, nome: str, descricao: str, labels: tuple = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.labels = labels
+        self._valores: dict = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def inc(self, *labels, valor: float = 1) -> None:
+        with self._lock:
+            self._valores[labels] = self._valores.get(labels, 0) + valor
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            itens = list(self._valores.items())
+        for labels, valor in itens:
+            linhas.append(f"{self.nome}{_formatar_labels(self.labels, labels)} {valor}")
+        return linhas
+
+
+class Medidor:
+    """Gauge; com `funcao`, o valor é lido só na hora da exportação."""
+
+    def __init__(self, nome: str, descricao: str, funcao: Optional[Callable[[], float]] = None):
+        self.nome = nome
+        self.descricao = descricao
+        self.funcao = funcao
+        self._valor = 0
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def inc(self, valor: float = 1) -> None:
+        with self._lock:
+            self._valor += valor
+
+    def dec(self, valor: float = 1) -> None:
+        with self._lock:
+            self._valor -= valor
+
+    def exportar(self) -> list:
+        valor = self.funcao() if self.funcao is not None else self._valor
+        return [
+            f"# HELP {self.nome} {self.descricao}",
+            f"# TYPE {self.nome} gauge",
+            f"{self.nome} {valor}",
+        ]
+
+
+class Histograma:
+    def __init__(self, nome: str, descricao: str, buckets: tuple, labels: tuple = ()):
+        self.nome = nome
+        self.descricao = descricao
+        self.buckets = buckets
+        self.labels = labels
+        # labels -> [contagem por bucket (+Inf no fim), soma, total]
+        self._series: dict = {}
+        self._lock = threading.Lock()
+        _registro.append(self)
+
+    def observar(self, valor: float, *labels) -> None:
+        indice = bisect_left(self.buckets, valor)
+        with self._lock:
+            serie = self._series.get(labels)
+            if serie is None:
+                serie = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            serie[0][indice] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self) -> list:
+        linhas = [f"# HELP {self.nome} {self.descricao}", f"# TYPE {self.nome} histogram"]
+        with self._lock:
+            series = [(labels, list(contagens), soma, total) for labels, (contagens, soma, total) in self._series.items()]
+
+        for labels, contagens, soma, total in series:
+            acumulado = 0
+            for limite, contagem in zip(self.buckets, contagens):
+                acumulado += contagem
+                le = _formatar_labels(self.labels, labels, f'le="{limite}"')
+                linhas.append(f"{self.nome}_bucket{le} {acumulado}")
+            le = _formatar_labels(self.labels, labels, 'le="+Inf"')
+            linhas.append(f"{self.nome}_bucket{le} {total}")
+            linhas.append(f"{self.nome}_sum{_formatar_labels(self.labels, labels)} {soma}")
+            linhas.append(f"{self.nome}_count{_formatar_labels(self.labels, labels)} {total}")
+        return linhas
+
+
+def exportar() -> str:
+    linhas = []
+    for metrica in _registro:
+        linhas.extend(metrica.exportar())
+    return "\n".join(linhas) + "\n"
+
+
+requisicoes_total = Contador(
+    "http_requests_total", "Requisições HTTP atendidas", ("metodo", "rota", "status")
+)
+latencia_requisicoes = Histograma(
+    "http_request_duration_seconds", "Latência das requisições HTTP", BUCKETS_LATENCIA, ("metodo", "rota")
+)
+requisicoes_em_andamento = Medidor("http_requests_in_progress", "Requisições HTTP em andamento")
+queries_por_requisicao = Histograma(
+    "db_queries_per_request", "Comandos SQL executados por requisição", BUCKETS_QUANTIDADE, ("metodo", "rota")
+)
+tempo_db_por_requisicao = Histograma(
+    "db_time_per_request_seconds", "Tempo gasto no banco por requisição", BUCKETS_LATENCIA, ("metodo", "rota")
+)
+latencia_queries = Histograma("db_query_duration_seconds", "Duração dos comandos SQL", BUCKETS_LATENCIA)
+
+
+class _ConsultasRequisicao:
+    __slots__ = ("quantidade", "segundos", "scope")
+
+    def __init__(self, scope):
+        self.quantidade = 0
+        self.segundos = 0.0
+        self.scope = scope
+
+
+# o objeto é compartilhado com as threads do threadpool (o contexto é copiado,
+# mas a referência é a mesma), então as rotas síncronas também são contadas
+_consultas_atuais: ContextVar[Optional[_ConsultasRequisicao]] = ContextVar(
+    "consultas_atuais", default=None
+)
+
+
+def rota_atual() -> Optional[str]:
+    # "MÉTODO /template/da/rota" da requisição em andamento, se houver
+    consultas = _consultas_atuais.get()
+    if consultas is None:
+        return None
+    scope = consultas.scope
+    rota = getattr(scope.get("route"), "path", scope.get("path"))
+    return f"{scope['method']} {rota}"
+
+
+def _antes_da_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    context._metricas_inicio = time.perf_counter()
+
+
+def _depois_da_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    duracao = time.perf_counter() - context._metricas_inicio
+    latencia_queries.observar(duracao)
+
+    consultas = _consultas_atuais.get()
+    if consultas is not None:
+        consultas.quantidade += 1
+        consultas.segundos += duracao
+
+
+def instrumentar_engine(engine) -> None:
+    event.listen(engine, "before_cursor_execute", _antes_da_query)
+    event.listen(engine, "after_cursor_execute", _depois_da_query)
+
+
+class MetricasMiddleware:
+    # middleware ASGI puro: mais barato que BaseHTTPMiddleware e não
+    # interfere em respostas em streaming
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_resposta = 500
+
+        async def send_com_status(message):
+            nonlocal status_resposta
+            if message["type"] == "http.response.start":
+                status_resposta = message["status"]
+            await send(message)
+
+        consultas = _ConsultasRequisicao(scope)
+        token = _consultas_atuais.set(consultas)
+        requisicoes_em_andamento.inc()
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_com_status)
+        finally:
+            duracao = time.perf_counter() - inicio
+            requisicoes_em_andamento.dec()
+            _consultas_atuais.reset(token)
+
+            # usa o template da rota (ex.: /orders/pedido/{id_pedido}) para não
+            # criar uma série por id; caminhos sem rota viram um único rótulo
+            rota = getattr(scope.get("route"), "path", "sem_rota")
+            metodo = scope["method"]
+            requisicoes_total.inc(metodo, rota, status_resposta)
+            latencia_requisicoes.observar(duracao, metodo, rota)
+            queries_por_requisicao.observar(consultas.quantidade, metodo, rota)
+            tempo_db_por_requisicao.observar(consultas.segundos, metodo, rota)
@@ -0,0 +1,66 @@
+import os
+
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DBAPIError
+
+from config import MIGRAR_NA_INICIALIZACAO
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")
+
+# bancos criados pelo antigo create_all não têm alembic_version; o schema deles
+# corresponde a esta revisão (as seguintes são idempotentes)
+REVISAO_LEGADA = "5e1f2d9d3a4b"
+
+
+def _config_alembic() -> Config:
+    return Config(ALEMBIC_INI)
+
+
+def revisao_head() -> str:
+    # lê só os arquivos de alembic/versions, não acessa o banco
+    return ScriptDirectory.from_config(_config_alembic()).get_current_head()
+
+
+def revisao_atual(engine) -> str | None:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        return None
+
+
+def aplicar_migracoes(engine) -> None:
+    cfg = _config_alembic()
+    with engine.begin() as conn:
+        cfg.attributes["connection"] = conn
+
+        tabelas = inspect(conn).get_table_names()
+        if "alembic_version" not in tabelas and "pedidos" in tabelas:
+            command.stamp(cfg, REVISAO_LEGADA)
+
+        command.upgrade(cfg, "head")
+
+
+def garantir_schema(engine) -> None:
+    # caso comum: uma única query confirma que o banco já está na versão esperada
+    atual = revisao_atual(engine)
+    head = revisao_head()
+    if atual == head:
+        return
+
+    if not MIGRAR_NA_INICIALIZACAO:
+        raise RuntimeError(
+            f"Banco na revisão {atual}, esperada {head}. Rode 'python migracoes.py'."
+        )
+
+    aplicar_migracoes(engine)
+
+
+if __name__ == "__main__":
+    from database import engine
+
+    aplicar_migracoes(engine)
+    print(f"Banco atualizado para a revisão {revisao_atual(engine)}")
@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String, Boolean
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, Date, DateTime, Float, ForeignKey, Index, Integer, String, Boolean, Text, UniqueConstraint
 from sqlalchemy.orm import declarative_base, relationship
 from sqlalchemy_utils import ChoiceType
 
@@ -11,6 +13,30 @@ STATUS_CHOICES = [
     ("pendente", "Pendente"),
 ]
 STATUS_VALUES = {choice[0] for choice in STATUS_CHOICES}
+# pedidos nesses status não podem mais ser alterados
+STATUS_FINAIS = ("fechado", "cancelado")
+_ROTULOS_STATUS = dict(STATUS_CHOICES)
+
+
+def rotulo_status(status):
+    # ChoiceType devolve um Choice ao ler do banco, mas objetos recém-criados
+    # ainda guardam o código; a API expõe sempre o rótulo (ex.: "Aberto").
+    # status nulo é aceito na criação e segue nulo, como antes
+    if hasattr(status, "value"):
+        return status.value
+    return _ROTULOS_STATUS.get(status, status)
+
+
+def agora_utc() -> datetime:
+    # datas gravadas sem fuso, sempre em UTC
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def _finalizado_em_padrao(contexto):
+    # pedidos criados já em status final contam a retenção desde a criação
+    if contexto.get_current_parameters().get("status") in STATUS_FINAIS:
+        return agora_utc()
+    return None
 
 
 class Usuario(Base):
@@ -28,25 +54,33 @@ class Usuario(Base):
 
 class Pedido(Base):
     __tablename__ = "pedidos"
+    # AUTOINCREMENT: o sqlite não reaproveita ids de pedidos movidos para o arquivo
+    __table_args__ = {"sqlite_autoincrement": True}
 
     id = Column(Integer, primary_key=True, index=True)
-    usuario_id = Column(Integer, ForeignKey("usuarios.id"))
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), index=True)
     preco = Column(Float, nullable=False, default=0)
-    status = Column(ChoiceType(STATUS_CHOICES), nullable=True)
+    status = Column(ChoiceType(STATUS_CHOICES), nullable=True, index=True)
+    # incrementada a cada alteração do pedido (controle de concorrência otimista)
+    versao = Column(Integer, nullable=False, default=1, server_default="1")
+    # quando o pedido chegou a um status final; base da retenção do arquivamento
+    finalizado_em = Column(DateTime, nullable=True, default=_finalizado_em_padrao)
+    criado_em = Column(DateTime, nullable=True, default=agora_utc, index=True)
 
     usuario = relationship("Usuario", back_populates="pedidos")
-    itens = relationship("ItemPedido", back_populates="pedido")
+    itens = relationship("ItemPedido", back_populates="pedido", order_by="ItemPedido.id")
 
-    def calcular_preco(self):
-        self.preco = sum(
-            item.quantidade * item.preco_unitario
-            for item in self.itens
-        )
+    __mapper_args__ = {"version_id_col": versao}
 
 
 class ItemPedido(Base):
     __tablename__ = "itens_pedidos"
-    
+    __table_args__ = (
+        # cobre o carregamento por pedido_id e a busca de remover_item_pedido
+        Index("ix_itens_pedidos_pedido_sabor_tamanho", "pedido_id", "sabor", "tamanho"),
+        {"sqlite_autoincrement": True},
+    )
+
     id = Column(Integer, primary_key=True, index=True)
     pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False)
 
@@ -57,3 +91,115 @@ class ItemPedido(Base):
 
     pedido = relationship("Pedido", back_populates="itens")
 
+    @property
+    def subtotal(self) -> float:
+        return self.quantidade * self.preco_unitario
+
+
+
+
+class Produto(Base):
+    __tablename__ = "produtos"
+    __table_args__ = (UniqueConstraint("sabor", "tamanho"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    # sabor e tamanho são gravados já normalizados (strip + lower)
+    sabor = Column(String, nullable=False)
+    tamanho = Column(String, nullable=False)
+    preco = Column(Float, nullable=False)
+    ativo = Column(Boolean, nullable=False, default=True)
+
+
+class CatalogoVersao(Base):
+    # linha única; incrementada a cada alteração em produtos para que os
+    # workers saibam quando recarregar o catálogo em memória
+    __tablename__ = "catalogo_versao"
+
+    id = Column(Integer, primary_key=True)
+    versao = Column(Integer, nullable=False, default=0)
+
+
+class EventoPedido(Base):
+    # outbox dos eventos de pedidos, usado quando EVENTOS_BACKEND=banco: cada
+    # worker lê as linhas novas e repassa aos clientes de /orders/stream
+    __tablename__ = "eventos_pedidos"
+    # AUTOINCREMENT: os workers leem os eventos por id; sem isso o sqlite
+    # reaproveitaria o maior id se a retenção apagasse todas as linhas
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    tipo = Column(String, nullable=False)
+    usuario_id = Column(Integer, nullable=False)
+    # JSON com o restante do evento (pedido, item)
+    dados = Column(Text, nullable=False)
+
+
+class PedidoArquivado(Base):
+    # pedidos em status final movidos de "pedidos" por arquivamento.py; mantêm
+    # o id original. A tabela quente fica só com o que ainda pode mudar.
+    __tablename__ = "pedidos_arquivo"
+
+    id = Column(Integer, primary_key=True)
+    usuario_id = Column(Integer, ForeignKey("usuarios.id"), index=True)
+    preco = Column(Float, nullable=False)
+    status = Column(ChoiceType(STATUS_CHOICES), nullable=True)
+    versao = Column(Integer, nullable=False)
+    finalizado_em = Column(DateTime, nullable=True)
+    criado_em = Column(DateTime, nullable=True, index=True)
+    arquivado_em = Column(DateTime, nullable=False)
+
+    itens = relationship("ItemPedidoArquivado", back_populates="pedido", order_by="ItemPedidoArquivado.id")
+
+
+class ItemPedidoArquivado(Base):
+    __tablename__ = "itens_pedidos_arquivo"
+
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey("pedidos_arquivo.id"), nullable=False, index=True)
+
+    sabor = Column(String, nullable=False)
+    tamanho = Column(String, nullable=False)
+    quantidade = Column(Integer, nullable=False)
+    preco_unitario = Column(Float, nullable=False)
+
+    pedido = relationship("PedidoArquivado", back_populates="itens")
+
+    @property
+    def subtotal(self) -> float:
+        return self.quantidade * self.preco_unitario
+
+
+class ResumoVendas(Base):
+    # totais por dia de criação do pedido e situação ("aberto" agrupa os status
+    # não finais), mantidos pelas rotas de pedidos (relatorios.py)
+    __tablename__ = "resumo_vendas"
+
+    dia = Column(Date, primary_key=True)
+    situacao = Column(String, primary_key=True)
+    pedidos = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0)
+
+
+class ResumoVendasItens(Base):
+    __tablename__ = "resumo_vendas_itens"
+
+    dia = Column(Date, primary_key=True)
+    situacao = Column(String, primary_key=True)
+    sabor = Column(String, primary_key=True)
+    tamanho = Column(String, primary_key=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    receita = Column(Float, nullable=False, default=0)
+
+
+class TokenRevogado(Base):
+    # jti dos tokens revogados (logout e refresh tokens já usados); cada worker
+    # espelha as linhas em memória (revogacao.py). A linha pode ser apagada
+    # quando o token expira, porque aí o JWT já é recusado de qualquer forma
+    __tablename__ = "tokens_revogados"
+    # AUTOINCREMENT: os workers leem as linhas novas por id, e o sqlite
+    # reaproveitaria o maior id depois da limpeza das expiradas
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    id = Column(Integer, primary_key=True)
+    jti = Column(String, nullable=False, unique=True)
+    expira_em = Column(DateTime, nullable=False, index=True)
@@ -1,47 +1,287 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-
-from dependencies import get_db, verificar_token
-from models import Pedido, STATUS_VALUES, Usuario, ItemPedido
+import hashlib
+from datetime import timedelta
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import case, delete, insert, or_, select, true, update
+from sqlalchemy.orm import Session, selectinload
+
+from config import (
+    EVENTOS_HEARTBEAT_SEGUNDOS,
+    LIMITE_MAXIMO_LISTAGEM,
+    LIMITE_PADRAO_LISTAGEM,
+    LIMITE_PEDIDOS_LOTE,
+    STREAM_TICKET_SEGUNDOS,
+    TAMANHO_LOTE_STREAM,
+)
+from auth_routes import criar_token
+from cache_pedidos import cache_pedidos, invalidar_pedidos
+from catalogo import catalogo
+from database import SessionLocal
+from dependencies import (
+    UsuarioAutenticado,
+    get_db,
+    verificar_token,
+    verificar_token_sem_sessao,
+    verificar_token_stream,
+)
+from escrita_agrupada import agrupador_pedidos
+from eventos import registrar_evento, stream_eventos
+from models import Pedido, PedidoArquivado, STATUS_FINAIS, STATUS_VALUES, ItemPedido, agora_utc
+from relatorios import resumo_item_alterado, resumo_pedido_criado, resumo_status_alterado
 from schemas import (
     PedidoCreateSchema,
     PedidoSchema,
+    PedidoResumoSchema,
     ItemPedidoCreateSchema,
     RemoverItemSchema,
+    LotePedidosSchema,
+    PedidoLoteSchema,
+    PaginaPedidosSchema,
+    PaginaPedidosResumoSchema,
+    PedidoCanceladoSchema,
+    PedidoFinalizadoSchema,
+    ItemAdicionadoSchema,
+    ItemRemovidoSchema,
+    ResultadoLoteSchema,
 )
 
-TABELA_PRECOS_PIZZA = {
-    ("calabresa", "pequeno"): 30.0,
-    ("calabresa", "medio"): 40.0,
-    ("calabresa", "grande"): 50.0,
+def _erro_preco_nao_encontrado() -> HTTPException:
+    return HTTPException(
+        status_code=400,
+        detail="Combinação de sabor e tamanho não encontrada na tabela de preços",
+    )
 
-    ("marguerita", "pequeno"): 32.0,
-    ("marguerita", "medio"): 42.0,
-    ("marguerita", "grande"): 52.0,
 
-    ("frango catupiry", "pequeno"): 35.0,
-    ("frango catupiry", "medio"): 45.0,
-    ("frango catupiry", "grande"): 55.0,
-}
+def calcular_preco_unitario(sabor: str, tamanho: str) -> float:
+    preco = catalogo.preco(sabor, tamanho)
+    if preco is None:
+        raise _erro_preco_nao_encontrado()
+    return preco
+
 
+def calcular_precos_unitarios(itens) -> list:
+    precos = catalogo.precos((item.sabor, item.tamanho) for item in itens)
+    if any(preco is None for preco in precos):
+        raise _erro_preco_nao_encontrado()
+    return precos
 
-def _status_to_str(status):
-    if hasattr(status, "value"):
-        return status.value
-    return status
 
+def _validar_filtro_status(status: Optional[str]) -> None:
+    if status is not None and status not in STATUS_VALUES:
+        raise HTTPException(status_code=400, detail="Status inválido para o filtro")
 
-def calcular_preco_unitario(sabor: str, tamanho: str) -> float:
-    sabor_key = sabor.strip().lower()
-    tamanho_key = tamanho.strip().lower()
 
-    preco = TABELA_PRECOS_PIZZA.get((sabor_key, tamanho_key))
-    if preco is None:
-        raise HTTPException(
-            status_code=400,
-            detail="Combinação de sabor e tamanho não encontrada na tabela de preços",
-        )
-    return preco
+def _modelo_pedido(historico: bool):
+    # historico=True lê os pedidos já movidos para o arquivo (arquivamento.py)
+    return PedidoArquivado if historico else Pedido
+
+
+def _query_pedidos(db: Session, com_itens: bool = False, historico: bool = False):
+    # com_itens carrega os itens de todos os pedidos em um único SELECT ... IN,
+    # evitando um SELECT por pedido ao acessar pedido.itens
+    modelo = _modelo_pedido(historico)
+    query = db.query(modelo)
+    if com_itens:
+        query = query.options(selectinload(modelo.itens))
+    return query
+
+
+def _obter_pedido_por_id(db: Session, id_pedido: int, com_itens: bool = False, historico: bool = False):
+    modelo = _modelo_pedido(historico)
+    return _query_pedidos(db, com_itens, historico).filter(modelo.id == id_pedido).first()
+
+
+def _carregar_pedido_serializado(db: Session, id_pedido: int, historico: bool = False):
+    pedido = _obter_pedido_por_id(db, id_pedido, com_itens=True, historico=historico)
+    if not pedido:
+        return None
+    return pedido.usuario_id, pedido.versao, PedidoSchema.model_validate(pedido).model_dump_json().encode()
+
+
+def _etag_pedido(id_pedido: int, versao: int) -> str:
+    # versao é incrementada a cada alteração do pedido (e copiada para o arquivo)
+    return f'"{id_pedido}.{versao}"'
+
+
+def _etag_pagina(versoes) -> str:
+    # (id, versao) de todas as linhas lidas, incluindo a que indica a próxima página:
+    # muda quando um pedido da página é alterado, criado, arquivado ou sai do filtro
+    resumo = hashlib.blake2b(digest_size=16)
+    for id_pedido, versao in versoes:
+        resumo.update(f"{id_pedido}.{versao};".encode())
+    return f'"{resumo.hexdigest()}"'
+
+
+def _etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    # If-None-Match usa comparação fraca e aceita uma lista ou "*"
+    if not if_none_match:
+        return False
+    for valor in if_none_match.split(","):
+        valor = valor.strip()
+        if valor == "*" or valor.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _versao_pedido(db: Session, id_pedido: int, historico: bool = False):
+    # (usuario_id, versao) do LRU de pedidos ou de um SELECT sem os itens
+    entrada = cache_pedidos.obter_local(id_pedido)
+    if entrada is not None:
+        return entrada[:2]
+    modelos = (Pedido, PedidoArquivado) if historico else (Pedido,)
+    for modelo in modelos:
+        linha = db.execute(
+            select(modelo.usuario_id, modelo.versao).where(modelo.id == id_pedido)
+        ).first()
+        if linha is not None:
+            return tuple(linha)
+    return None
+
+
+def _nao_modificado(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag})
+
+
+def _condicao_permissao(usuario: UsuarioAutenticado):
+    return true() if usuario.admin else Pedido.usuario_id == usuario.id
+
+
+def _condicao_em_aberto():
+    # status NULL também conta como pedido em aberto
+    return or_(Pedido.status.is_(None), Pedido.status.notin_(STATUS_FINAIS))
+
+
+def _atualizar_pedido(db: Session, id_pedido: int, *condicoes, **valores) -> Optional[Pedido]:
+    # UPDATE condicional em um único comando: as condições de permissão e de
+    # status ficam no WHERE, então não há leitura prévia nem perda de
+    # atualizações concorrentes. Retorna None se nenhuma linha foi alterada.
+    stmt = (
+        update(Pedido)
+        .where(Pedido.id == id_pedido, *condicoes)
+        .values(versao=Pedido.versao + 1, **valores)
+    )
+
+    if db.get_bind().dialect.update_returning:
+        return db.scalars(
+            stmt.returning(Pedido),
+            execution_options={"populate_existing": True},
+        ).one_or_none()
+
+    if db.execute(stmt).rowcount == 0:
+        return None
+    return db.get(Pedido, id_pedido, populate_existing=True)
+
+
+def _erro_pedido_nao_alterado(
+    db: Session,
+    id_pedido: int,
+    usuario: UsuarioAutenticado,
+    detalhe_permissao: str,
+    acao: str,
+) -> HTTPException:
+    # só roda quando o UPDATE condicional não alterou nada, para descobrir o motivo
+    db.rollback()
+    pedido = _obter_pedido_por_id(db, id_pedido)
+    if not pedido:
+        return HTTPException(status_code=404, detail="Pedido não encontrado")
+
+    if not usuario.admin and usuario.id != pedido.usuario_id:
+        return HTTPException(status_code=403, detail=detalhe_permissao)
+
+    status_atual = pedido.status.code if hasattr(pedido.status, "code") else pedido.status
+    return HTTPException(
+        status_code=400,
+        detail=f"Não é possível {acao} um pedido com status '{status_atual}'",
+    )
+
+
+def _buscar_pagina_pedidos(
+    db: Session,
+    cursor: Optional[int],
+    limite: int,
+    status: Optional[str],
+    usuario_id: Optional[int],
+    com_itens: bool = False,
+    historico: bool = False,
+):
+    # paginação por keyset: usa o índice da PK em vez de OFFSET
+    modelo = _modelo_pedido(historico)
+    return _filtrar_pagina(_query_pedidos(db, com_itens, historico), modelo, cursor, limite, status, usuario_id).all()
+
+
+def _filtrar_pagina(query, modelo, cursor, limite, status, usuario_id):
+    if cursor is not None:
+        query = query.filter(modelo.id > cursor)
+    if status is not None:
+        query = query.filter(modelo.status == status)
+    if usuario_id is not None:
+        query = query.filter(modelo.usuario_id == usuario_id)
+    return query.order_by(modelo.id).limit(limite)
+
+
+def _etag_listagem(db, cursor, limite, status, usuario_id, historico=False) -> str:
+    # só id e versao, sem itens nem serialização: o suficiente para responder 304
+    modelo = _modelo_pedido(historico)
+    query = db.query(modelo.id, modelo.versao)
+    return _etag_pagina(_filtrar_pagina(query, modelo, cursor, limite + 1, status, usuario_id).all())
+
+
+def _listar_pagina(
+    db, cursor, limite, status, usuario_id, com_itens=False, historico=False, resposta=None, if_none_match=None
+):
+    # com If-None-Match, confere o ETag antes de carregar a página
+    if if_none_match:
+        etag = _etag_listagem(db, cursor, limite, status, usuario_id, historico)
+        if _etag_corresponde(if_none_match, etag):
+            return _nao_modificado(etag)
+
+    # busca um registro a mais só para saber se existe próxima página
+    pagina = _buscar_pagina_pedidos(db, cursor, limite + 1, status, usuario_id, com_itens, historico)
+    if resposta is not None:
+        resposta.headers["ETag"] = _etag_pagina((pedido.id, pedido.versao) for pedido in pagina)
+    tem_mais = len(pagina) > limite
+    pagina = pagina[:limite]
+
+    return {
+        # objetos ORM: o response_model da rota os valida via from_attributes
+        "pedidos": pagina,
+        "proximo_cursor": pagina[-1].id if tem_mais else None,
+    }
+
+
+def _limite_pagina(limite: Optional[int]) -> int:
+    if limite is None:
+        return LIMITE_PADRAO_LISTAGEM
+    if limite > LIMITE_MAXIMO_LISTAGEM:
+        raise HTTPException(status_code=400, detail=f"O limite máximo por página é {LIMITE_MAXIMO_LISTAGEM}")
+    return limite
+
+
+def _stream_pedidos(cursor, status, usuario_id, schema, limite=None, com_itens=False, historico=False):
+    # sessão própria: o gerador continua rodando depois que a rota retorna
+    db = SessionLocal()
+    try:
+        while limite is None or limite > 0:
+            tamanho_lote = TAMANHO_LOTE_STREAM if limite is None else min(TAMANHO_LOTE_STREAM, limite)
+            lote = _buscar_pagina_pedidos(
+                db, cursor, tamanho_lote, status, usuario_id, com_itens, historico
+            )
+            # uma string por lote: o StreamingResponse consome o gerador pelo
+            # threadpool, e uma ida ao threadpool por linha custava mais que a query
+            if lote:
+                yield "".join(schema.model_validate(pedido).model_dump_json() + "\n" for pedido in lote)
+
+            if len(lote) < tamanho_lote:
+                break
+            if limite is not None:
+                limite -= len(lote)
+            cursor = lote[-1].id
+            # libera os objetos do lote anterior para manter a memória constante
+            db.expunge_all()
+    finally:
+        db.close()
 
 
 order_router = APIRouter(
@@ -49,28 +289,51 @@ order_router = APIRouter(
     tags=["orders"],
 )
 
-@order_router.get("/lista")
-async def pedidos(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+_DESCRICAO_LIMITE = (
+    f"pedidos por página (padrão {LIMITE_PADRAO_LISTAGEM}, máximo {LIMITE_MAXIMO_LISTAGEM});"
+    " no formato ndjson, total de pedidos enviados (sem limite se omitido)"
+)
+
+@order_router.get("/lista", response_model=PaginaPedidosResumoSchema)
+def pedidos(
+    resposta: Response,
+    cursor: Optional[int] = Query(None, description="id do último pedido da página anterior"),
+    limite: Optional[int] = Query(None, ge=1, description=_DESCRICAO_LIMITE),
+    status: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    historico: bool = Query(False, description="lista os pedidos arquivados em vez dos atuais"),
+    if_none_match: Optional[str] = Header(None),
+    # sem get_db: no ndjson a sessão da requisição ficaria aberta até o fim do
+    # stream, ao lado da que o gerador abre
+    usuario: UsuarioAutenticado = Depends(verificar_token_sem_sessao),
 ):
-    pedidos_cadastrados = db.query(Pedido).all()
+    _validar_filtro_status(status)
 
-    return [
-        {
-            "id": pedido.id,
-            "usuario_id": pedido.usuario_id,
-            "preco": pedido.preco,
-            "status": _status_to_str(pedido.status),
-        }
-        for pedido in pedidos_cadastrados
-    ]
+    if formato == "ndjson":
+        return StreamingResponse(
+            _stream_pedidos(cursor, status, usuario_id, PedidoResumoSchema, limite, historico=historico),
+            media_type="application/x-ndjson",
+        )
+
+    limite = _limite_pagina(limite)
+    with SessionLocal() as db:
+        return _listar_pagina(
+            db,
+            cursor,
+            limite,
+            status,
+            usuario_id,
+            historico=historico,
+            resposta=resposta,
+            if_none_match=if_none_match,
+        )
 
-@order_router.post("/pedido", status_code=201)
-async def criar_pedido(
+@order_router.post("/pedido", status_code=201, response_model=PedidoSchema)
+def criar_pedido(
     pedido_schema: PedidoCreateSchema,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
 ):
     
     if pedido_schema.status is not None and pedido_schema.status not in STATUS_VALUES:
@@ -88,77 +351,191 @@ async def criar_pedido(
     )
     subtotal = preco_unitario * pedido_schema.quantidade
 
+    if agrupador_pedidos.ativo:
+        return agrupador_pedidos.criar(
+            {
+                "usuario_id": pedido_schema.usuario_id,
+                "preco": subtotal,
+                "status": pedido_schema.status,
+            },
+            [
+                {
+                    "sabor": pedido_schema.sabor,
+                    "tamanho": pedido_schema.tamanho,
+                    "quantidade": pedido_schema.quantidade,
+                    "preco_unitario": preco_unitario,
+                }
+            ],
+        )
+
     novo_pedido = Pedido(
         usuario_id=pedido_schema.usuario_id,
         preco=subtotal,
         status=pedido_schema.status,
     )
-    db.add(novo_pedido)
-    db.flush()
-
     item = ItemPedido(
-        pedido_id=novo_pedido.id,
         sabor=pedido_schema.sabor,
         tamanho=pedido_schema.tamanho,
         quantidade=pedido_schema.quantidade,
         preco_unitario=preco_unitario,
+        pedido=novo_pedido,
     )
-    db.add(item)
+    db.add(novo_pedido)
+    # o flush gera o id usado no evento; o commit logo abaixo não repete o INSERT
     db.flush()
+    registrar_evento(db, "pedido_criado", novo_pedido)
+    resumo_pedido_criado(db, novo_pedido, [item])
+    db.commit()
+
+    return novo_pedido
+
+def _validar_pedido_lote(pedido_schema: PedidoLoteSchema) -> list:
+    if pedido_schema.status is not None and pedido_schema.status not in STATUS_VALUES:
+        raise HTTPException(status_code=400, detail="Status inválido para o pedido")
 
+    if not pedido_schema.itens:
+        raise HTTPException(status_code=400, detail="O pedido precisa ter ao menos um item")
+
+    if any(item_schema.quantidade <= 0 for item_schema in pedido_schema.itens):
+        raise HTTPException(
+            status_code=400,
+            detail="Quantidade deve ser maior que zero",
+        )
+
+    precos_unitarios = calcular_precos_unitarios(pedido_schema.itens)
+
+    itens = []
+    for item_schema, preco_unitario in zip(pedido_schema.itens, precos_unitarios):
+        itens.append(
+            {
+                "sabor": item_schema.sabor,
+                "tamanho": item_schema.tamanho,
+                "quantidade": item_schema.quantidade,
+                "preco_unitario": preco_unitario,
+            }
+        )
+    return itens
+
+
+@order_router.post("/pedidos/bulk", status_code=201, response_model=ResultadoLoteSchema)
+def criar_pedidos_em_lote(
+    lote_schema: LotePedidosSchema,
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
+):
+    if len(lote_schema.pedidos) > LIMITE_PEDIDOS_LOTE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"O lote aceita no máximo {LIMITE_PEDIDOS_LOTE} pedidos",
+        )
+
+    # valida tudo antes de tocar no banco; pedidos inválidos são reportados e ignorados
+    indices_validos = []
+    linhas_pedidos = []
+    itens_por_pedido = []
+    erros = []
+    for indice, pedido_schema in enumerate(lote_schema.pedidos):
+        try:
+            itens = _validar_pedido_lote(pedido_schema)
+        except HTTPException as erro:
+            erros.append({"indice": indice, "detail": erro.detail})
+            continue
+
+        indices_validos.append(indice)
+        itens_por_pedido.append(itens)
+        linhas_pedidos.append(
+            {
+                "usuario_id": pedido_schema.usuario_id,
+                "status": pedido_schema.status,
+                "preco": sum(item["quantidade"] * item["preco_unitario"] for item in itens),
+            }
+        )
+
+    if not linhas_pedidos:
+        raise HTTPException(status_code=400, detail={"erros": erros})
+
+    criado_em = agora_utc()
+    for linha in linhas_pedidos:
+        linha["criado_em"] = criado_em
+
+    # um INSERT multi-linha para os pedidos (com RETURNING dos ids, na ordem
+    # enviada) e um executemany para todos os itens, na mesma transação
+    ids_pedidos = db.scalars(
+        insert(Pedido).returning(Pedido.id, sort_by_parameter_order=True),
+        linhas_pedidos,
+    ).all()
+
+    linhas_itens = [
+        {**item, "pedido_id": id_pedido}
+        for id_pedido, itens in zip(ids_pedidos, itens_por_pedido)
+        for item in itens
+    ]
+    db.execute(insert(ItemPedido), linhas_itens)
+    for id_pedido, linha, itens in zip(ids_pedidos, linhas_pedidos, itens_por_pedido):
+        registrar_evento(db, "pedido_criado", {**linha, "id": id_pedido})
+        resumo_pedido_criado(db, linha, itens)
     db.commit()
-    db.refresh(novo_pedido)
-    db.refresh(item)
 
     return {
-        "id": novo_pedido.id,
-        "usuario_id": novo_pedido.usuario_id,
-        "preco_total": novo_pedido.preco,
-        "status": _status_to_str(novo_pedido.status),
-        "itens": [
+        "criados": [
             {
-                "id": item.id,
-                "sabor": item.sabor,
-                "tamanho": item.tamanho,
-                "quantidade": item.quantidade,
-                "preco_unitario": item.preco_unitario,
-                "subtotal": subtotal,
+                "indice": indice,
+                "id": id_pedido,
+                "preco_total": linha["preco"],
+                "quantidade_itens": len(itens),
             }
+            for indice, id_pedido, linha, itens in zip(
+                indices_validos, ids_pedidos, linhas_pedidos, itens_por_pedido
+            )
         ],
+        "erros": erros,
     }
 
-@order_router.post("/pedido/cancelar/{id_pedido}")
-async def cancelar_pedido(
+@order_router.post("/pedido/cancelar/{id_pedido}", response_model=PedidoCanceladoSchema)
+def cancelar_pedido(
     id_pedido: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
 ):
-    pedido = db.query(Pedido).filter(Pedido.id == id_pedido).first()
-
+    pedido = _atualizar_pedido(
+        db,
+        id_pedido,
+        _condicao_permissao(usuario),
+        _condicao_em_aberto(),
+        status="cancelado",
+        finalizado_em=agora_utc(),
+    )
     if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido não encontrado")
-
-    if not usuario.admin and usuario.id != pedido.usuario_id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para cancelar esse pedido")
-
-    pedido.status = "cancelado"
+        raise _erro_pedido_nao_alterado(
+            db,
+            id_pedido,
+            usuario,
+            "Você não tem permissão para cancelar esse pedido",
+            "cancelar",
+        )
+    registrar_evento(db, "pedido_cancelado", pedido)
+    resumo_status_alterado(db, pedido)
+    invalidar_pedidos(db, [pedido.id])
     db.commit()
-    db.refresh(pedido)
 
     return {
         "mensagem": f"Pedido número {pedido.id} cancelado com sucesso",
-        "pedido": {
-            "id": pedido.id,
-            "usuario_id": pedido.usuario_id,
-            "preco": pedido.preco,
-            "status": _status_to_str(pedido.status),
-        },
+        "pedido": pedido,
     }
 
-@order_router.get("/listar")
-async def listar_pedidos(
-    db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+@order_router.get("/listar", response_model=PaginaPedidosSchema)
+def listar_pedidos(
+    resposta: Response,
+    cursor: Optional[int] = Query(None, description="id do último pedido da página anterior"),
+    limite: Optional[int] = Query(None, ge=1, description=_DESCRICAO_LIMITE),
+    status: Optional[str] = None,
+    usuario_id: Optional[int] = None,
+    formato: Literal["json", "ndjson"] = "json",
+    historico: bool = Query(False, description="lista os pedidos arquivados em vez dos atuais"),
+    if_none_match: Optional[str] = Header(None),
+    # sem get_db: no ndjson a sessão da requisição ficaria aberta até o fim do
+    # stream, ao lado da que o gerador abre
+    usuario: UsuarioAutenticado = Depends(verificar_token_sem_sessao),
 ):
     
     if not usuario.admin:
@@ -167,50 +544,35 @@ async def listar_pedidos(
             detail="Você não tem permissão para listar pedidos"
         )
 
-    pedidos = db.query(Pedido).all()
+    _validar_filtro_status(status)
 
-    resposta = []
-    for p in pedidos:
-        itens_formatados = []
-        for item in p.itens:
-            subtotal = item.quantidade * item.preco_unitario
-            itens_formatados.append(
-                {
-                    "id": item.id,
-                    "sabor": item.sabor,
-                    "tamanho": item.tamanho,
-                    "quantidade": item.quantidade,
-                    "preco_unitario": item.preco_unitario,
-                    "subtotal": subtotal,
-                }
-            )
-
-        resposta.append(
-            {
-                "id": p.id,
-                "usuario_id": p.usuario_id,
-                "preco_total": p.preco,
-                "status": _status_to_str(p.status),
-                "itens": itens_formatados,
-            }
+    if formato == "ndjson":
+        return StreamingResponse(
+            _stream_pedidos(cursor, status, usuario_id, PedidoSchema, limite, com_itens=True, historico=historico),
+            media_type="application/x-ndjson",
         )
 
-    return resposta
+    limite = _limite_pagina(limite)
+    with SessionLocal() as db:
+        return _listar_pagina(
+            db,
+            cursor,
+            limite,
+            status,
+            usuario_id,
+            com_itens=True,
+            historico=historico,
+            resposta=resposta,
+            if_none_match=if_none_match,
+        )
 
-@order_router.post("/pedido/adicionar-item/{id_pedido}")
-async def adicionar_item_pedido(
+@order_router.post("/pedido/adicionar-item/{id_pedido}", response_model=ItemAdicionadoSchema)
+def adicionar_item_pedido(
     id_pedido: int,
     item_pedido_schema: ItemPedidoCreateSchema,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
 ):
-    pedido = db.query(Pedido).filter(Pedido.id == id_pedido).first()
-    if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido não encontrado")
-
-    if not usuario.admin and usuario.id != pedido.usuario_id:
-        raise HTTPException(status_code=403, detail="Você não tem permissão para alterar esse pedido")
-    
     if item_pedido_schema.quantidade <= 0:
         raise HTTPException(
             status_code=400,
@@ -221,57 +583,107 @@ async def adicionar_item_pedido(
         item_pedido_schema.sabor,
         item_pedido_schema.tamanho,
     )
+    valor_novo_item = item_pedido_schema.quantidade * preco_unitario
+
+    pedido = _atualizar_pedido(
+        db,
+        id_pedido,
+        _condicao_permissao(usuario),
+        _condicao_em_aberto(),
+        preco=Pedido.preco + valor_novo_item,
+    )
+    if not pedido:
+        raise _erro_pedido_nao_alterado(
+            db,
+            id_pedido,
+            usuario,
+            "Você não tem permissão para alterar esse pedido",
+            "alterar",
+        )
 
     item_pedido = ItemPedido(
+        pedido_id=id_pedido,
         sabor=item_pedido_schema.sabor,
         tamanho=item_pedido_schema.tamanho,
         quantidade=item_pedido_schema.quantidade,
         preco_unitario=preco_unitario,
-        pedido=pedido,
     )
-
-    valor_novo_item = item_pedido.quantidade * item_pedido.preco_unitario
-    pedido.preco += valor_novo_item
-
     db.add(item_pedido)
-    db.commit()
-    db.refresh(pedido)
-    db.refresh(item_pedido)
-
-    return {
-        "mensagem": "Item adicionado com sucesso",
-        "item": {
+    db.flush()
+    registrar_evento(
+        db,
+        "item_adicionado",
+        pedido,
+        {
             "id": item_pedido.id,
             "pedido_id": item_pedido.pedido_id,
             "sabor": item_pedido.sabor,
             "tamanho": item_pedido.tamanho,
             "quantidade": item_pedido.quantidade,
             "preco_unitario": item_pedido.preco_unitario,
-            "subtotal": valor_novo_item,
+            "subtotal": item_pedido.subtotal,
         },
+    )
+    resumo_item_alterado(
+        db, pedido, item_pedido.sabor, item_pedido.tamanho, item_pedido.quantidade, valor_novo_item
+    )
+    invalidar_pedidos(db, [pedido.id])
+    db.commit()
+
+    return {
+        "mensagem": "Item adicionado com sucesso",
+        "item": item_pedido,
         "preco_pedido": pedido.preco,
     }
 
 
-@order_router.post("/pedido/remover-item/{id_pedido}")
-async def remover_item_pedido(
+def _retirar_unidades(db: Session, id_item: int, quantidade: int) -> Optional[tuple]:
+    # a conta fica no WHERE/SET, sem depender da quantidade lida antes: remoções
+    # simultâneas do mesmo item se enfileiram no banco em vez de falharem.
+    # Retorna (removida, restante), ou None se o item não existe mais.
+    parcial = (
+        update(ItemPedido)
+        .where(ItemPedido.id == id_item, ItemPedido.quantidade > quantidade)
+        .values(quantidade=ItemPedido.quantidade - quantidade)
+    )
+    # pedir tudo ou mais do que resta remove o item
+    total = delete(ItemPedido).where(ItemPedido.id == id_item, ItemPedido.quantidade <= quantidade)
+    opcoes = {"synchronize_session": False}
+
+    dialeto = db.get_bind().dialect
+    if dialeto.update_returning and dialeto.delete_returning:
+        restante = db.scalar(parcial.returning(ItemPedido.quantidade), execution_options=opcoes)
+        if restante is not None:
+            return quantidade, restante
+        removida = db.scalar(total.returning(ItemPedido.quantidade), execution_options=opcoes)
+        return (removida, 0) if removida is not None else None
+
+    if db.execute(parcial, execution_options=opcoes).rowcount:
+        return quantidade, db.scalar(select(ItemPedido.quantidade).where(ItemPedido.id == id_item))
+    removida = db.scalar(select(ItemPedido.quantidade).where(ItemPedido.id == id_item).with_for_update())
+    if removida is None or db.execute(total, execution_options=opcoes).rowcount == 0:
+        return None
+    return removida, 0
+
+
+@order_router.post("/pedido/remover-item/{id_pedido}", response_model=ItemRemovidoSchema)
+def remover_item_pedido(
     id_pedido: int,
     remover_item: RemoverItemSchema,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
 ):
-    pedido = db.query(Pedido).filter(Pedido.id == id_pedido).first()
-    if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido não encontrado")
+    detalhe_permissao = "Você não tem permissão para alterar esse pedido"
 
-    if not usuario.admin and usuario.id != pedido.usuario_id:
+    # com quantidade negativa o UPDATE relativo somaria unidades ao item
+    if remover_item.quantidade <= 0:
         raise HTTPException(
-            status_code=403,
-            detail="Você não tem permissão para alterar esse pedido",
+            status_code=400,
+            detail="Quantidade deve ser maior que zero",
         )
 
     item = (
-        db.query(ItemPedido)
+        db.query(ItemPedido.id, ItemPedido.preco_unitario)
         .filter(
             ItemPedido.pedido_id == id_pedido,
             ItemPedido.sabor == remover_item.sabor,
@@ -281,29 +693,55 @@ async def remover_item_pedido(
     )
 
     if not item:
+        pedido = _obter_pedido_por_id(db, id_pedido)
+        if not pedido:
+            raise HTTPException(status_code=404, detail="Pedido não encontrado")
+        if not usuario.admin and usuario.id != pedido.usuario_id:
+            raise HTTPException(status_code=403, detail=detalhe_permissao)
         raise HTTPException(
             status_code=404,
             detail="Item não encontrado nesse pedido",
         )
 
-    if remover_item.quantidade >= item.quantidade:
-        valor_removido = item.quantidade * item.preco_unitario
-        quantidade_removida = item.quantidade
-        quantidade_restante = 0
-        db.delete(item)
-    else:
-        valor_removido = remover_item.quantidade * item.preco_unitario
-        item.quantidade -= remover_item.quantidade
-        quantidade_removida = remover_item.quantidade
-        quantidade_restante = item.quantidade
-
-    novo_preco = pedido.preco - valor_removido
-    if novo_preco < 0:
-        novo_preco = 0.0
-    pedido.preco = novo_preco
-
+    retirada = _retirar_unidades(db, item.id, remover_item.quantidade)
+    if retirada is None:
+        # outra requisição removeu o item inteiro entre a busca e o UPDATE
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="O item não tem mais unidades nesse pedido",
+        )
+    quantidade_removida, quantidade_restante = retirada
+
+    valor_removido = quantidade_removida * item.preco_unitario
+    novo_preco = Pedido.preco - valor_removido
+    pedido = _atualizar_pedido(
+        db,
+        id_pedido,
+        _condicao_permissao(usuario),
+        _condicao_em_aberto(),
+        preco=case((novo_preco < 0, 0.0), else_=novo_preco),
+    )
+    if not pedido:
+        raise _erro_pedido_nao_alterado(
+            db, id_pedido, usuario, detalhe_permissao, "alterar"
+        )
+    registrar_evento(
+        db,
+        "item_removido",
+        pedido,
+        {
+            "sabor": remover_item.sabor,
+            "tamanho": remover_item.tamanho,
+            "quantidade_removida": quantidade_removida,
+            "quantidade_restante": quantidade_restante,
+        },
+    )
+    resumo_item_alterado(
+        db, pedido, remover_item.sabor, remover_item.tamanho, -quantidade_removida, -valor_removido
+    )
+    invalidar_pedidos(db, [pedido.id])
     db.commit()
-    db.refresh(pedido)
 
     return {
         "mensagem": "Item removido com sucesso",
@@ -317,7 +755,7 @@ async def remover_item_pedido(
             "id": pedido.id,
             "usuario_id": pedido.usuario_id,
             "preco": pedido.preco,
-            "status": _status_to_str(pedido.status),
+            "status": pedido.status,
             "item_restante": {
                 "sabor": remover_item.sabor,
                 "tamanho": remover_item.tamanho,
@@ -327,11 +765,11 @@ async def remover_item_pedido(
     }
 
 
-@order_router.post("/pedido/finalizar/{id_pedido}")
-async def finalizar_pedido(
+@order_router.post("/pedido/finalizar/{id_pedido}", response_model=PedidoFinalizadoSchema)
+def finalizar_pedido(
     id_pedido: int,
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
 ):
     if not usuario.admin:
         raise HTTPException(
@@ -339,81 +777,86 @@ async def finalizar_pedido(
             detail="Você não tem permissão para finalizar pedidos",
         )
 
-    pedido = db.query(Pedido).filter(Pedido.id == id_pedido).first()
+    pedido = _atualizar_pedido(
+        db, id_pedido, _condicao_em_aberto(), status="fechado", finalizado_em=agora_utc()
+    )
     if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido não encontrado")
-
-    status_atual = _status_to_str(pedido.status).lower()
-
-    if status_atual in ("fechado", "cancelado"):
-        raise HTTPException(
-            status_code=400,
-            detail=f"Não é possível finalizar um pedido com status '{status_atual}'",
+        raise _erro_pedido_nao_alterado(
+            db,
+            id_pedido,
+            usuario,
+            "Você não tem permissão para finalizar pedidos",
+            "finalizar",
         )
-    
-    pedido.status = "fechado"
-    db.commit()
-    db.refresh(pedido)
 
-    itens_formatados = []
-    for item in pedido.itens:
-        subtotal = item.quantidade * item.preco_unitario
-        itens_formatados.append(
-            {
-                "id": item.id,
-                "sabor": item.sabor,
-                "tamanho": item.tamanho,
-                "quantidade": item.quantidade,
-                "preco_unitario": item.preco_unitario,
-                "subtotal": subtotal,
-            }
-        )
+    registrar_evento(db, "pedido_finalizado", pedido)
+    resumo_status_alterado(db, pedido)
+    invalidar_pedidos(db, [pedido.id])
+    db.commit()
 
     return {
         "mensagem": f"Pedido {pedido.id} finalizado com sucesso",
-        "pedido": {
-            "id": pedido.id,
-            "usuario_id": pedido.usuario_id,
-            "preco_total": pedido.preco,
-            "status": _status_to_str(pedido.status),
-            "itens": itens_formatados,
-        },
+        "pedido": pedido,
     }
 
-@order_router.get("/pedido/{id_pedido}")
-async def obter_pedido(
+@order_router.post("/stream/ticket")
+async def criar_ticket_stream(usuario: UsuarioAutenticado = Depends(verificar_token)):
+    ticket = criar_token(usuario.id, timedelta(seconds=STREAM_TICKET_SEGUNDOS), tipo="stream")
+    return {"ticket": ticket, "expira_em_segundos": STREAM_TICKET_SEGUNDOS}
+
+
+@order_router.get("/stream")
+async def stream_eventos_pedidos(
+    ultimo_id: Optional[int] = Query(None, description="id do último evento recebido"),
+    last_event_id: Optional[int] = Header(None),
+    usuario: UsuarioAutenticado = Depends(verificar_token_stream),
+):
+    # Server-Sent Events com as alterações de pedidos, no lugar de consultar
+    # /lista periodicamente; admins recebem todos os pedidos, os demais só os seus.
+    # Aceita o header Authorization ou ?ticket= (EventSource do navegador), que
+    # reenvia o Last-Event-ID sozinho ao reconectar.
+    if last_event_id is not None:
+        ultimo_id = last_event_id
+    return StreamingResponse(
+        stream_eventos(usuario, ultimo_id, EVENTOS_HEARTBEAT_SEGUNDOS),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@order_router.get("/pedido/{id_pedido}", response_model=PedidoSchema)
+def obter_pedido(
     id_pedido: int,
+    historico: bool = Query(False, description="procura também nos pedidos arquivados"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
-    usuario: Usuario = Depends(verificar_token),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
 ):
-    pedido = db.query(Pedido).filter(Pedido.id == id_pedido).first()
-    if not pedido:
+    if if_none_match:
+        atual = _versao_pedido(db, id_pedido, historico)
+        if atual is not None:
+            usuario_id, versao = atual
+            etag = _etag_pedido(id_pedido, versao)
+            # sem permissão, segue o caminho normal, que responde 403
+            if (usuario.admin or usuario.id == usuario_id) and _etag_corresponde(if_none_match, etag):
+                return _nao_modificado(etag)
+
+    # só os pedidos atuais passam pelo cache; o arquivo é lido direto
+    entrada = cache_pedidos.obter(id_pedido, lambda: _carregar_pedido_serializado(db, id_pedido))
+    if entrada is None and historico:
+        entrada = _carregar_pedido_serializado(db, id_pedido, historico=True)
+    if entrada is None:
         raise HTTPException(status_code=404, detail="Pedido não encontrado")
 
-    if not usuario.admin and usuario.id != pedido.usuario_id:
+    usuario_id, versao, corpo = entrada
+    if not usuario.admin and usuario.id != usuario_id:
         raise HTTPException(
             status_code=403,
             detail="Você não tem permissão para visualizar esse pedido",
         )
 
-    itens_formatados = []
-    for item in pedido.itens:
-        subtotal = item.quantidade * item.preco_unitario
-        itens_formatados.append(
-            {
-                "id": item.id,
-                "sabor": item.sabor,
-                "tamanho": item.tamanho,
-                "quantidade": item.quantidade,
-                "preco_unitario": item.preco_unitario,
-                "subtotal": subtotal,
-            }
-        )
-
-    return {
-        "id": pedido.id,
-        "usuario_id": pedido.usuario_id,
-        "preco_total": pedido.preco,
-        "status": _status_to_str(pedido.status),
-        "itens": itens_formatados,
-    }
+    # o corpo já é o JSON de PedidoSchema; o response_model fica para a documentação
+    return Response(
+        content=corpo,
+        media_type="application/json",
+        headers={"ETag": _etag_pedido(id_pedido, versao)},
+    )
@@ -0,0 +1,188 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+
+from anyio import to_thread
+from fastapi import HTTPException
+
+from config import (
+    PERFIL_AMOSTRAGEM,
+    PERFIL_DIRETORIO,
+    PERFIL_INTERVALO_MS,
+    PERFIL_MAXIMO_ARQUIVOS,
+)
+from dependencies import verificar_token_sem_sessao
+
+CABECALHO_PERFIL = b"x-perfil"
+
+_RE_CARACTERES_ARQUIVO = re.compile(r"[^A-Za-z0-9]+")
+
+
+def _nome_frame(frame) -> str:
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})"
+
+
+class AmostradorPilhas:
+    # profiler por amostragem: uma thread lê sys._current_frames() a cada
+    # intervalo. O cProfile só enxerga a thread que o ligou, e as rotas
+    # síncronas rodam no threadpool, longe do event loop.
+    def __init__(self, scope, frame_requisicao, intervalo_segundos: float):
+        self.scope = scope
+        self.frame_requisicao = frame_requisicao
+        self.ident_loop = threading.get_ident()
+        self.intervalo = intervalo_segundos
+        self.amostras = Counter()
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._executar, name="perfil-amostrador", daemon=True)
+
+    def _pilha_da_requisicao(self, ident: int, frame, codigo_endpoint):
+        # no event loop só contam pilhas que passam pelo middleware desta
+        # requisição; nas threads do pool, as que estão dentro do endpoint
+        pilha = []
+        pertence = False
+        while frame is not None:
+            if ident == self.ident_loop:
+                pertence = pertence or frame is self.frame_requisicao
+            else:
+                pertence = pertence or frame.f_code is codigo_endpoint
+            pilha.append(_nome_frame(frame))
+            frame = frame.f_back
+        if not pertence:
+            return None
+        pilha.reverse()
+        return ";".join(pilha)
+
+    def _executar(self) -> None:
+        ident_proprio = threading.get_ident()
+        while not self._parar.wait(self.intervalo):
+            # a rota só é conhecida depois do roteamento, que preenche scope["route"]
+            endpoint = getattr(self.scope.get("route"), "endpoint", None)
+            codigo_endpoint = getattr(endpoint, "__code__", None)
+            for ident, frame in sys._current_frames().items():
+                if ident == ident_proprio:
+                    continue
+                pilha = self._pilha_da_requisicao(ident, frame, codigo_endpoint)
+                if pilha is not None:
+                    self.amostras[pilha] += 1
+
+    def iniciar(self) -> None:
+        self._thread.start()
+
+    def parar(self) -> None:
+        self._parar.set()
+        self._thread.join()
+
+    def exportar(self) -> str:
+        # formato "folded" (pilha;separada;por;ponto-e-vírgula contagem), aceito
+        # por flamegraph.pl, speedscope e inferno
+        return "".join(f"{pilha} {quantidade}\n" for pilha, quantidade in self.amostras.items())
+
+
+def diretorio_perfis() -> Path:
+    return Path(PERFIL_DIRETORIO)
+
+
+def listar_perfis() -> list:
+    diretorio = diretorio_perfis()
+    if not diretorio.is_dir():
+        return []
+    perfis = []
+    for arquivo in sorted(diretorio.glob("*.folded"), reverse=True):
+        info = arquivo.stat()
+        perfis.append(
+            {
+                "nome": arquivo.name,
+                "tamanho_bytes": info.st_size,
+                "criado_em": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(info.st_mtime)),
+            }
+        )
+    return perfis
+
+
+def caminho_perfil(nome: str) -> Path:
+    # só aceita nomes de arquivo do próprio diretório (sem "../")
+    caminho = diretorio_perfis() / nome
+    if Path(nome).name != nome or caminho.suffix != ".folded" or not caminho.is_file():
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    return caminho
+
+
+def _gravar_perfil(nome: str, conteudo: str) -> None:
+    diretorio = diretorio_perfis()
+    diretorio.mkdir(parents=True, exist_ok=True)
+    (diretorio / nome).write_text(conteudo)
+
+    # os nomes começam pelo horário, então a ordem alfabética é a cronológica
+    antigos = sorted(diretorio.glob("*.folded"))[:-PERFIL_MAXIMO_ARQUIVOS]
+    for arquivo in antigos:
+        arquivo.unlink(missing_ok=True)
+
+
+def _eh_admin(token: str) -> bool:
+    try:
+        return verificar_token_sem_sessao(token).admin
+    except HTTPException:
+        return False
+
+
+def _token_bearer(scope):
+    for nome, valor in scope["headers"]:
+        if nome == b"authorization":
+            esquema, _, token = valor.decode("latin-1").partition(" ")
+            if esquema.lower() == "bearer" and token:
+                return token
+    return None
+
+
+def _nome_perfil(scope) -> str:
+    caminho = getattr(scope.get("route"), "path", scope["path"])
+    return "{}-{}-{}-{}.folded".format(
+        time.strftime("%Y%m%dT%H%M%S"),
+        uuid.uuid4().hex[:8],
+        scope["method"],
+        _RE_CARACTERES_ARQUIVO.sub("_", caminho).strip("_") or "raiz",
+    )
+
+
+class PerfilMiddleware:
+    # sem o cabeçalho X-Perfil e com a amostragem desligada, o custo é
+    # apenas a busca do cabeçalho na lista de headers
+    def __init__(self, app):
+        self.app = app
+
+    async def _deve_perfilar(self, scope) -> bool:
+        if any(nome == CABECALHO_PERFIL for nome, _ in scope["headers"]):
+            token = _token_bearer(scope)
+            if token is not None and await to_thread.run_sync(_eh_admin, token):
+                return True
+        return PERFIL_AMOSTRAGEM > 0 and random.random() < PERFIL_AMOSTRAGEM
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not await self._deve_perfilar(scope):
+            await self.app(scope, receive, send)
+            return
+
+        nome = None
+
+        async def send_com_cabecalho(message):
+            nonlocal nome
+            if message["type"] == "http.response.start":
+                # o nome usa o template da rota, já resolvido neste ponto
+                nome = _nome_perfil(scope)
+                message["headers"] = [*message.get("headers", []), (CABECALHO_PERFIL, nome.encode())]
+            await send(message)
+
+        amostrador = AmostradorPilhas(scope, sys._getframe(), PERFIL_INTERVALO_MS / 1000)
+        amostrador.iniciar()
+        try:
+            await self.app(scope, receive, send_com_cabecalho)
+        finally:
+            amostrador.parar()
+            await to_thread.run_sync(_gravar_perfil, nome or _nome_perfil(scope), amostrador.exportar())
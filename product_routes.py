@@ -0,0 +1,65 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from catalogo import catalogo, incrementar_versao_catalogo, normalizar
+from dependencies import UsuarioAutenticado, get_db, verificar_token
+from models import Produto
+from schemas import ProdutoSchema
+
+product_router = APIRouter(
+    prefix="/produtos",
+    tags=["produtos"],
+)
+
+
+@product_router.get("/")
+def listar_produtos(usuario: UsuarioAutenticado = Depends(verificar_token)):
+    # servido pelo índice em memória, sem consultar o banco
+    return {"versao": catalogo.versao, "produtos": catalogo.produtos()}
+
+
+@product_router.put("/")
+def salvar_produto(
+    produto_schema: ProdutoSchema,
+    db: Session = Depends(get_db),
+    usuario: UsuarioAutenticado = Depends(verificar_token),
+):
+    if not usuario.admin:
+        raise HTTPException(
+            status_code=403,
+            detail="Você não tem permissão para alterar o catálogo",
+        )
+
+    if produto_schema.preco < 0:
+        raise HTTPException(status_code=400, detail="Preço não pode ser negativo")
+
+    sabor = normalizar(produto_schema.sabor)
+    tamanho = normalizar(produto_schema.tamanho)
+
+    produto = (
+        db.query(Produto)
+        .filter(Produto.sabor == sabor, Produto.tamanho == tamanho)
+        .first()
+    )
+    if produto is None:
+        produto = Produto(sabor=sabor, tamanho=tamanho)
+        db.add(produto)
+
+    produto.preco = produto_schema.preco
+    produto.ativo = produto_schema.ativo
+    incrementar_versao_catalogo(db)
+    db.commit()
+
+    # este worker recarrega na hora; os demais na próxima verificação de versão
+    catalogo.carregar()
+
+    return {
+        "mensagem": "Produto salvo com sucesso",
+        "versao": catalogo.versao,
+        "produto": {
+            "sabor": sabor,
+            "tamanho": tamanho,
+            "preco": produto_schema.preco,
+            "ativo": produto_schema.ativo,
+        },
+    }
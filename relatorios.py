@@ -0,0 +1,415 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import Date, String, and_, case, delete, event, func, insert, literal, or_, select, type_coerce, union_all, update
+from sqlalchemy.exc import IntegrityError
+
+from cache_pedidos import cache_pedidos
+from catalogo import normalizar
+from config import RECONCILIACAO_LOTE
+from database import SessionLocal
+from models import (
+    STATUS_FINAIS,
+    ItemPedido,
+    ItemPedidoArquivado,
+    Pedido,
+    PedidoArquivado,
+    ResumoVendas,
+    ResumoVendasItens,
+)
+
+# pedidos anteriores à coluna criado_em entram no resumo com este dia
+DIA_DESCONHECIDO = date(1970, 1, 1)
+SITUACAO_ABERTO = "aberto"
+SITUACOES = (SITUACAO_ABERTO, *STATUS_FINAIS)
+
+
+def _campo(objeto, nome: str):
+    # as rotas passam objetos ORM; o group commit e o lote passam dicts
+    return objeto[nome] if isinstance(objeto, dict) else getattr(objeto, nome)
+
+
+def situacao_do_status(status) -> str:
+    codigo = getattr(status, "code", status)
+    return codigo if codigo in STATUS_FINAIS else SITUACAO_ABERTO
+
+
+def _dia(pedido) -> date:
+    criado_em = _campo(pedido, "criado_em")
+    return criado_em.date() if criado_em is not None else DIA_DESCONHECIDO
+
+
+class _DeltasResumo:
+    # acumula as variações da transação; aplicadas no before_commit em dois
+    # upserts executemany, um por tabela de resumo
+    def __init__(self):
+        self.vendas = defaultdict(lambda: [0, 0.0])
+        self.itens = defaultdict(lambda: [0, 0.0])
+
+    def somar_venda(self, dia, situacao, pedidos, receita) -> None:
+        totais = self.vendas[(dia, situacao)]
+        totais[0] += pedidos
+        totais[1] += receita
+
+    def somar_item(self, dia, situacao, sabor, tamanho, quantidade, receita) -> None:
+        totais = self.itens[(dia, situacao, normalizar(sabor), normalizar(tamanho))]
+        totais[0] += quantidade
+        totais[1] += receita
+
+
+def _deltas(db) -> _DeltasResumo:
+    return db.info.setdefault("resumo_pendente", _DeltasResumo())
+
+
+def resumo_pedido_criado(db, pedido, itens) -> None:
+    dia = _dia(pedido)
+    situacao = situacao_do_status(_campo(pedido, "status"))
+    deltas = _deltas(db)
+    receita_total = 0.0
+    for item in itens:
+        quantidade = _campo(item, "quantidade")
+        receita = quantidade * _campo(item, "preco_unitario")
+        receita_total += receita
+        deltas.somar_item(dia, situacao, _campo(item, "sabor"), _campo(item, "tamanho"), quantidade, receita)
+    deltas.somar_venda(dia, situacao, 1, receita_total)
+
+
+def resumo_item_alterado(db, pedido, sabor: str, tamanho: str, quantidade: int, receita: float) -> None:
+    # só pedidos em aberto recebem ou perdem itens; valores negativos para remoção
+    dia = _dia(pedido)
+    deltas = _deltas(db)
+    deltas.somar_item(dia, SITUACAO_ABERTO, sabor, tamanho, quantidade, receita)
+    deltas.somar_venda(dia, SITUACAO_ABERTO, 0, receita)
+
+
+def resumo_status_alterado(db, pedido) -> None:
+    # cancelar/finalizar: o UPDATE condicional garante que o pedido estava em aberto
+    nova_situacao = situacao_do_status(pedido.status)
+    if nova_situacao == SITUACAO_ABERTO:
+        return
+    dia = _dia(pedido)
+    itens = db.execute(
+        select(
+            ItemPedido.sabor,
+            ItemPedido.tamanho,
+            func.sum(ItemPedido.quantidade),
+            func.sum(ItemPedido.quantidade * ItemPedido.preco_unitario),
+        )
+        .where(ItemPedido.pedido_id == pedido.id)
+        .group_by(ItemPedido.sabor, ItemPedido.tamanho)
+    ).all()
+
+    deltas = _deltas(db)
+    receita_total = 0.0
+    for sabor, tamanho, quantidade, receita in itens:
+        receita_total += receita
+        deltas.somar_item(dia, SITUACAO_ABERTO, sabor, tamanho, -quantidade, -receita)
+        deltas.somar_item(dia, nova_situacao, sabor, tamanho, quantidade, receita)
+    deltas.somar_venda(dia, SITUACAO_ABERTO, -1, -receita_total)
+    deltas.somar_venda(dia, nova_situacao, 1, receita_total)
+
+
+def _insert_dialeto(db):
+    # None para bancos sem INSERT ... ON CONFLICT
+    nome = db.get_bind().dialect.name
+    if nome == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    elif nome == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        return None
+    return insert
+
+
+def _upsert_generico(db, tabela, chaves: tuple, valores: list, linhas: list) -> None:
+    # UPDATE e, se a linha ainda não existe, INSERT num savepoint; se outra
+    # transação inserir a mesma chave no meio, o INSERT falha e o UPDATE é refeito
+    for linha in linhas:
+        condicao = and_(*(tabela.c[chave] == linha[chave] for chave in chaves))
+        incremento = update(tabela).where(condicao).values({coluna: tabela.c[coluna] + linha[coluna] for coluna in valores})
+        if db.execute(incremento).rowcount:
+            continue
+        try:
+            with db.begin_nested():
+                db.execute(insert(tabela).values(linha))
+        except IntegrityError:
+            db.execute(incremento)
+
+
+def _upsert_incremento(db, modelo, chaves: tuple, linhas: list) -> None:
+    tabela = modelo.__table__
+    valores = [coluna for coluna in linhas[0] if coluna not in chaves]
+    insert_dialeto = _insert_dialeto(db)
+    if insert_dialeto is None:
+        _upsert_generico(db, tabela, chaves, valores, linhas)
+        return
+    stmt = insert_dialeto(tabela)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(chaves),
+        set_={coluna: tabela.c[coluna] + stmt.excluded[coluna] for coluna in valores},
+    )
+    db.execute(stmt, linhas)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _aplicar_deltas(session) -> None:
+    deltas = session.info.pop("resumo_pendente", None)
+    if deltas is None:
+        return
+    if deltas.vendas:
+        _upsert_incremento(
+            session,
+            ResumoVendas,
+            ("dia", "situacao"),
+            [
+                {"dia": dia, "situacao": situacao, "pedidos": pedidos, "receita": receita}
+                for (dia, situacao), (pedidos, receita) in deltas.vendas.items()
+            ],
+        )
+    if deltas.itens:
+        _upsert_incremento(
+            session,
+            ResumoVendasItens,
+            ("dia", "situacao", "sabor", "tamanho"),
+            [
+                {
+                    "dia": dia,
+                    "situacao": situacao,
+                    "sabor": sabor,
+                    "tamanho": tamanho,
+                    "quantidade": quantidade,
+                    "receita": receita,
+                }
+                for (dia, situacao, sabor, tamanho), (quantidade, receita) in deltas.itens.items()
+            ],
+        )
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_deltas(session) -> None:
+    session.info.pop("resumo_pendente", None)
+
+
+# --- consultas -------------------------------------------------------------
+
+
+def _expressao_dia(coluna):
+    # date() existe no sqlite e no postgresql; sem criado_em, o dia desconhecido
+    return type_coerce(func.coalesce(func.date(coluna), DIA_DESCONHECIDO.isoformat()), Date)
+
+
+def _expressao_situacao(modelo_pedido):
+    # a coluna status é ChoiceType; no resumo a situação é texto puro
+    status = type_coerce(modelo_pedido.status, String)
+    return case((status.in_(STATUS_FINAIS), status), else_=literal(SITUACAO_ABERTO))
+
+
+def _condicao_dia(coluna, dia: date):
+    # intervalo em criado_em, e não date(criado_em) == dia, para usar o índice
+    inicio = datetime.combine(dia, datetime.min.time())
+    condicao = and_(coluna >= inicio, coluna < inicio + timedelta(days=1))
+    if dia == DIA_DESCONHECIDO:
+        condicao = or_(coluna.is_(None), condicao)
+    return condicao
+
+
+def _pedidos_base(dia: Optional[date] = None):
+    # um registro por pedido, atual ou arquivado; pedidos sem itens também contam
+    consultas = []
+    for modelo_pedido, modelo_item in ((Pedido, ItemPedido), (PedidoArquivado, ItemPedidoArquivado)):
+        receita = (
+            select(func.coalesce(func.sum(modelo_item.quantidade * modelo_item.preco_unitario), 0.0))
+            .where(modelo_item.pedido_id == modelo_pedido.id)
+            .scalar_subquery()
+        )
+        consulta = select(
+            _expressao_dia(modelo_pedido.criado_em).label("dia"),
+            _expressao_situacao(modelo_pedido).label("situacao"),
+            receita.label("receita"),
+        )
+        if dia is not None:
+            consulta = consulta.where(_condicao_dia(modelo_pedido.criado_em, dia))
+        consultas.append(consulta)
+    return union_all(*consultas).subquery("pedidos_base")
+
+
+def _itens_base(dia: Optional[date] = None):
+    # itens de pedidos atuais e arquivados, com o dia e a situação do pedido
+    consultas = []
+    for modelo_pedido, modelo_item in ((Pedido, ItemPedido), (PedidoArquivado, ItemPedidoArquivado)):
+        consulta = select(
+            _expressao_dia(modelo_pedido.criado_em).label("dia"),
+            _expressao_situacao(modelo_pedido).label("situacao"),
+            func.lower(func.trim(modelo_item.sabor)).label("sabor"),
+            func.lower(func.trim(modelo_item.tamanho)).label("tamanho"),
+            modelo_item.quantidade.label("quantidade"),
+            (modelo_item.quantidade * modelo_item.preco_unitario).label("receita"),
+        ).join(modelo_pedido, modelo_pedido.id == modelo_item.pedido_id)
+        if dia is not None:
+            consulta = consulta.where(_condicao_dia(modelo_pedido.criado_em, dia))
+        consultas.append(consulta)
+    return union_all(*consultas).subquery("itens_base")
+
+
+def _filtrar(consulta, colunas, inicio: Optional[date], fim: Optional[date], situacao: Optional[str]):
+    if inicio is not None:
+        consulta = consulta.where(colunas.dia >= inicio)
+    if fim is not None:
+        consulta = consulta.where(colunas.dia <= fim)
+    if situacao is not None:
+        consulta = consulta.where(colunas.situacao == situacao)
+    return consulta
+
+
+def relatorio_por_status(db, inicio=None, fim=None, exato: bool = False) -> list:
+    if exato:
+        base = _pedidos_base()
+        consulta = select(base.c.situacao, func.count(), func.sum(base.c.receita))
+        colunas = base.c
+    else:
+        consulta = select(
+            ResumoVendas.situacao, func.sum(ResumoVendas.pedidos), func.sum(ResumoVendas.receita)
+        ).having(func.sum(ResumoVendas.pedidos) != 0)
+        colunas = ResumoVendas
+    consulta = _filtrar(consulta, colunas, inicio, fim, None).group_by(colunas.situacao).order_by(colunas.situacao)
+    return [
+        {"situacao": situacao, "pedidos": pedidos, "receita": receita or 0.0}
+        for situacao, pedidos, receita in db.execute(consulta)
+    ]
+
+
+def relatorio_por_sabor(db, inicio=None, fim=None, situacao=None, exato: bool = False) -> list:
+    colunas = _itens_base().c if exato else ResumoVendasItens
+    consulta = select(colunas.sabor, colunas.tamanho, func.sum(colunas.quantidade), func.sum(colunas.receita))
+    consulta = (
+        _filtrar(consulta, colunas, inicio, fim, situacao)
+        .group_by(colunas.sabor, colunas.tamanho)
+        .having(func.sum(colunas.quantidade) != 0)
+        .order_by(func.sum(colunas.receita).desc())
+    )
+    return [
+        {"sabor": sabor, "tamanho": tamanho, "quantidade": quantidade, "receita": receita}
+        for sabor, tamanho, quantidade, receita in db.execute(consulta)
+    ]
+
+
+def relatorio_por_dia(db, inicio=None, fim=None, situacao=None, exato: bool = False) -> list:
+    if exato:
+        base = _pedidos_base()
+        consulta = select(base.c.dia, func.count(), func.sum(base.c.receita))
+        colunas = base.c
+    else:
+        consulta = select(
+            ResumoVendas.dia, func.sum(ResumoVendas.pedidos), func.sum(ResumoVendas.receita)
+        ).having(func.sum(ResumoVendas.pedidos) != 0)
+        colunas = ResumoVendas
+    consulta = _filtrar(consulta, colunas, inicio, fim, situacao).group_by(colunas.dia).order_by(colunas.dia)
+    return [
+        {"dia": str(dia), "pedidos": pedidos, "receita": receita or 0.0}
+        for dia, pedidos, receita in db.execute(consulta)
+    ]
+
+
+# --- reconciliação ---------------------------------------------------------
+
+
+def reconciliar_precos(db, lote: int = RECONCILIACAO_LOTE) -> int:
+    """Recalcula preco a partir dos itens, em faixas de `lote` ids, um commit por faixa.
+
+    Só altera (e incrementa versao de) pedidos cujo preço diverge da soma.
+    """
+    corrigidos = 0
+    for modelo_pedido, modelo_item in ((Pedido, ItemPedido), (PedidoArquivado, ItemPedidoArquivado)):
+        soma_itens = (
+            select(func.coalesce(func.sum(modelo_item.quantidade * modelo_item.preco_unitario), 0.0))
+            .where(modelo_item.pedido_id == modelo_pedido.id)
+            .scalar_subquery()
+        )
+        maior_id = db.scalar(select(func.max(modelo_pedido.id))) or 0
+        for inicio in range(0, maior_id, lote):
+            resultado = db.execute(
+                update(modelo_pedido)
+                .where(
+                    modelo_pedido.id > inicio,
+                    modelo_pedido.id <= inicio + lote,
+                    func.abs(modelo_pedido.preco - soma_itens) > 0.005,
+                )
+                .values(preco=soma_itens, versao=modelo_pedido.versao + 1)
+                .execution_options(synchronize_session=False)
+            )
+            corrigidos += resultado.rowcount
+            db.commit()
+    return corrigidos
+
+
+def _dias_do_resumo(db) -> list:
+    # dias com pedidos e dias que só existem no resumo (a linha precisa sumir);
+    # só leituras, sem segurar o lock de escrita
+    dias = set(db.scalars(select(ResumoVendas.dia).distinct()))
+    dias.update(db.scalars(select(ResumoVendasItens.dia).distinct()))
+    for modelo_pedido in (Pedido, PedidoArquivado):
+        dias.update(
+            date.fromisoformat(str(dia))
+            for dia in db.scalars(select(func.date(modelo_pedido.criado_em)).distinct())
+            if dia is not None
+        )
+        if db.scalar(select(modelo_pedido.id).where(modelo_pedido.criado_em.is_(None)).limit(1)) is not None:
+            dias.add(DIA_DESCONHECIDO)
+    db.commit()
+    return sorted(dias)
+
+
+def _reconstruir_dia(db, dia: date) -> int:
+    db.execute(delete(ResumoVendas).where(ResumoVendas.dia == dia))
+    db.execute(delete(ResumoVendasItens).where(ResumoVendasItens.dia == dia))
+
+    base = _itens_base(dia)
+    itens = db.execute(
+        ResumoVendasItens.__table__.insert().from_select(
+            ["dia", "situacao", "sabor", "tamanho", "quantidade", "receita"],
+            select(
+                base.c.dia, base.c.situacao, base.c.sabor, base.c.tamanho,
+                func.sum(base.c.quantidade), func.sum(base.c.receita),
+            ).group_by(base.c.dia, base.c.situacao, base.c.sabor, base.c.tamanho),
+        )
+    ).rowcount
+
+    pedidos = _pedidos_base(dia)
+    vendas = db.execute(
+        ResumoVendas.__table__.insert().from_select(
+            ["dia", "situacao", "pedidos", "receita"],
+            select(pedidos.c.dia, pedidos.c.situacao, func.count(), func.sum(pedidos.c.receita))
+            .group_by(pedidos.c.dia, pedidos.c.situacao),
+        )
+    ).rowcount
+    return vendas + itens
+
+
+def reconstruir_resumo(db) -> int:
+    """Refaz as duas tabelas de resumo a partir dos pedidos (atuais e arquivados).
+
+    Um dia por transação, como reconciliar_precos faz por faixa de ids: o lock
+    de escrita fica preso só pelo tempo de um dia, e cada dia é apagado e
+    recalculado na mesma transação. Um pedido confirmado antes dela entra na
+    contagem; um confirmado depois soma o seu delta por cima, sem contar duas vezes.
+    """
+    linhas = 0
+    for dia in _dias_do_resumo(db):
+        linhas += _reconstruir_dia(db, dia)
+        db.commit()
+    return linhas
+
+
+def reconciliar() -> dict:
+    with SessionLocal() as db:
+        corrigidos = reconciliar_precos(db)
+        if corrigidos:
+            cache_pedidos.limpar()
+        linhas = reconstruir_resumo(db)
+    return {"precos_corrigidos": corrigidos, "linhas_resumo": linhas}
+
+
+if __name__ == "__main__":
+    resultado = reconciliar()
+    print(f"{resultado['precos_corrigidos']} preços corrigidos, {resultado['linhas_resumo']} linhas de resumo")
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+from anyio import to_thread
+from sqlalchemy import delete, event, select
+
+from config import REVOGACAO_INTERVALO_SEGUNDOS, REVOGACAO_JANELA_IDS, REVOGACAO_LIMPEZA_SEGUNDOS
+from database import SessionLocal, engine
+from metricas import Medidor
+from models import TokenRevogado, agora_utc
+
+logger = logging.getLogger(__name__)
+
+
+def _para_datetime(expira_em: float) -> datetime:
+    return datetime.fromtimestamp(expira_em, timezone.utc).replace(tzinfo=None)
+
+
+def _para_timestamp(expira_em: datetime) -> float:
+    return expira_em.replace(tzinfo=timezone.utc).timestamp()
+
+
+class ListaRevogacao:
+    """jti revogados e ainda não expirados, espelho em memória de tokens_revogados.
+
+    A consulta em verificar_token é um `in` num dict, sem lock nem banco. Só
+    quem escreve pega o lock; tokens expirados saem da lista, porque o JWT
+    deles já é recusado pela validação do exp.
+    """
+
+    def __init__(self):
+        # jti -> exp do token (timestamp)
+        self._expiracoes: dict = {}
+        # maior id de tokens_revogados já lido
+        self.ultimo_id = 0
+        self._lock = threading.Lock()
+
+    def revogado(self, jti: str) -> bool:
+        return jti in self._expiracoes
+
+    def adicionar(self, revogados, ultimo_id: int = 0) -> None:
+        with self._lock:
+            for jti, expira_em in revogados:
+                self._expiracoes[jti] = expira_em
+            self.ultimo_id = max(self.ultimo_id, ultimo_id)
+
+    def podar(self, agora: float) -> int:
+        with self._lock:
+            expirados = [jti for jti, expira_em in self._expiracoes.items() if expira_em <= agora]
+            for jti in expirados:
+                del self._expiracoes[jti]
+        return len(expirados)
+
+    def __len__(self) -> int:
+        return len(self._expiracoes)
+
+
+lista_revogacao = ListaRevogacao()
+
+Medidor("auth_revoked_tokens", "Tokens revogados e não expirados na memória deste worker", lambda: len(lista_revogacao))
+
+
+def revogar_token(db, jti: str, expira_em: float) -> None:
+    # entra na transação de quem chama; o jti é único, então revogar o mesmo
+    # token duas vezes (ex.: dois usos simultâneos de um refresh token) falha
+    # no commit com IntegrityError
+    db.add(TokenRevogado(jti=jti, expira_em=_para_datetime(expira_em)))
+    db.info.setdefault("tokens_revogados", []).append((jti, expira_em))
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _aplicar_revogados(session) -> None:
+    # neste worker a revogação vale já; os outros a leem da tabela
+    revogados = session.info.pop("tokens_revogados", None)
+    if revogados:
+        lista_revogacao.adicionar(revogados)
+
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _descartar_revogados(session) -> None:
+    session.info.pop("tokens_revogados", None)
+
+
+def ler_revogados(janela: int = REVOGACAO_JANELA_IDS) -> None:
+    # relê os últimos `janela` ids já vistos: um id menor confirmado depois de
+    # um maior não fica de fora. Os repetidos caem no mesmo jti do dict
+    with engine.connect() as conn:
+        linhas = conn.execute(
+            select(TokenRevogado.id, TokenRevogado.jti, TokenRevogado.expira_em)
+            .where(TokenRevogado.id > lista_revogacao.ultimo_id - janela)
+            .order_by(TokenRevogado.id)
+        ).all()
+    if not linhas:
+        return
+    # as já expiradas só avançam o cursor
+    agora = time.time()
+    revogados = ((linha.jti, _para_timestamp(linha.expira_em)) for linha in linhas)
+    lista_revogacao.adicionar(
+        [(jti, expira_em) for jti, expira_em in revogados if expira_em > agora], linhas[-1].id
+    )
+
+
+def limpar_expirados() -> int:
+    lista_revogacao.podar(time.time())
+    with engine.begin() as conn:
+        return conn.execute(delete(TokenRevogado).where(TokenRevogado.expira_em <= agora_utc())).rowcount
+
+
+async def monitorar_revogacao(
+    intervalo: float = REVOGACAO_INTERVALO_SEGUNDOS, intervalo_limpeza: float = REVOGACAO_LIMPEZA_SEGUNDOS
+) -> None:
+    proxima_limpeza = time.monotonic() + intervalo_limpeza
+    while True:
+        await asyncio.sleep(intervalo)
+        try:
+            await to_thread.run_sync(ler_revogados)
+            if time.monotonic() >= proxima_limpeza:
+                proxima_limpeza = time.monotonic() + intervalo_limpeza
+                apagados = await to_thread.run_sync(limpar_expirados)
+                if apagados:
+                    logger.info("%d tokens revogados expirados apagados", apagados)
+        except Exception:
+            logger.exception("Falha ao ler tokens revogados do banco")
+
+
+async def iniciar_revogacao() -> asyncio.Task:
+    # carrega os revogados ainda válidos antes de atender requisições
+    await to_thread.run_sync(ler_revogados)
+    return asyncio.create_task(monitorar_revogacao())
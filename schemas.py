@@ -1,17 +1,36 @@
-from typing import Literal, Optional, List
-from pydantic import BaseModel, EmailStr
+from typing import Annotated, Literal, Optional, List
+from pydantic import AliasChoices, BaseModel, BeforeValidator, EmailStr, Field
+
+from models import rotulo_status
 
 __all__ = (
     "UsuarioSchema",
     "LoginSchema",
+    "LogoutSchema",
     "PedidoSchema",
     "PedidoCreateSchema",
     "ItemPedidoSchema",
     "ItemPedidoCreateSchema",
     "RemoverItemSchema",
+    "PedidoLoteSchema",
+    "LotePedidosSchema",
+    "ProdutoSchema",
+    "PedidoResumoSchema",
+    "PaginaPedidosSchema",
+    "PaginaPedidosResumoSchema",
+    "PedidoCanceladoSchema",
+    "PedidoFinalizadoSchema",
+    "ItemAdicionadoSchema",
+    "ItemRemovidoSchema",
+    "PedidoCriadoLoteSchema",
+    "ErroLoteSchema",
+    "ResultadoLoteSchema",
 )
 
 
+StatusPedido = Annotated[Optional[str], BeforeValidator(rotulo_status)]
+
+
 class UsuarioSchema(BaseModel):
     nome: str
     email: EmailStr
@@ -46,6 +65,11 @@ class LoginSchema(BaseModel):
         }
 
 
+class LogoutSchema(BaseModel):
+    # o access token vem no header; o refresh token, se enviado, é revogado junto
+    refresh_token: Optional[str] = None
+
+
 class ItemPedidoCreateSchema(BaseModel):
     sabor: str
     tamanho: str
@@ -98,8 +122,9 @@ class PedidoCreateSchema(BaseModel):
 class PedidoSchema(BaseModel):
     id: int
     usuario_id: int
-    preco_total: float
-    status: str
+    # no modelo a coluna se chama "preco"
+    preco_total: float = Field(validation_alias=AliasChoices("preco_total", "preco"))
+    status: StatusPedido
     itens: List[ItemPedidoSchema]
 
     class Config:
@@ -120,3 +145,122 @@ class RemoverItemSchema(BaseModel):
                 "quantidade": 1,
             }
         }
+
+
+class PedidoLoteSchema(BaseModel):
+    usuario_id: int
+    # status validado por pedido na rota, para que um valor inválido não
+    # derrube o lote inteiro com 422
+    status: Optional[str] = "aberto"
+    itens: List[ItemPedidoCreateSchema]
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "usuario_id": 1,
+                "status": "aberto",
+                "itens": [
+                    {"sabor": "calabresa", "tamanho": "grande", "quantidade": 2},
+                    {"sabor": "marguerita", "tamanho": "medio", "quantidade": 1},
+                ],
+            }
+        }
+
+
+class LotePedidosSchema(BaseModel):
+    pedidos: List[PedidoLoteSchema]
+
+
+class ProdutoSchema(BaseModel):
+    sabor: str
+    tamanho: str
+    preco: float
+    ativo: bool = True
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "sabor": "calabresa",
+                "tamanho": "grande",
+                "preco": 50.0,
+                "ativo": True,
+            }
+        }
+
+
+class PedidoResumoSchema(BaseModel):
+    id: int
+    usuario_id: int
+    preco: float
+    status: StatusPedido
+
+    class Config:
+        from_attributes = True
+
+
+class PaginaPedidosResumoSchema(BaseModel):
+    pedidos: List[PedidoResumoSchema]
+    proximo_cursor: Optional[int]
+
+
+class PaginaPedidosSchema(BaseModel):
+    pedidos: List[PedidoSchema]
+    proximo_cursor: Optional[int]
+
+
+class PedidoCanceladoSchema(BaseModel):
+    mensagem: str
+    pedido: PedidoResumoSchema
+
+
+class PedidoFinalizadoSchema(BaseModel):
+    mensagem: str
+    pedido: PedidoSchema
+
+
+class ItemAdicionadoSchema(BaseModel):
+    mensagem: str
+    item: ItemPedidoSchema
+    preco_pedido: float
+
+
+class _ItemRemovidoDetalheSchema(BaseModel):
+    sabor: str
+    tamanho: str
+    quantidade_removida: int
+    valor_removido: float
+
+
+class _ItemRestanteSchema(BaseModel):
+    sabor: str
+    tamanho: str
+    quantidade_restante: int
+
+
+class _PedidoAtualizadoSchema(PedidoResumoSchema):
+    item_restante: _ItemRestanteSchema
+
+
+class ItemRemovidoSchema(BaseModel):
+    mensagem: str
+    item_removido: _ItemRemovidoDetalheSchema
+    pedido_atualizado: _PedidoAtualizadoSchema
+
+
+class PedidoCriadoLoteSchema(BaseModel):
+    indice: int
+    id: int
+    preco_total: float
+    quantidade_itens: int
+
+
+class ErroLoteSchema(BaseModel):
+    indice: int
+    detail: str
+
+
+class ResultadoLoteSchema(BaseModel):
+    criados: List[PedidoCriadoLoteSchema]
+    erros: List[ErroLoteSchema]
@@ -0,0 +1,115 @@
+import asyncio
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+from metricas import BUCKETS_LATENCIA, Histograma, Medidor
+from config import (
+    ARGON2_MEMORY_COST,
+    ARGON2_PARALLELISM,
+    ARGON2_TIME_COST,
+    HASH_FILA_MAXIMA,
+    HASH_WORKERS,
+)
+
+bcrypt_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__memory_cost=ARGON2_MEMORY_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
+
+
+class PoolSenhas:
+    """Executa o argon2 fora do event loop, em um pool de threads de tamanho fixo.
+
+    O argon2-cffi libera o GIL durante o cálculo, então threads bastam. Quando
+    workers + fila estão ocupados, novas chamadas falham na hora com 503 em vez
+    de se acumularem e atrasarem as outras rotas.
+    """
+
+    def __init__(self, workers: int, fila_maxima: int):
+        self.workers = workers
+        self.capacidade = workers + fila_maxima
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="argon2")
+
+        # contadores alterados apenas no event loop, não precisam de lock
+        self.pendentes = 0
+        self.pico_pendentes = 0
+        self.concluidas = 0
+        self.rejeitadas = 0
+        self.segundos_totais = 0.0
+
+    async def executar(self, funcao, *args):
+        if self.pendentes >= self.capacidade:
+            self.rejeitadas += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servidor ocupado, tente novamente em instantes",
+                headers={"Retry-After": "1"},
+            )
+
+        self.pendentes += 1
+        self.pico_pendentes = max(self.pico_pendentes, self.pendentes)
+        inicio = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, funcao, *args)
+        finally:
+            duracao = time.perf_counter() - inicio
+            self.pendentes -= 1
+            self.concluidas += 1
+            self.segundos_totais += duracao
+            latencia_argon2.observar(duracao, funcao.__name__)
+
+    def estatisticas(self) -> dict:
+        return {
+            "workers": self.workers,
+            "capacidade": self.capacidade,
+            "pendentes": self.pendentes,
+            "pico_pendentes": self.pico_pendentes,
+            "saturacao": self.pendentes / self.capacidade,
+            "concluidas": self.concluidas,
+            "rejeitadas": self.rejeitadas,
+            "segundos_totais": self.segundos_totais,
+        }
+
+
+latencia_argon2 = Histograma(
+    "argon2_duration_seconds",
+    "Tempo de hash/verificação argon2, incluindo a espera na fila do pool",
+    BUCKETS_LATENCIA,
+    ("operacao",),
+)
+
+pool_senhas = PoolSenhas(HASH_WORKERS, HASH_FILA_MAXIMA)
+
+Medidor("argon2_pool_pending", "Operações argon2 executando ou na fila", lambda: pool_senhas.pendentes)
+Medidor("argon2_pool_saturation", "Fração da capacidade do pool argon2 em uso", lambda: pool_senhas.estatisticas()["saturacao"])
+Medidor("argon2_pool_rejected", "Operações argon2 recusadas com 503 por falta de capacidade", lambda: pool_senhas.rejeitadas)
+
+
+async def gerar_hash_senha(senha: str) -> str:
+    return await pool_senhas.executar(bcrypt_context.hash, senha)
+
+
+async def verificar_senha(senha: str, senha_hash: str) -> bool:
+    return await pool_senhas.executar(bcrypt_context.verify, senha, senha_hash)
+
+
+_hash_ficticio = None
+
+
+async def verificar_senha_ficticia(senha: str) -> bool:
+    # email desconhecido: faz o mesmo trabalho de um login real, para o tempo
+    # de resposta não revelar quais emails têm conta. O hash é gerado uma vez,
+    # com os parâmetros atuais do argon2, e reaproveitado
+    global _hash_ficticio
+    if _hash_ficticio is None:
+        _hash_ficticio = await gerar_hash_senha(secrets.token_urlsafe(16))
+    await verificar_senha(senha, _hash_ficticio)
+    return False
@@ -0,0 +1,239 @@
+import asyncio
+import json
+import math
+import re
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Optional
+
+from config import (
+    LIMITE_CONCORRENCIA_ADAPTATIVO,
+    LIMITE_CONCORRENCIA_INICIAL,
+    LIMITE_CONCORRENCIA_MAXIMO,
+    LIMITE_CONCORRENCIA_MINIMO,
+    SOBRECARGA_FILA_MAXIMA,
+    SOBRECARGA_PRAZO_BAIXA_MS,
+    SOBRECARGA_PRAZO_CRITICA_MS,
+    SOBRECARGA_PRAZO_NORMAL_MS,
+    SOBRECARGA_RETRY_AFTER_SEGUNDOS,
+)
+from metricas import Contador, Medidor
+
+
+# o limite é recalculado no máximo uma vez por janela, com um mínimo de amostras
+JANELA_SEGUNDOS = 0.5
+JANELA_MINIMO_AMOSTRAS = 10
+
+
+class ClasseRota:
+    def __init__(self, nome: str, prioridade: int, fracao_limite: float, prazo_fila_ms: float):
+        self.nome = nome
+        # menor número = atendida primeiro quando uma vaga abre
+        self.prioridade = prioridade
+        # parte do limite que a classe pode ocupar; o resto fica reservado às
+        # classes mais prioritárias
+        self.fracao_limite = fracao_limite
+        self.prazo_fila = prazo_fila_ms / 1000
+
+
+CLASSES = {
+    classe.nome: classe
+    for classe in (
+        ClasseRota("critica", 0, 1.0, SOBRECARGA_PRAZO_CRITICA_MS),
+        ClasseRota("normal", 1, 0.8, SOBRECARGA_PRAZO_NORMAL_MS),
+        ClasseRota("baixa", 2, 0.5, SOBRECARGA_PRAZO_BAIXA_MS),
+    )
+}
+
+# (método ou None para qualquer um, caminho, classe); vale a primeira regra que
+# casar, e o que não casar com nenhuma é "normal". Classe None não passa pelo
+# limitador: conexões longas (SSE) ocupariam uma vaga pelo tempo todo.
+REGRAS_ROTAS = (
+    ("GET", r"/orders/stream", None),
+    ("GET", r"/metrics", None),
+    ("POST", r"/orders/pedido", "critica"),
+    ("POST", r"/orders/pedido/(cancelar|adicionar-item|remover-item|finalizar)/\d+", "critica"),
+    ("GET", r"/orders/(lista|listar)", "baixa"),
+    ("POST", r"/orders/pedidos/bulk", "baixa"),
+    ("POST", r"/auth/criar_conta", "baixa"),
+    (None, r"/admin/relatorios/.*", "baixa"),
+)
+
+_REGRAS_COMPILADAS = tuple((metodo, re.compile(caminho), classe) for metodo, caminho, classe in REGRAS_ROTAS)
+
+
+@lru_cache(maxsize=4096)
+def classificar(metodo: str, caminho: str) -> Optional[ClasseRota]:
+    for metodo_regra, padrao, classe in _REGRAS_COMPILADAS:
+        if (metodo_regra is None or metodo_regra == metodo) and padrao.fullmatch(caminho):
+            return CLASSES[classe] if classe is not None else None
+    return CLASSES["normal"]
+
+
+class LimitadorAdaptativo:
+    """Limite de requisições simultâneas com fila por prioridade.
+
+    Com `adaptativo`, o limite segue a latência (no estilo do Gradient2 do
+    concurrency-limits da Netflix): a cada janela de amostras compara a
+    latência média da janela com uma média longa, reduz o limite quando a da
+    janela sobe e cresce aos poucos enquanto ela se mantém. Só roda no event
+    loop, então não precisa de lock.
+    """
+
+    def __init__(self, inicial: int, minimo: int, maximo: int, adaptativo: bool, fila_maxima: int):
+        self.limite = float(inicial)
+        self.minimo = minimo
+        self.maximo = maximo
+        self.adaptativo = adaptativo
+        self.fila_maxima = fila_maxima
+        self.em_uso = 0
+        self._filas = {nome: deque() for nome in sorted(CLASSES, key=lambda nome: CLASSES[nome].prioridade)}
+        self._latencia_longa = None
+        self._janela_inicio = time.monotonic()
+        self._janela_soma = 0.0
+        self._janela_amostras = 0
+
+    @property
+    def na_fila(self) -> int:
+        return sum(len(fila) for fila in self._filas.values())
+
+    def _cabe(self, classe: ClasseRota) -> bool:
+        return self.em_uso < max(1, int(self.limite * classe.fracao_limite))
+
+    def _fila_na_frente(self, classe: ClasseRota) -> bool:
+        return any(
+            fila for nome, fila in self._filas.items() if CLASSES[nome].prioridade <= classe.prioridade
+        )
+
+    async def adquirir(self, classe: ClasseRota) -> Optional[str]:
+        """Ocupa uma vaga; devolve o motivo da rejeição ou None se foi admitida."""
+        if self._cabe(classe) and not self._fila_na_frente(classe):
+            self.em_uso += 1
+            return None
+        if self.na_fila >= self.fila_maxima:
+            return "fila_cheia"
+
+        futuro = asyncio.get_running_loop().create_future()
+        fila = self._filas[classe.nome]
+        fila.append(futuro)
+        try:
+            await asyncio.wait_for(asyncio.shield(futuro), classe.prazo_fila)
+            return None
+        except (asyncio.TimeoutError, asyncio.CancelledError) as erro:
+            if futuro.done():
+                # a vaga foi entregue junto com o prazo/cancelamento
+                if isinstance(erro, asyncio.CancelledError):
+                    self.liberar()
+                    raise
+                return None
+            futuro.cancel()
+            fila.remove(futuro)
+            if isinstance(erro, asyncio.CancelledError):
+                raise
+            return "prazo"
+
+    def liberar(self, latencia: Optional[float] = None) -> None:
+        self.em_uso -= 1
+        if latencia is not None and self.adaptativo:
+            self._ajustar(latencia)
+        self._acordar()
+
+    def _acordar(self) -> None:
+        for nome, fila in self._filas.items():
+            classe = CLASSES[nome]
+            while fila and self._cabe(classe):
+                self.em_uso += 1
+                fila.popleft().set_result(True)
+            if fila:
+                # prioridade estrita: classes abaixo esperam enquanto esta tiver fila
+                return
+
+    def _ajustar(self, latencia: float) -> None:
+        self._janela_soma += latencia
+        self._janela_amostras += 1
+        agora = time.monotonic()
+        if self._janela_amostras < JANELA_MINIMO_AMOSTRAS or agora - self._janela_inicio < JANELA_SEGUNDOS:
+            return
+        media = self._janela_soma / self._janela_amostras
+        self._janela_inicio = agora
+        self._janela_soma = 0.0
+        self._janela_amostras = 0
+
+        if self._latencia_longa is None:
+            self._latencia_longa = media
+        self._latencia_longa += (media - self._latencia_longa) * 0.01
+        # depois de um pico a média longa fica alta; ela é puxada de volta
+        if self._latencia_longa > 2 * media:
+            self._latencia_longa *= 0.9
+
+        # com pouca ocupação a latência não diz nada sobre o limite
+        if self.em_uso < self.limite / 2:
+            return
+
+        gradiente = max(0.5, min(1.0, 1.5 * self._latencia_longa / media))
+        novo_limite = self.limite * gradiente + math.sqrt(self.limite)
+        self.limite = min(self.maximo, max(self.minimo, self.limite * 0.8 + novo_limite * 0.2))
+
+
+limitador_concorrencia = LimitadorAdaptativo(
+    LIMITE_CONCORRENCIA_INICIAL,
+    LIMITE_CONCORRENCIA_MINIMO,
+    LIMITE_CONCORRENCIA_MAXIMO,
+    LIMITE_CONCORRENCIA_ADAPTATIVO,
+    SOBRECARGA_FILA_MAXIMA,
+)
+
+requisicoes_rejeitadas = Contador(
+    "http_requests_shed_total",
+    "Requisições recusadas com 503 pelo limitador de concorrência",
+    ("classe", "motivo"),
+)
+Medidor("http_concurrency_limit", "Limite atual de requisições simultâneas", lambda: limitador_concorrencia.limite)
+Medidor("http_concurrency_queued", "Requisições esperando vaga no limitador", lambda: limitador_concorrencia.na_fila)
+
+_CORPO_503 = json.dumps({"detail": "Servidor sobrecarregado, tente novamente em instantes"}).encode()
+
+
+async def _responder_sobrecarga(send) -> None:
+    await send(
+        {
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_CORPO_503)).encode()),
+                (b"retry-after", str(SOBRECARGA_RETRY_AFTER_SEGUNDOS).encode()),
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": _CORPO_503})
+
+
+class LimiteConcorrenciaMiddleware:
+    # a requisição espera uma vaga antes de chegar à rota; passado o prazo da
+    # sua classe, recebe 503 na hora em vez de enfileirar no threadpool
+    def __init__(self, app, limitador: LimitadorAdaptativo = limitador_concorrencia):
+        self.app = app
+        self.limitador = limitador
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        classe = classificar(scope["method"], scope["path"])
+        if classe is None:
+            await self.app(scope, receive, send)
+            return
+
+        motivo = await self.limitador.adquirir(classe)
+        if motivo is not None:
+            requisicoes_rejeitadas.inc(classe.nome, motivo)
+            await _responder_sobrecarga(send)
+            return
+
+        inicio = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limitador.liberar(time.perf_counter() - inicio)
@@ -0,0 +1,64 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# a configuração é lida no import dos módulos da API: o banco de testes precisa
+# estar no ambiente antes deles
+_DIRETORIO_BANCO = tempfile.mkdtemp(prefix="testes-api-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_DIRETORIO_BANCO}/testes.db"
+os.environ.setdefault("LIMIAR_CONSULTA_LENTA_MS", "0")
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def engine():
+    from database import engine
+    from migracoes import aplicar_migracoes
+
+    aplicar_migracoes(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    from database import SessionLocal
+
+    with SessionLocal() as sessao:
+        yield sessao
+
+
+@pytest.fixture
+def cliente(engine):
+    # sem o lifespan: as tarefas de fundo (eventos, revogação) fariam queries
+    # no meio das medições
+    from fastapi.testclient import TestClient
+
+    import main
+
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def criar_usuario(db):
+    from auth_routes import criar_token
+    from models import Usuario
+
+    criados = []
+
+    def criar(admin: bool = False):
+        usuario = Usuario(
+            nome="Teste",
+            email=f"teste{len(criados)}-{os.urandom(4).hex()}@teste.example.com",
+            senha="sem-login",
+            admin=admin,
+        )
+        db.add(usuario)
+        db.commit()
+        criados.append(usuario.id)
+        return usuario.id, {"Authorization": f"Bearer {criar_token(usuario.id)}"}
+
+    return criar
@@ -0,0 +1,27 @@
+"""Invalidação do cache de usuários autenticados."""
+from dependencies import UsuarioAutenticado, cache_usuarios
+from models import Usuario
+
+
+def test_alteracao_invalida_o_cache_so_no_commit(cliente, db, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+    assert cliente.get("/orders/lista", headers=cabecalhos).status_code == 200
+    assert cache_usuarios.get(usuario_id) is not None
+
+    usuario = db.get(Usuario, usuario_id)
+    usuario.ativo = False
+    db.flush()
+    # antes do commit outra requisição releria a linha antiga e a devolveria ao cache
+    assert cache_usuarios.get(usuario_id) is not None
+
+    db.commit()
+    assert cache_usuarios.get(usuario_id) is None
+
+
+def test_snapshot_lido_antes_da_invalidacao_nao_e_gravado():
+    geracao = cache_usuarios.geracao
+    cache_usuarios.invalidar(-1)
+
+    cache_usuarios.set(-1, UsuarioAutenticado(id=-1, admin=True, ativo=True), geracao)
+
+    assert cache_usuarios.get(-1) is None
@@ -0,0 +1,56 @@
+"""Adições e remoções simultâneas no mesmo pedido não perdem atualizações de
+preço: no fim, Pedido.preco é a soma dos itens."""
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+import main
+from catalogo import catalogo
+from models import ItemPedido, Pedido
+
+THREADS = 8
+OPERACOES_POR_THREAD = 20
+
+
+def _operar(cabecalhos, id_pedido, produtos, indice_thread) -> list:
+    cliente = TestClient(main.app)
+    status = []
+    for indice in range(OPERACOES_POR_THREAD):
+        produto = produtos[(indice_thread + indice // 2) % len(produtos)]
+        corpo = {"sabor": produto["sabor"], "tamanho": produto["tamanho"], "quantidade": 1 + indice % 2}
+        rota = "adicionar-item" if (indice_thread + indice) % 2 else "remover-item"
+        resposta = cliente.post(f"/orders/pedido/{rota}/{id_pedido}", json=corpo, headers=cabecalhos)
+        status.append((rota, resposta.status_code))
+    return status
+
+
+def test_adicionar_e_remover_em_paralelo_mantem_preco(cliente, db, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+    produtos = catalogo.produtos()[:2]
+
+    # estoque inicial grande o bastante para nenhuma remoção esgotar o item
+    resposta = cliente.post(
+        "/orders/pedido",
+        json={"usuario_id": usuario_id, "quantidade": 100, "sabor": produtos[0]["sabor"], "tamanho": produtos[0]["tamanho"]},
+        headers=cabecalhos,
+    )
+    assert resposta.status_code == 201
+    id_pedido = resposta.json()["id"]
+    corpo = {"sabor": produtos[1]["sabor"], "tamanho": produtos[1]["tamanho"], "quantidade": 100}
+    assert cliente.post(f"/orders/pedido/adicionar-item/{id_pedido}", json=corpo, headers=cabecalhos).status_code == 200
+
+    with ThreadPoolExecutor(THREADS) as executor:
+        resultados = list(
+            executor.map(lambda indice: _operar(cabecalhos, id_pedido, produtos, indice), range(THREADS))
+        )
+
+    falhas = [resultado for status in resultados for resultado in status if resultado[1] != 200]
+    assert falhas == []
+
+    db.expire_all()
+    preco = db.scalar(select(Pedido.preco).where(Pedido.id == id_pedido))
+    soma_itens = db.scalar(
+        select(func.sum(ItemPedido.quantidade * ItemPedido.preco_unitario)).where(ItemPedido.pedido_id == id_pedido)
+    )
+    assert preco == soma_itens
@@ -0,0 +1,37 @@
+"""Captura do plano das consultas lentas."""
+import pytest
+
+from consultas_lentas import _capturar_plano, _explicar_em_savepoint
+
+
+class _CursorFalso:
+    def __init__(self):
+        self.comandos = []
+
+    def execute(self, statement, parameters=None):
+        self.comandos.append(statement)
+        if statement.startswith("EXPLAIN"):
+            raise RuntimeError("could not determine data type of parameter $1")
+
+    def fetchall(self):
+        return []
+
+
+def test_explain_que_falha_nao_aborta_a_transacao():
+    cursor = _CursorFalso()
+
+    with pytest.raises(RuntimeError):
+        _explicar_em_savepoint(cursor, "EXPLAIN SELECT %s", ("x",))
+
+    assert cursor.comandos == [
+        "SAVEPOINT plano_consulta_lenta",
+        "EXPLAIN SELECT %s",
+        "ROLLBACK TO SAVEPOINT plano_consulta_lenta",
+        "RELEASE SAVEPOINT plano_consulta_lenta",
+    ]
+
+
+def test_plano_so_para_select(engine):
+    with engine.connect() as conn:
+        assert _capturar_plano(conn, "UPDATE pedidos SET preco = ? WHERE id = ?", (1.0, 1), False) == []
+        assert _capturar_plano(conn, "SELECT id FROM pedidos WHERE id = ?", (1,), False) != []
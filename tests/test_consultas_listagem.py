@@ -0,0 +1,64 @@
+"""A listagem de pedidos com itens roda o mesmo número de comandos SQL
+qualquer que seja a quantidade de pedidos (sem N+1 em Pedido.itens)."""
+from contextlib import contextmanager
+
+from sqlalchemy import event, insert
+
+from models import ItemPedido, Pedido
+
+
+def _criar_pedidos(db, usuario_id: int, quantidade: int) -> None:
+    ids = db.scalars(
+        insert(Pedido).returning(Pedido.id),
+        [{"usuario_id": usuario_id, "status": "aberto", "preco": 50.0} for _ in range(quantidade)],
+    ).all()
+    db.execute(
+        insert(ItemPedido),
+        [
+            {"pedido_id": id_pedido, "sabor": sabor, "tamanho": "grande", "quantidade": 1, "preco_unitario": 25.0}
+            for id_pedido in ids
+            for sabor in ("calabresa", "mussarela")
+        ],
+    )
+    db.commit()
+
+
+@contextmanager
+def _contar_comandos(engine):
+    comandos = []
+
+    def contar(conn, cursor, statement, parameters, context, executemany):
+        comandos.append(statement)
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        yield comandos
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+
+
+def _comandos_da_listagem(cliente, engine, cabecalhos, usuario_id) -> tuple:
+    with _contar_comandos(engine) as comandos:
+        resposta = cliente.get(
+            "/orders/listar", params={"usuario_id": usuario_id, "limite": 1000}, headers=cabecalhos
+        )
+    assert resposta.status_code == 200
+    assert all(len(pedido["itens"]) == 2 for pedido in resposta.json()["pedidos"])
+    return len(comandos), len(resposta.json()["pedidos"])
+
+
+def test_listar_pedidos_com_numero_constante_de_comandos(cliente, engine, db, criar_usuario):
+    _, cabecalhos_admin = criar_usuario(admin=True)
+    usuario_id, _ = criar_usuario()
+    n = 20
+
+    _criar_pedidos(db, usuario_id, n)
+    # a primeira chamada preenche o cache de usuários de verificar_token
+    _comandos_da_listagem(cliente, engine, cabecalhos_admin, usuario_id)
+    comandos_n, pedidos_n = _comandos_da_listagem(cliente, engine, cabecalhos_admin, usuario_id)
+
+    _criar_pedidos(db, usuario_id, 9 * n)
+    comandos_10n, pedidos_10n = _comandos_da_listagem(cliente, engine, cabecalhos_admin, usuario_id)
+
+    assert (pedidos_n, pedidos_10n) == (n, 10 * n)
+    assert comandos_10n == comandos_n
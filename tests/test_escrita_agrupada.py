@@ -0,0 +1,49 @@
+"""Group commit de POST /orders/pedido quando a thread gravadora não responde."""
+import threading
+
+import pytest
+from fastapi import HTTPException
+
+from escrita_agrupada import AgrupadorPedidos
+
+
+def test_gravadora_travada_responde_503_e_descarta_o_pedido():
+    gravando, liberar = threading.Event(), threading.Event()
+    agrupador = AgrupadorPedidos(maximo=10, espera_ms=0, timeout_segundos=0.1)
+    gravados = []
+
+    def gravar_travado(pedidos):
+        gravando.set()
+        liberar.wait()
+        gravados.extend(pedidos)
+        return [{"id": indice} for indice, _ in enumerate(pedidos)]
+
+    agrupador._gravar_transacao = gravar_travado
+    agrupador.iniciar()
+    try:
+        # o primeiro trava a gravadora; o segundo fica na fila até o timeout
+        primeiro = threading.Thread(target=lambda: pytest.raises(HTTPException, agrupador.criar, {"n": 1}, []))
+        primeiro.start()
+        assert gravando.wait(5)
+        with pytest.raises(HTTPException) as erro:
+            agrupador.criar({"n": 2}, [])
+        assert erro.value.status_code == 503
+        primeiro.join()
+    finally:
+        liberar.set()
+        agrupador.parar()
+
+    # o segundo foi cancelado antes de a gravadora pegá-lo
+    assert ({"n": 2}, []) not in gravados
+
+
+def test_gravadora_parada_responde_503():
+    agrupador = AgrupadorPedidos(maximo=10, espera_ms=0, timeout_segundos=0.1)
+    agrupador._thread = threading.Thread(target=lambda: None)
+    agrupador._thread.start()
+    agrupador._thread.join()
+
+    assert not agrupador.ativo
+    with pytest.raises(HTTPException) as erro:
+        agrupador.criar({}, [])
+    assert erro.value.status_code == 503
@@ -0,0 +1,11 @@
+"""Eventos de pedidos publicados no commit."""
+from eventos import registrar_evento
+
+
+def test_registrar_evento_nao_valida_o_pedido(db):
+    # um status fora do schema não pode derrubar a escrita que gerou o evento
+    registrar_evento(db, "pedido_criado", {"id": 1, "usuario_id": 2, "preco": 10.0, "status": "desconhecido"})
+    registrar_evento(db, "pedido_criado", {"id": 2, "usuario_id": 2, "preco": 10.0, "status": "aberto"})
+
+    pendentes = db.info.pop("eventos_pendentes")
+    assert [evento["pedido"]["status"] for evento in pendentes] == ["desconhecido", "Aberto"]
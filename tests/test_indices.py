@@ -0,0 +1,45 @@
+"""As consultas quentes precisam usar índice: um SCAN no plano indica que uma
+migração ou mudança de consulta fez a busca voltar a varrer a tabela."""
+import pytest
+from sqlalchemy import select
+
+from models import ItemPedido, Pedido, Usuario
+
+
+def _plano(engine, consulta) -> list:
+    compilada = consulta.compile(engine, compile_kwargs={"render_postcompile": True})
+    parametros = compilada.construct_params()
+    valores = tuple(parametros[nome] for nome in compilada.positiontup)
+    with engine.connect() as conn:
+        return [linha[-1] for linha in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compilada), valores)]
+
+
+def _consultas_quentes(db):
+    from order_routes import _filtrar_pagina
+
+    return {
+        # autenticar_usuario
+        "usuario_por_email": select(Usuario).where(Usuario.email == "joao@email.com"),
+        # listagens filtradas por usuário e por status, com cursor
+        "pedidos_por_usuario": _filtrar_pagina(db.query(Pedido), Pedido, 10, 100, None, 1).statement,
+        "pedidos_por_status": _filtrar_pagina(db.query(Pedido), Pedido, 10, 100, "aberto", None).statement,
+        # selectinload de Pedido.itens
+        "itens_por_pedido": select(ItemPedido).where(ItemPedido.pedido_id.in_([1, 2, 3])),
+        # remover_item_pedido
+        "item_por_sabor_tamanho": select(ItemPedido.id, ItemPedido.quantidade).where(
+            ItemPedido.pedido_id == 1,
+            ItemPedido.sabor == "calabresa",
+            ItemPedido.tamanho == "grande",
+        ),
+    }
+
+
+@pytest.mark.parametrize(
+    "nome",
+    ["usuario_por_email", "pedidos_por_usuario", "pedidos_por_status", "itens_por_pedido", "item_por_sabor_tamanho"],
+)
+def test_consulta_quente_usa_indice(engine, db, nome):
+    plano = _plano(engine, _consultas_quentes(db)[nome])
+
+    assert any(linha.startswith("SEARCH") and "USING" in linha and "INDEX" in linha for linha in plano), plano
+    assert not any(linha.startswith("SCAN") for linha in plano), plano
@@ -0,0 +1,90 @@
+"""Criação de pedidos pela API."""
+from catalogo import catalogo
+
+
+def _produto() -> dict:
+    produto = catalogo.produtos()[0]
+    return {"sabor": produto["sabor"], "tamanho": produto["tamanho"]}
+
+
+def test_criar_pedido_com_status_nulo(cliente, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+
+    resposta = cliente.post(
+        "/orders/pedido",
+        json={"usuario_id": usuario_id, "status": None, "quantidade": 1, **_produto()},
+        headers=cabecalhos,
+    )
+
+    assert resposta.status_code == 201
+    assert resposta.json()["status"] is None
+    pedido = cliente.get(f"/orders/pedido/{resposta.json()['id']}", headers=cabecalhos)
+    assert pedido.status_code == 200
+    assert pedido.json()["status"] is None
+
+
+def test_criar_lote_com_status_nulo(cliente, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+
+    resposta = cliente.post(
+        "/orders/pedidos/bulk",
+        json={"pedidos": [{"usuario_id": usuario_id, "status": None, "itens": [{**_produto(), "quantidade": 1}]}]},
+        headers=cabecalhos,
+    )
+
+    assert resposta.status_code == 201
+    assert len(resposta.json()["criados"]) == 1
+
+
+def test_lote_reporta_erros_por_indice_e_cria_os_validos(cliente, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+    item = {**_produto(), "quantidade": 2}
+    pedidos = [
+        {"usuario_id": usuario_id, "itens": [item]},
+        {"usuario_id": usuario_id, "status": "inexistente", "itens": [item]},
+        {"usuario_id": usuario_id, "itens": [{**item, "quantidade": 0}]},
+        {"usuario_id": usuario_id, "itens": [item, item]},
+        {"usuario_id": usuario_id, "itens": []},
+    ]
+
+    resposta = cliente.post("/orders/pedidos/bulk", json={"pedidos": pedidos}, headers=cabecalhos)
+
+    assert resposta.status_code == 201
+    corpo = resposta.json()
+    assert [criado["indice"] for criado in corpo["criados"]] == [0, 3]
+    assert [criado["quantidade_itens"] for criado in corpo["criados"]] == [1, 2]
+    assert [erro["indice"] for erro in corpo["erros"]] == [1, 2, 4]
+    for criado in corpo["criados"]:
+        pedido = cliente.get(f"/orders/pedido/{criado['id']}", headers=cabecalhos).json()
+        assert pedido["preco_total"] == criado["preco_total"]
+        assert len(pedido["itens"]) == criado["quantidade_itens"]
+
+
+def test_lote_sem_nenhum_pedido_valido_responde_400(cliente, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+
+    resposta = cliente.post(
+        "/orders/pedidos/bulk",
+        json={"pedidos": [{"usuario_id": usuario_id, "itens": []}]},
+        headers=cabecalhos,
+    )
+
+    assert resposta.status_code == 400
+    assert [erro["indice"] for erro in resposta.json()["detail"]["erros"]] == [0]
+
+
+def test_ndjson_respeita_limite(cliente, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+    for _ in range(3):
+        corpo = {"usuario_id": usuario_id, "quantidade": 1, **_produto()}
+        assert cliente.post("/orders/pedido", json=corpo, headers=cabecalhos).status_code == 201
+
+    def linhas(**parametros) -> list:
+        resposta = cliente.get(
+            "/orders/lista", params={"formato": "ndjson", "usuario_id": usuario_id, **parametros}, headers=cabecalhos
+        )
+        assert resposta.status_code == 200
+        return resposta.text.splitlines()
+
+    assert len(linhas()) == 3
+    assert len(linhas(limite=2)) == 2
@@ -0,0 +1,36 @@
+"""Reconstrução das tabelas de resumo de vendas."""
+from datetime import date, datetime
+
+from sqlalchemy import insert
+
+from models import ItemPedido, Pedido, ResumoVendas
+from relatorios import reconstruir_resumo, relatorio_por_dia, relatorio_por_sabor, relatorio_por_status
+
+
+def test_reconstruir_resumo_dia_a_dia_bate_com_o_calculo_exato(db, criar_usuario):
+    usuario_id, _ = criar_usuario()
+    # INSERTs diretos não passam pelos deltas: o resumo fica desatualizado
+    for criado_em, status in (
+        (datetime(2026, 3, 1, 23, 59, 59), "aberto"),
+        (datetime(2026, 3, 2, 0, 0, 0), "fechado"),
+        (datetime(2026, 3, 2, 12, 0, 0), "cancelado"),
+        (None, None),
+    ):
+        id_pedido = db.scalar(
+            insert(Pedido).returning(Pedido.id),
+            {"usuario_id": usuario_id, "preco": 20.0, "status": status, "criado_em": criado_em},
+        )
+        db.execute(
+            insert(ItemPedido),
+            {"pedido_id": id_pedido, "sabor": "Calabresa ", "tamanho": "grande", "quantidade": 2, "preco_unitario": 10.0},
+        )
+    # dia sem nenhum pedido: a linha precisa sumir
+    db.add(ResumoVendas(dia=date(2020, 1, 1), situacao="aberto", pedidos=5, receita=50.0))
+    db.commit()
+
+    assert reconstruir_resumo(db) > 0
+
+    assert relatorio_por_dia(db) == relatorio_por_dia(db, exato=True)
+    assert relatorio_por_status(db) == relatorio_por_status(db, exato=True)
+    assert relatorio_por_sabor(db) == relatorio_por_sabor(db, exato=True)
+    assert "2020-01-01" not in [linha["dia"] for linha in relatorio_por_dia(db)]
@@ -0,0 +1,51 @@
+"""Logout, rotação de refresh tokens e leitura das revogações de outros workers."""
+import time
+import uuid
+
+from auth_routes import criar_refresh_token
+from models import TokenRevogado
+from revogacao import _para_datetime, ler_revogados, lista_revogacao
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_logout_revoga_access_e_refresh(cliente, criar_usuario):
+    usuario_id, cabecalhos = criar_usuario()
+    refresh_token = criar_refresh_token(usuario_id)
+
+    resposta = cliente.post("/auth/logout", json={"refresh_token": refresh_token}, headers=cabecalhos)
+
+    assert resposta.status_code == 200
+    assert cliente.get("/orders/lista", headers=cabecalhos).status_code == 401
+    assert cliente.get("/auth/refresh", headers=_bearer(refresh_token)).status_code == 401
+
+
+def test_refresh_token_rotacionado_nao_pode_ser_reusado(cliente, criar_usuario):
+    usuario_id, _ = criar_usuario()
+    refresh_token = criar_refresh_token(usuario_id)
+
+    resposta = cliente.get("/auth/refresh", headers=_bearer(refresh_token))
+    assert resposta.status_code == 200
+    novo_par = resposta.json()
+
+    assert cliente.get("/auth/refresh", headers=_bearer(refresh_token)).status_code == 401
+    assert cliente.get("/orders/lista", headers=_bearer(novo_par["access_token"])).status_code == 200
+    assert cliente.get("/auth/refresh", headers=_bearer(novo_par["refresh_token"])).status_code == 200
+
+
+def test_revogacao_confirmada_fora_de_ordem_e_lida(db):
+    # simula outro worker: um id menor é confirmado depois de um maior já lido
+    ler_revogados()
+    expira_em = _para_datetime(time.time() + 60)
+    maior, menor = uuid.uuid4().hex, uuid.uuid4().hex
+    db.add(TokenRevogado(id=lista_revogacao.ultimo_id + 10, jti=maior, expira_em=expira_em))
+    db.commit()
+    ler_revogados()
+    assert lista_revogacao.revogado(maior)
+
+    db.add(TokenRevogado(id=lista_revogacao.ultimo_id - 5, jti=menor, expira_em=expira_em))
+    db.commit()
+    ler_revogados()
+    assert lista_revogacao.revogado(menor)